@@ -0,0 +1,322 @@
+"""
+Hybrid BM25 + vector retriever with reciprocal-rank fusion
+
+Dense-only retrieval (Bedrock Knowledge Bases, FAISS) struggles with exact tokens such as order
+IDs (ORD12345) or product SKUs. This module pairs a local BM25 inverted index with a dense vector
+index, runs both searches concurrently and fuses the two ranked lists with reciprocal-rank fusion.
+
+Usage:
+
+    from hybrid_retriever import HybridRetriever
+    from pdf_ingestion import titan_text_embedder
+
+    retriever = HybridRetriever(embed_fn=titan_text_embedder(bedrock_runtime_client))
+    retriever.add_documents(faq_entries)
+    retriever.search("Where is my order ORD12345?", k=3)
+"""
+
+import math
+import re
+import threading
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"\w+")
+DEFAULT_RRF_K = 60
+
+
+def tokenize(text):
+    """
+    Lowercase word tokenizer. Keeps alphanumeric identifiers such as ORD12345 as single tokens.
+    """
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """
+    Okapi BM25 over an append-only inverted index.
+
+    Posting lists are stored as compact `array` buffers (document ids and term frequencies) that
+    grow as documents are added, and are scored with vectorized NumPy views at query time. An
+    `array` cannot grow while a view exports its buffer, so views never outlive the lock.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.term_ids = {}
+        self.postings_docs = []  # term id -> array('I') of document positions, ascending
+        self.postings_tfs = []   # term id -> array('I') of term frequencies
+        self.doc_lengths = array("I")
+        self.total_length = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def add(self, text):
+        """
+        Index one document and return its position.
+        """
+        tokens = tokenize(text)
+        counts = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        with self._lock:
+            position = len(self.doc_lengths)
+            for token, tf in counts.items():
+                term_id = self.term_ids.get(token)
+                if term_id is None:
+                    term_id = len(self.postings_docs)
+                    self.term_ids[token] = term_id
+                    self.postings_docs.append(array("I"))
+                    self.postings_tfs.append(array("I"))
+                self.postings_docs[term_id].append(position)
+                self.postings_tfs[term_id].append(tf)
+            self.doc_lengths.append(len(tokens))
+            self.total_length += len(tokens)
+        return position
+
+    def search(self, query, k=10):
+        """
+        Return up to k (position, score) pairs ordered by descending BM25 score.
+        """
+        tokens = set(tokenize(query))
+        with self._lock:
+            doc_count = len(self.doc_lengths)
+            if doc_count == 0:
+                return []
+            avg_length = self.total_length / doc_count
+            scores = np.zeros(doc_count, dtype=np.float32)
+            doc_lengths = docs = None
+            try:
+                doc_lengths = np.frombuffer(self.doc_lengths, dtype=np.uint32)
+                for token in tokens:
+                    term_id = self.term_ids.get(token)
+                    if term_id is None:
+                        continue
+                    docs = np.frombuffer(self.postings_docs[term_id], dtype=np.uint32)
+                    tfs = np.array(self.postings_tfs[term_id], dtype=np.float32)
+                    idf = math.log(1 + (doc_count - len(docs) + 0.5) / (len(docs) + 0.5))
+                    norm = self.k1 * (1 - self.b + self.b * doc_lengths[docs] / avg_length)
+                    scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+            finally:
+                # Release the buffer exports before add() may grow the arrays again
+                del doc_lengths, docs
+        return _top_k(scores, k, positive_only=True)
+
+
+class DenseIndex:
+    """
+    Exact cosine-similarity index over L2-normalized float32 vectors.
+    """
+
+    def __init__(self):
+        self._pending = []
+        self._matrix = None
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        with self._lock:
+            size = 0 if self._matrix is None else len(self._matrix)
+            return size + len(self._pending)
+
+    def add(self, vector):
+        with self._lock:
+            self._pending.append(np.asarray(vector, dtype=np.float32))
+            return len(self) - 1
+
+    def _materialize(self):
+        # Vectors are appended one at a time but stacked lazily, once per batch of additions
+        if self._pending:
+            block = _normalize(np.vstack(self._pending))
+            self._matrix = block if self._matrix is None else np.vstack([self._matrix, block])
+            self._pending = []
+        return self._matrix
+
+    def search(self, vector, k=10):
+        with self._lock:
+            matrix = self._materialize()
+        if matrix is None:
+            return []
+        query = _normalize(np.asarray(vector, dtype=np.float32)[None, :])[0]
+        return _top_k(matrix @ query, k)
+
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+
+def _top_k(scores, k, positive_only=False):
+    if positive_only:
+        candidates = np.flatnonzero(scores > 0)
+    else:
+        candidates = np.arange(len(scores))
+    if len(candidates) > k:
+        candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+    ordered = candidates[np.argsort(-scores[candidates], kind="stable")]
+    return [(int(i), float(scores[i])) for i in ordered]
+
+
+def reciprocal_rank_fusion(ranked_lists, rrf_k=DEFAULT_RRF_K, weights=None):
+    """
+    Fuse ranked lists of ids: score(d) = sum_i w_i / (rrf_k + rank_i(d)), ranks starting at 1.
+    """
+    weights = weights or [1.0] * len(ranked_lists)
+    fused = {}
+    for weight, ranked in zip(weights, ranked_lists):
+        for rank, doc in enumerate(ranked, start=1):
+            fused[doc] = fused.get(doc, 0.0) + weight / (rrf_k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
+
+
+class HybridRetriever:
+    """
+    Keyword + semantic retriever. `embed_fn` takes a list of texts and returns a list of vectors,
+    matching pdf_ingestion.titan_text_embedder.
+    """
+
+    def __init__(
+        self,
+        embed_fn: Callable[[List[str]], List[List[float]]],
+        rrf_k: int = DEFAULT_RRF_K,
+        weights: Optional[List[float]] = None,
+        max_workers: int = 4,
+    ):
+        self.embed_fn = embed_fn
+        self.rrf_k = rrf_k
+        self.weights = weights
+        self.bm25 = BM25Index()
+        self.dense = DenseIndex()
+        self.ids = []
+        self.texts = []
+        self.metadatas = []
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def add_documents(self, texts, metadatas=None, ids=None, vectors=None):
+        """
+        Add documents to both indexes. Pass precomputed `vectors` to skip embedding.
+        """
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        vectors = vectors if vectors is not None else self.embed_fn(texts)
+        # One writer at a time keeps BM25 and dense positions aligned with self.ids
+        with self._lock:
+            ids = ids or [str(len(self.ids) + i) for i in range(len(texts))]
+            for doc_id, text, metadata, vector in zip(ids, texts, metadatas, vectors):
+                # Record the document before indexing it, so a concurrent search never returns
+                # a position that has no entry yet
+                self.ids.append(doc_id)
+                self.texts.append(text)
+                self.metadatas.append(metadata)
+                self.bm25.add(text)
+                self.dense.add(vector)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    def _dense_search(self, query, k):
+        return self.dense.search(self.embed_fn([query])[0], k)
+
+    def search(self, query, k=5, candidates=50, mode="hybrid") -> List[Dict]:
+        """
+        Retrieve the top k documents. `mode` is "hybrid", "bm25" or "dense".
+        """
+        if mode == "bm25":
+            ranked = self.bm25.search(query, k)
+        elif mode == "dense":
+            ranked = self._dense_search(query, k)
+        else:
+            # The query embedding (usually a network call) overlaps with the keyword search
+            dense_future = self._executor.submit(self._dense_search, query, candidates)
+            bm25_results = self.bm25.search(query, candidates)
+            dense_results = dense_future.result()
+            ranked = reciprocal_rank_fusion(
+                [[pos for pos, _ in bm25_results], [pos for pos, _ in dense_results]],
+                rrf_k=self.rrf_k,
+                weights=self.weights,
+            )[:k]
+        return [
+            {"id": self.ids[pos], "text": self.texts[pos], "metadata": self.metadatas[pos], "score": score}
+            for pos, score in ranked
+        ]
+
+
+# (Optional) Benchmark: hybrid vs. dense-only latency and recall on the FAQ and annual report corpora
+if __name__ == "__main__":
+    import argparse
+    import random
+    import time
+    import zlib
+
+    parser = argparse.ArgumentParser(description="Benchmark hybrid vs. dense-only retrieval")
+    parser.add_argument("--faq", default="data/faq-kb.txt")
+    parser.add_argument("--report", default="../Chapter 11/Amazon-com-Inc-2023-Annual-Report.pdf")
+    parser.add_argument("--bedrock", action="store_true", help="Use Titan embeddings instead of the offline stand-in")
+    parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.bedrock:
+        import boto3
+        from pdf_ingestion import titan_text_embedder
+        embed_fn = titan_text_embedder(boto3.client("bedrock-runtime"))
+    else:
+        def embed_fn(texts, dim=512):
+            # Offline stand-in: hashed character trigrams, a rough proxy for a semantic embedding
+            vectors = np.zeros((len(texts), dim), dtype=np.float32)
+            for row, text in enumerate(texts):
+                text = f"  {text.lower()} "
+                for i in range(len(text) - 2):
+                    vectors[row, zlib.crc32(text[i:i + 3].encode()) % dim] += 1
+            return vectors
+
+    def evaluate(name, retriever, queries):
+        for mode in ("bm25", "dense", "hybrid"):
+            hits, start = 0, time.perf_counter()
+            for query, expected_id in queries:
+                hits += expected_id in [r["id"] for r in retriever.search(query, k=args.k, mode=mode)]
+            elapsed = time.perf_counter() - start
+            print(f"{name:<14} {mode:<7} recall@{args.k}={hits / len(queries):.3f} "
+                  f"latency={1000 * elapsed / len(queries):.2f} ms/query")
+        retriever.close()
+
+    if not args.bedrock:
+        print("Offline embedding stand-in (hashed character trigrams) is lexical, not semantic: the dense "
+              "and hybrid recall below only shows the fusion mechanics. Run with --bedrock for real numbers.")
+
+    # FAQ: index the answers as they are, query with the questions
+    with open(args.faq) as f:
+        entries = [e.strip() for e in f.read().split("Question:") if e.strip()]
+    questions = [e.split("Answer:")[0].strip() for e in entries]
+    answers = [e.split("Answer:")[1].strip() for e in entries]
+    retriever = HybridRetriever(embed_fn)
+    retriever.add_documents(answers)
+    evaluate("faq", retriever, [(q, str(i)) for i, q in enumerate(questions)])
+
+    # Exact identifiers: order records that only differ in their ids and a few fields
+    rng = random.Random(0)
+    items = ["A100 SmartWatch", "B200 Headphones", "C300 Tablet", "D400 Speaker"]
+    statuses = ["Processing", "Shipped", "Delivered", "Cancelled"]
+    orders = [(f"ORD{n}", rng.choice(items), rng.choice(statuses)) for n in rng.sample(range(10000, 99999), 500)]
+    retriever = HybridRetriever(embed_fn)
+    retriever.add_documents([f"Order {o} contains 1 x {item}. Current status: {status}." for o, item, status in orders])
+    evaluate("order-ids", retriever,
+             [(f"What is the status of order {o}?", str(i)) for i, (o, _, _) in enumerate(orders[:200])])
+
+    # Annual report: chunk every page, query with short verbatim snippets of random chunks
+    from pdf_ingestion import split_text, stream_page_documents
+    chunks = [c for page in stream_page_documents(args.report) for c in split_text(page["text"])]
+    retriever = HybridRetriever(embed_fn)
+    retriever.add_documents(chunks)
+    report_queries = []
+    for position in rng.sample(range(len(chunks)), min(200, len(chunks))):
+        words = chunks[position].split()
+        start = rng.randrange(max(1, len(words) - 6))
+        report_queries.append((" ".join(words[start:start + 6]), str(position)))
+    evaluate("annual-report", retriever, report_queries)
@@ -0,0 +1,56 @@
+import threading
+import zlib
+
+import numpy as np
+
+from hybrid_retriever import BM25Index, HybridRetriever
+
+
+def hashed_trigrams(texts, dim=64):
+    vectors = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for i in range(len(text) - 2):
+            vectors[row, zlib.crc32(text[i:i + 3].encode()) % dim] += 1
+    return vectors
+
+
+def test_bm25_concurrent_add_and_search():
+    index = BM25Index()
+    errors = []
+    stop = threading.Event()
+
+    def search():
+        while not stop.is_set():
+            try:
+                index.search("order status refund", k=5)
+            except Exception as e:  # noqa: BLE001 - any failure is a test failure
+                errors.append(e)
+
+    readers = [threading.Thread(target=search) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    try:
+        for i in range(3000):
+            index.add(f"order {i} status shipped refund requested {i % 7}")
+    finally:
+        stop.set()
+        for reader in readers:
+            reader.join()
+    assert errors == []
+    assert len(index) == 3000
+    assert len(index.search("refund", k=3)) == 3
+
+
+def test_hybrid_positions_stay_aligned():
+    retriever = HybridRetriever(hashed_trigrams)
+    threads = [threading.Thread(target=retriever.add_documents,
+                                args=([f"batch {b} document {i} ORD{b}{i:03d}" for i in range(50)],))
+               for b in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(retriever.bm25) == len(retriever.dense) == len(retriever.ids) == 200
+    top = retriever.search("ORD2017", k=1, mode="bm25")[0]
+    assert "ORD2017" in top["text"]
+    retriever.close()
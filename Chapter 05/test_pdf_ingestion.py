@@ -0,0 +1,53 @@
+import hashlib
+import os
+
+import pytest
+
+from pdf_ingestion import InMemoryVectorStore, ingest_pdf
+
+SAMPLE_PDF = os.path.join(os.path.dirname(__file__), "data", "sample-transcript.pdf")
+
+
+def fake_embed(texts):
+    return [[b / 255 for b in hashlib.sha256(t.encode()).digest()] for t in texts]
+
+
+def test_forced_reingest_replaces_all_previous_chunks(tmp_path):
+    store = InMemoryVectorStore()
+    manifest_path = str(tmp_path / "manifest.json")
+    first = ingest_pdf(SAMPLE_PDF, fake_embed, store, manifest_path=manifest_path, chunk_size=300,
+                       chunk_overlap=0, max_workers=1)
+    assert len(store) == first["chunks_embedded"]
+
+    second = ingest_pdf(SAMPLE_PDF, fake_embed, store, manifest_path=manifest_path, chunk_size=1000,
+                        chunk_overlap=0, max_workers=1, force=True, text_filter=str.upper)
+    assert second["chunks_embedded"] < first["chunks_embedded"]
+    assert len(store) == second["chunks_embedded"]
+    assert all(text == text.upper() for text in store.texts.values())
+
+
+def test_unchanged_document_is_skipped(tmp_path):
+    store = InMemoryVectorStore()
+    manifest_path = str(tmp_path / "manifest.json")
+    ingest_pdf(SAMPLE_PDF, fake_embed, store, manifest_path=manifest_path, max_workers=1)
+    chunks = len(store)
+    stats = ingest_pdf(SAMPLE_PDF, fake_embed, store, manifest_path=manifest_path, max_workers=1)
+    assert stats["chunks_embedded"] == 0
+    assert len(store) == chunks
+
+
+def test_failed_forced_reingest_is_retried_on_the_next_run(tmp_path):
+    store = InMemoryVectorStore()
+    manifest_path = str(tmp_path / "manifest.json")
+    ingest_pdf(SAMPLE_PDF, fake_embed, store, manifest_path=manifest_path, max_workers=1)
+
+    def failing_embed(texts):
+        raise RuntimeError("embedding service unavailable")
+
+    with pytest.raises(RuntimeError):
+        ingest_pdf(SAMPLE_PDF, failing_embed, store, manifest_path=manifest_path, max_workers=1, force=True)
+    assert len(store) == 0
+
+    stats = ingest_pdf(SAMPLE_PDF, fake_embed, store, manifest_path=manifest_path, max_workers=1)
+    assert stats["chunks_embedded"] > 0
+    assert len(store) == stats["chunks_embedded"]
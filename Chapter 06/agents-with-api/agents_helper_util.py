@@ -4,24 +4,27 @@ import time
 import zipfile
 from io import BytesIO
 import logging
+import instrumentation
 from constants import (
     AWS_REGION, PYTHON_RUNTIME, LAMBDA_TIMEOUT, 
-    TABLE_NAME, TABLE_PARTITION_KEY, ORDER_LAMBDA_CODE_FILE_NAME
+    TABLE_NAME, TABLE_PARTITION_KEY, ORDER_LAMBDA_CODE_FILE_NAME, LAMBDA_SHARED_MODULES
 )
 
 logger = logging.getLogger()
 session = boto3.session.Session()
 region = AWS_REGION
-dynamodb_client = boto3.client('dynamodb', region)
+dynamodb_client = instrumentation.instrument_client(boto3.client('dynamodb', region))
 dynamodb_resource = boto3.resource('dynamodb', region)
-lambda_client = boto3.client('lambda', region)
-bedrock_agent_client = boto3.client('bedrock-agent', region)
+instrumentation.instrument_client(dynamodb_resource.meta.client)
+lambda_client = instrumentation.instrument_client(boto3.client('lambda', region))
+bedrock_agent_client = instrumentation.instrument_client(boto3.client('bedrock-agent', region))
 bedrock_agent_runtime_client = boto3.client('bedrock-agent-runtime', region)
-iam_client = boto3.client('iam',region)
+iam_client = instrumentation.instrument_client(boto3.client('iam',region))
 sts_client = boto3.client('sts', region)
 account_id = sts_client.get_caller_identity()["Account"]
 
 
+@instrumentation.timed("provision.create_dynamodb")
 def create_dynamodb(table_name=TABLE_NAME, partition_key=TABLE_PARTITION_KEY):
     """
         Creates a DynamoDB table with the specified name, and partition key. If table already exists, return
@@ -57,15 +60,20 @@ def create_dynamodb(table_name=TABLE_NAME, partition_key=TABLE_PARTITION_KEY):
     return
 
 
-def create_lambda(lambda_function_name, lambda_iam_role, lambda_code_file_name=ORDER_LAMBDA_CODE_FILE_NAME):
+@instrumentation.timed("provision.create_lambda")
+def create_lambda(lambda_function_name, lambda_iam_role, lambda_code_file_name=ORDER_LAMBDA_CODE_FILE_NAME,
+                  shared_modules=LAMBDA_SHARED_MODULES, environment_variables=None):
     """
-        Package up the lambda function code
+        Package up the lambda function code together with the shared modules it imports.
+        Pass environment_variables (e.g. {'INSTRUMENTATION_ENABLED': 'true'}) to configure the function.
     """
    
     s = BytesIO()
     z = zipfile.ZipFile(s, 'w')
     # Lambda files are in the same directory as this utility file
     z.write(f"{lambda_code_file_name}.py")  # Include the file with the dynamic name
+    for module_name in shared_modules:
+        z.write(f"{module_name}.py")
     
     z.close()
     zip_content = s.getvalue()
@@ -77,12 +85,14 @@ def create_lambda(lambda_function_name, lambda_iam_role, lambda_code_file_name=O
         Timeout=LAMBDA_TIMEOUT,
         Role=lambda_iam_role['Role']['Arn'],
         Code={'ZipFile': zip_content},
-        Handler=f"{lambda_code_file_name}.lambda_handler"
+        Handler=f"{lambda_code_file_name}.lambda_handler",
+        Environment={'Variables': environment_variables or {}}
     )
     return lambda_function
 
 
 
+@instrumentation.timed("provision.create_lambda_role")
 def create_lambda_role(agent_name, dynamodb_table_name=TABLE_NAME):
     """
         Create IAM role and required policies for Lambda funciton
@@ -169,6 +179,7 @@ def create_lambda_role(agent_name, dynamodb_table_name=TABLE_NAME):
     return lambda_iam_role
 
 
+@instrumentation.timed("provision.create_agent_role_and_policies")
 def create_agent_role_and_policies(agent_name, agent_foundation_model, kb_id=None):
     agent_bedrock_allow_policy_name = f"{agent_name}-ba"
     agent_role_name = f'AmazonBedrockExecutionRoleForAgents_{agent_name}'
@@ -239,6 +250,7 @@ def create_agent_role_and_policies(agent_name, agent_foundation_model, kb_id=Non
     return agent_role
 
 
+@instrumentation.timed("provision.delete_agent_roles_and_policies")
 def delete_agent_roles_and_policies(agent_name):
     agent_bedrock_allow_policy_name = f"{agent_name}-ba"
     agent_role_name = f'AmazonBedrockExecutionRoleForAgents_{agent_name}'
@@ -293,6 +305,7 @@ def delete_agent_roles_and_policies(agent_name):
             print(e)
 
 
+@instrumentation.timed("provision.clean_up_resources")
 def clean_up_resources(
         table_name, lambda_function, lambda_function_name, agent_action_group_response, agent_functions,
         agent_id, kb_id, alias_id
@@ -17,6 +17,8 @@ TABLE_PARTITION_KEY = 'order_id'
 
 # Lambda Function Configuration
 ORDER_LAMBDA_CODE_FILE_NAME = 'order_lambda'
+# Shared modules packaged next to every Lambda function
+LAMBDA_SHARED_MODULES = ['instrumentation', 'profiling', 'order_cache', 'pii_redaction']
 
 # Model Configuration . See https://docs.aws.amazon.com/bedrock/latest/userguide/models-supported.html for more information
 AGENT_FOUNDATION_MODEL = "anthropic.claude-3-7-sonnet-20250219-v1:0"
@@ -0,0 +1,524 @@
+"""
+Shared instrumentation for the order and return/refund Lambda functions and agents_helper_util
+
+Adds timing without any dependency beyond the standard library, so the module can be packaged
+next to the Lambda code as-is:
+
+- timed / span: decorator and context manager that time a function or a block
+- instrument_handler: decorator for lambda_handler that also flushes spans at the end of every
+  invocation (Lambda may freeze the container right after the handler returns)
+- instrument_client: times every call a boto3 client makes (e.g. each DynamoDB GetItem / PutItem)
+- Histogram: HDR-style log-linear latency histograms kept in-process, one per span name
+- BatchExporter: batches finished spans to stdout (CloudWatch Logs), a file or an OTLP/HTTP
+  collector endpoint
+
+Configuration comes from environment variables (or configure()):
+
+    INSTRUMENTATION_ENABLED=true          # default false: decorators call straight through
+    INSTRUMENTATION_SAMPLE_RATE=0.1       # fraction of traces exported; histograms see every call
+    INSTRUMENTATION_EXPORTER=stdout       # stdout | file | otlp | none
+    INSTRUMENTATION_FILE=/tmp/spans.jsonl
+    OTEL_EXPORTER_OTLP_ENDPOINT=http://localhost:4318
+
+Usage:
+
+    import instrumentation
+
+    dynamodb = instrumentation.instrument_client(boto3.client('dynamodb'))
+
+    @instrumentation.timed("order.get_order_details")
+    def get_order_details(order_id): ...
+
+    @instrumentation.instrument_handler
+    def lambda_handler(event, context): ...
+"""
+
+import contextvars
+import functools
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import urllib.request
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BATCH = 256
+HISTOGRAM_SUMMARY_INTERVAL_SECONDS = 60
+
+_current_span = contextvars.ContextVar("instrumentation_current_span", default=None)
+
+
+def _env_flag(name, default="false"):
+    return os.environ.get(name, default).strip().lower() in ("1", "true", "yes", "on")
+
+
+class Histogram:
+    """
+    Log-linear latency histogram in the spirit of HdrHistogram.
+
+    Values (microseconds) below 2**significant_bits are counted exactly; above that every power of
+    two is split into 2**(significant_bits - 1) buckets, which bounds the relative error to
+    2**-(significant_bits - 1) (about 1.6% with the default 7 bits). Recording is O(1).
+    """
+
+    def __init__(self, significant_bits=7):
+        self.significant_bits = significant_bits
+        self.sub_bucket_count = 1 << significant_bits
+        self.half_count = self.sub_bucket_count >> 1
+        self.counts = [0] * self.sub_bucket_count
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    def _index(self, value):
+        if value < self.sub_bucket_count:
+            return value
+        shift = value.bit_length() - self.significant_bits
+        return self.sub_bucket_count + (shift - 1) * self.half_count + ((value >> shift) - self.half_count)
+
+    def _bucket_range(self, index):
+        if index < self.sub_bucket_count:
+            return index, index
+        shift, offset = divmod(index - self.sub_bucket_count, self.half_count)
+        shift += 1
+        mantissa = offset + self.half_count
+        return mantissa << shift, ((mantissa + 1) << shift) - 1
+
+    def record(self, value_us):
+        value = max(0, int(value_us))
+        index = self._index(value)
+        if index >= len(self.counts):
+            self.counts.extend([0] * (index + 1 - len(self.counts)))
+        self.counts[index] += 1
+        self.total += 1
+        if value > self.max:
+            self.max = value
+        if self.min is None or value < self.min:
+            self.min = value
+
+    def merge(self, other):
+        if len(other.counts) > len(self.counts):
+            self.counts.extend([0] * (len(other.counts) - len(self.counts)))
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+
+    def percentile(self, q):
+        if self.total == 0:
+            return 0
+        target = max(1, -(-self.total * q // 100))  # ceil
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= target:
+                return min(self._bucket_range(index)[1], self.max)
+        return self.max
+
+    def summary(self):
+        """
+        Count and latency percentiles in milliseconds.
+        """
+        return {
+            "count": self.total,
+            "min_ms": (self.min or 0) / 1000,
+            "p50_ms": self.percentile(50) / 1000,
+            "p90_ms": self.percentile(90) / 1000,
+            "p99_ms": self.percentile(99) / 1000,
+            "max_ms": self.max / 1000,
+        }
+
+
+class Span:
+    __slots__ = ("tracer", "name", "attributes", "trace_id", "span_id", "parent_id", "sampled",
+                 "start_time_ns", "_start_perf_ns", "duration_ns", "status", "_token")
+
+    def __init__(self, tracer, name, attributes=None, parent=None):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes or {}
+        if parent is None:
+            self.sampled = random.random() < tracer.sample_rate
+            # Ids are only needed for exported spans; unsampled spans just feed the histograms
+            self.trace_id = random.getrandbits(128) if self.sampled else 0
+            self.parent_id = None
+        else:
+            self.trace_id = parent.trace_id
+            self.sampled = parent.sampled
+            self.parent_id = parent.span_id
+        self.span_id = random.getrandbits(64) if self.sampled else 0
+        self.status = "ok"
+        self._token = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def start(self):
+        self.start_time_ns = time.time_ns()
+        self._start_perf_ns = time.perf_counter_ns()
+        return self
+
+    def end(self, error=None):
+        self.duration_ns = time.perf_counter_ns() - self._start_perf_ns
+        if error is not None:
+            self.status = "error"
+            self.attributes["error"] = repr(error)
+        self.tracer._finish(self)
+
+    def __enter__(self):
+        self.start()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current_span.reset(self._token)
+        self.end(exc)
+        return False
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "trace_id": f"{self.trace_id:032x}",
+            "span_id": f"{self.span_id:016x}",
+            "parent_id": f"{self.parent_id:016x}" if self.parent_id is not None else None,
+            "start_time_unix_nano": self.start_time_ns,
+            "duration_ms": self.duration_ns / 1e6,
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class _NoopSpan:
+    """
+    Returned by span() while instrumentation is disabled.
+    """
+
+    def set_attribute(self, key, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class StdoutSink:
+    """
+    One JSON line per span; in Lambda these end up in CloudWatch Logs.
+    """
+
+    def export(self, records):
+        sys.stdout.write("".join(json.dumps(record, default=str) + "\n" for record in records))
+        sys.stdout.flush()
+
+
+class FileSink:
+    def __init__(self, path):
+        self.path = path
+
+    def export(self, records):
+        with open(self.path, "a") as f:
+            f.write("".join(json.dumps(record, default=str) + "\n" for record in records))
+
+
+class OTLPHttpSink:
+    """
+    Sends spans to an OpenTelemetry collector using OTLP/HTTP with JSON encoding.
+    Histogram summaries are not sent; use StdoutSink or FileSink for those.
+    """
+
+    def __init__(self, endpoint, service_name, timeout=2.0):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.service_name = service_name
+        self.timeout = timeout
+
+    @staticmethod
+    def _attribute(key, value):
+        if isinstance(value, bool):
+            return {"key": key, "value": {"boolValue": value}}
+        if isinstance(value, int):
+            return {"key": key, "value": {"intValue": str(value)}}
+        if isinstance(value, float):
+            return {"key": key, "value": {"doubleValue": value}}
+        return {"key": key, "value": {"stringValue": str(value)}}
+
+    def export(self, records):
+        spans = [{
+            "traceId": record["trace_id"],
+            "spanId": record["span_id"],
+            **({"parentSpanId": record["parent_id"]} if record["parent_id"] else {}),
+            "name": record["name"],
+            "kind": 1,
+            "startTimeUnixNano": str(record["start_time_unix_nano"]),
+            "endTimeUnixNano": str(record["start_time_unix_nano"] + int(record["duration_ms"] * 1e6)),
+            "attributes": [self._attribute(k, v) for k, v in record["attributes"].items()],
+            "status": {"code": 2 if record["status"] == "error" else 1},
+        } for record in records if record.get("type") != "histograms"]
+        if not spans:
+            return
+        payload = {"resourceSpans": [{
+            "resource": {"attributes": [self._attribute("service.name", self.service_name)]},
+            "scopeSpans": [{"scope": {"name": __name__}, "spans": spans}],
+        }]}
+        request = urllib.request.Request(self.url, data=json.dumps(payload).encode(),
+                                         headers={"Content-Type": "application/json"}, method="POST")
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+class BatchExporter:
+    """
+    Buffers finished spans and hands them to the sink in batches of max_batch, or on flush().
+    Export errors are logged and the batch is dropped; instrumentation never fails a request.
+    """
+
+    def __init__(self, sink, max_batch=DEFAULT_MAX_BATCH):
+        self.sink = sink
+        self.max_batch = max_batch
+        self.buffer = []
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def add(self, record):
+        with self._lock:
+            self.buffer.append(record)
+            if len(self.buffer) < self.max_batch:
+                return
+            batch, self.buffer = self.buffer, []
+        self._export(batch)
+
+    def flush(self):
+        with self._lock:
+            batch, self.buffer = self.buffer, []
+        if batch:
+            self._export(batch)
+
+    def _export(self, batch):
+        try:
+            self.sink.export(batch)
+        except Exception as e:
+            self.dropped += len(batch)
+            logger.warning(f"Could not export {len(batch)} spans: {e}")
+
+
+def _make_exporter(kind, service_name):
+    if kind == "none":
+        return None
+    if kind == "file":
+        return BatchExporter(FileSink(os.environ.get("INSTRUMENTATION_FILE", "/tmp/spans.jsonl")))
+    if kind == "otlp":
+        endpoint = os.environ.get("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4318")
+        return BatchExporter(OTLPHttpSink(endpoint, service_name))
+    return BatchExporter(StdoutSink())
+
+
+class Tracer:
+    def __init__(self, enabled=False, sample_rate=1.0, exporter=None,
+                 service_name="agents-with-api"):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.exporter = exporter
+        self.service_name = service_name
+        self.histograms = {}
+        self._histograms_lock = threading.Lock()
+        self._last_summary = time.monotonic()
+
+    @classmethod
+    def from_env(cls):
+        service_name = os.environ.get("AWS_LAMBDA_FUNCTION_NAME", "agents-with-api")
+        return cls(
+            enabled=_env_flag("INSTRUMENTATION_ENABLED"),
+            sample_rate=float(os.environ.get("INSTRUMENTATION_SAMPLE_RATE", "1.0")),
+            exporter=_make_exporter(os.environ.get("INSTRUMENTATION_EXPORTER", "stdout").lower(), service_name),
+            service_name=service_name,
+        )
+
+    def histogram(self, name):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self._histograms_lock:
+                histogram = self.histograms.setdefault(name, Histogram())
+        return histogram
+
+    def _finish(self, span):
+        self.histogram(span.name).record(span.duration_ns // 1000)
+        if span.sampled and self.exporter is not None:
+            self.exporter.add(span.to_dict())
+
+    def flush(self):
+        if self.exporter is None:
+            return
+        # Piggyback a histogram snapshot on the flush at most once per interval
+        now = time.monotonic()
+        if now - self._last_summary >= HISTOGRAM_SUMMARY_INTERVAL_SECONDS:
+            self._last_summary = now
+            self.exporter.add({"type": "histograms", "service": self.service_name, "latency": latency_summary()})
+        self.exporter.flush()
+
+
+_tracer = Tracer.from_env()
+
+
+def configure(enabled=None, sample_rate=None, exporter=None):
+    """
+    Change the configuration at runtime (e.g. from a notebook). `exporter` is a BatchExporter,
+    or one of "stdout", "file", "otlp" and "none".
+    """
+    if sample_rate is not None:
+        _tracer.sample_rate = sample_rate
+    if exporter is not None:
+        _tracer.exporter = _make_exporter(exporter, _tracer.service_name) if isinstance(exporter, str) else exporter
+    if enabled is not None:
+        _tracer.enabled = enabled
+    return _tracer
+
+
+def is_enabled():
+    return _tracer.enabled
+
+
+def span(name, **attributes):
+    """
+    Context manager timing a block: `with instrumentation.span("provision.wait", table=name): ...`
+    """
+    if not _tracer.enabled:
+        return _NOOP_SPAN
+    return Span(_tracer, name, attributes, _current_span.get())
+
+
+def timed(name=None):
+    """
+    Decorator timing every call of a function. Usable as @timed or @timed("span.name").
+    """
+    if callable(name):
+        return timed()(name)
+
+    def decorator(fn):
+        span_name = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _tracer.enabled:
+                return fn(*args, **kwargs)
+            with Span(_tracer, span_name, None, _current_span.get()):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def instrument_handler(fn):
+    """
+    Decorator for a Lambda handler: times the invocation, tags it with the agent action, and
+    flushes the exporter before returning.
+    """
+    @functools.wraps(fn)
+    def wrapper(event, context):
+        if not _tracer.enabled:
+            return fn(event, context)
+        attributes = {}
+        if isinstance(event, dict):
+            attributes = {"action_group": event.get("actionGroup"), "function": event.get("function")}
+        if context is not None and hasattr(context, "aws_request_id"):
+            attributes["request_id"] = context.aws_request_id
+        try:
+            with Span(_tracer, f"{fn.__module__}.{fn.__name__}", attributes, _current_span.get()):
+                return fn(event, context)
+        finally:
+            _tracer.flush()
+    return wrapper
+
+
+def instrument_client(client, prefix=None):
+    """
+    Time every API call made through a boto3 client (span names such as "dynamodb.GetItem").
+    Uses the botocore event hooks, so the client is returned unchanged and works as before.
+    """
+    service = client.meta.service_model.service_id.hyphenize()
+    prefix = prefix or service
+
+    def before_call(model, context, **kwargs):
+        if _tracer.enabled:
+            context["instrumentation_span"] = Span(_tracer, f"{prefix}.{model.name}", None, _current_span.get()).start()
+
+    def after_call(context, parsed=None, exception=None, **kwargs):
+        client_span = context.pop("instrumentation_span", None)
+        if client_span is None:
+            return
+        error = exception
+        if error is None and isinstance(parsed, dict) and "Error" in parsed:
+            error = parsed["Error"].get("Code")
+        client_span.end(error)
+
+    client.meta.events.register(f"before-call.{service}", before_call)
+    client.meta.events.register(f"after-call.{service}", after_call)
+    client.meta.events.register(f"after-call-error.{service}", after_call)
+    return client
+
+
+def latency_summary():
+    """
+    Percentile summary of every histogram recorded so far in this process.
+    """
+    return {name: histogram.summary() for name, histogram in sorted(_tracer.histograms.items())}
+
+
+def flush():
+    _tracer.flush()
+
+
+# (Optional) Overhead benchmark: disabled vs. sampled vs. fully exported
+if __name__ == "__main__":
+    class CountingSink:
+        def __init__(self):
+            self.count = 0
+
+        def export(self, records):
+            self.count += len(records)
+
+    def plain(x):
+        return x + 1
+
+    decorated = timed("bench.decorated")(plain)
+
+    def with_block(x):
+        with span("bench.block"):
+            return x + 1
+
+    n = 200_000
+
+    def measure(fn):
+        start = time.perf_counter_ns()
+        for i in range(n):
+            fn(i)
+        return (time.perf_counter_ns() - start) / n
+
+    baseline = measure(plain)
+    print(f"{'mode':<28} {'decorator':>12} {'context mgr':>12}  (ns per call, overhead vs. {baseline:.0f} ns plain call)")
+    sink = CountingSink()
+    for label, enabled, rate in [("disabled", False, 1.0), ("enabled, 1% sampled", True, 0.01),
+                                 ("enabled, 100% sampled", True, 1.0)]:
+        configure(enabled=enabled, sample_rate=rate, exporter=BatchExporter(sink))
+        print(f"{label:<28} {measure(decorated) - baseline:12.0f} {measure(with_block) - baseline:12.0f}")
+    flush()
+    print(f"Exported spans: {sink.count:,}")
+    print(json.dumps(latency_summary(), indent=2))
+
+    # Histogram accuracy against exact percentiles
+    samples = [int(random.lognormvariate(9, 1)) for _ in range(100_000)]
+    histogram = Histogram()
+    for sample in samples:
+        histogram.record(sample)
+    samples.sort()
+    for q in (50, 90, 99, 99.9):
+        exact = samples[int(len(samples) * q / 100) - 1]
+        print(f"p{q}: exact {exact} us, histogram {histogram.percentile(q)} us")
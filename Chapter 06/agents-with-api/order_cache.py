@@ -0,0 +1,219 @@
+"""
+Container-scoped read-through cache for order lookups (order_lambda)
+
+retrieve-order-tracking-info is the most frequent agent action and an agent often looks up the same
+order several times in one session. Lambda keeps module globals alive between invocations of a warm
+container, so a module-level OrderCache saves those repeated DynamoDB GetItem calls.
+
+- TTL expiry plus LRU eviction, bounded by entry count and by serialized bytes
+- optional negative caching of order IDs that were not found (with a shorter TTL)
+- writes through cancel_order / place_order update the cached entry
+- hit / miss / eviction counters
+
+Entries are stored serialized, so callers always get their own copy and cannot modify the cache by
+mutating a returned item. Other containers do not see this cache: an order changed elsewhere may be
+served stale for at most ttl seconds.
+
+Configuration (environment variables of the Lambda function):
+
+    ORDER_CACHE_TTL_SECONDS=30            # 0 disables the cache
+    ORDER_CACHE_NEGATIVE_TTL_SECONDS=5    # 0 disables negative caching
+    ORDER_CACHE_MAX_ENTRIES=1024
+    ORDER_CACHE_MAX_BYTES=4194304
+    ORDER_CACHE_STATS_EVERY=100           # order_lambda logs the statistics once per this many lookups
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = 30
+DEFAULT_NEGATIVE_TTL_SECONDS = 5
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_MAX_BYTES = 4 * 2**20
+
+_NOT_FOUND = ""  # serialized form of a negative entry
+
+
+class OrderCache:
+    def __init__(self, ttl=DEFAULT_TTL_SECONDS, negative_ttl=DEFAULT_NEGATIVE_TTL_SECONDS,
+                 max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES, clock=time.monotonic):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.entries = OrderedDict()  # order_id -> (expires_at, serialized item), least recently used first
+        self.total_bytes = 0
+        self.stats = {"hits": 0, "negative_hits": 0, "misses": 0, "expirations": 0, "evictions": 0}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            ttl=float(os.environ.get("ORDER_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS)),
+            negative_ttl=float(os.environ.get("ORDER_CACHE_NEGATIVE_TTL_SECONDS", DEFAULT_NEGATIVE_TTL_SECONDS)),
+            max_entries=int(os.environ.get("ORDER_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+            max_bytes=int(os.environ.get("ORDER_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)),
+        )
+
+    @property
+    def enabled(self):
+        return self.ttl > 0
+
+    def _remove(self, order_id):
+        _, serialized = self.entries.pop(order_id)
+        self.total_bytes -= len(serialized)
+
+    def _store(self, order_id, serialized, ttl):
+        if ttl <= 0 or len(serialized) > self.max_bytes:
+            self.invalidate(order_id)
+            return
+        with self._lock:
+            if order_id in self.entries:
+                self._remove(order_id)
+            self.entries[order_id] = (self.clock() + ttl, serialized)
+            self.total_bytes += len(serialized)
+            while len(self.entries) > self.max_entries or self.total_bytes > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+                self.stats["evictions"] += 1
+
+    def lookup(self, order_id):
+        """
+        Return (found, item). found is False on a miss; (True, None) is a cached "not found".
+        """
+        with self._lock:
+            entry = self.entries.get(order_id)
+            if entry is None:
+                self.stats["misses"] += 1
+                return False, None
+            expires_at, serialized = entry
+            if expires_at <= self.clock():
+                self._remove(order_id)
+                self.stats["expirations"] += 1
+                self.stats["misses"] += 1
+                return False, None
+            self.entries.move_to_end(order_id)
+            if serialized == _NOT_FOUND:
+                self.stats["negative_hits"] += 1
+                return True, None
+            self.stats["hits"] += 1
+        return True, json.loads(serialized)
+
+    def put(self, order_id, item):
+        """
+        Cache an item, or record that the order does not exist when item is None.
+        """
+        if item is None:
+            self._store(order_id, _NOT_FOUND, self.negative_ttl)
+        else:
+            self._store(order_id, json.dumps(item, separators=(",", ":")), self.ttl)
+
+    def invalidate(self, order_id):
+        with self._lock:
+            if order_id in self.entries:
+                self._remove(order_id)
+
+    def get_or_load(self, order_id, loader):
+        """
+        Read-through lookup: call loader(order_id) on a miss and cache its result (None = not found).
+        """
+        if not self.enabled:
+            return loader(order_id)
+        found, item = self.lookup(order_id)
+        if found:
+            return item
+        item = loader(order_id)
+        self.put(order_id, item)
+        return item
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+    def snapshot(self):
+        lookups = self.stats["hits"] + self.stats["negative_hits"] + self.stats["misses"]
+        hit_rate = (self.stats["hits"] + self.stats["negative_hits"]) / lookups if lookups else 0.0
+        return {**self.stats, "entries": len(self.entries), "bytes": self.total_bytes, "hit_rate": round(hit_rate, 3)}
+
+
+# (Optional) Benchmark: repeat-lookup agent sessions against a fake table with injected latency
+if __name__ == "__main__":
+    import argparse
+    import random
+
+    parser = argparse.ArgumentParser(description="Order cache benchmark")
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=8.0, help="simulated DynamoDB round trip")
+    args = parser.parse_args()
+
+    class FakeOrdersTable:
+        def __init__(self, n_orders, latency):
+            self.latency = latency
+            self.calls = 0
+            self.items = {f"ORD{i:05d}": {
+                "order_id": {"S": f"ORD{i:05d}"}, "name": {"S": "John Doe"}, "item": {"S": "A100 SmartWatch"},
+                "quantity": {"N": "1"}, "status": {"S": "Processing"}, "delivery_date": {"S": "2025-01-10"},
+                "shipping_address": {"S": "123 Main St, Anytown USA"},
+            } for i in range(n_orders)}
+
+        def get_item(self, order_id):
+            time.sleep(self.latency)
+            self.calls += 1
+            item = self.items.get(order_id)
+            return json.loads(json.dumps(item)) if item else None
+
+        def put_item(self, item):
+            time.sleep(self.latency)
+            self.calls += 1
+            self.items[item["order_id"]["S"]] = json.loads(json.dumps(item))
+
+    def session_workload(rng):
+        """
+        One agent session: 1-2 orders looked up 2-6 times each (status, follow-ups, before a cancel),
+        an occasional mistyped order ID, and a cancellation in 10% of sessions.
+        """
+        operations = []
+        for order_id in [f"ORD{rng.randrange(5000):05d}" for _ in range(rng.randint(1, 2))]:
+            operations += [("get", order_id)] * rng.randint(2, 6)
+            if rng.random() < 0.1:
+                operations += [("cancel", order_id), ("get", order_id)]
+        if rng.random() < 0.2:
+            operations += [("get", f"ORD9{rng.randrange(10000):04d}")] * 2
+        return operations
+
+    def run(cache):
+        table = FakeOrdersTable(5000, args.latency_ms / 1000)
+        rng = random.Random(7)
+        lookups = 0
+        start = time.perf_counter()
+        for _ in range(args.sessions):
+            for operation, order_id in session_workload(rng):
+                if operation == "get":
+                    lookups += 1
+                    if cache is None:
+                        table.get_item(order_id)
+                    else:
+                        cache.get_or_load(order_id, table.get_item)
+                else:  # cancel_order reads the table directly, writes, then refreshes the cache
+                    item = table.get_item(order_id)
+                    if item:
+                        item["status"] = {"S": "Cancelled"}
+                        table.put_item(item)
+                        if cache is not None:
+                            cache.put(order_id, item)
+        elapsed = time.perf_counter() - start
+        return elapsed, lookups, table.calls
+
+    for label, cache in [("no cache", None), ("OrderCache", OrderCache())]:
+        elapsed, lookups, calls = run(cache)
+        print(f"{label:<12} {lookups} lookups in {elapsed:6.2f} s "
+              f"({elapsed / lookups * 1000:5.2f} ms per lookup, {calls} table calls)")
+        if cache is not None:
+            print(f"             {cache.snapshot()}")
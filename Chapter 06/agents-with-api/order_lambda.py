@@ -1,53 +1,79 @@
 import boto3
+import itertools
 import json
 import logging
+import os
 import random
 import string
 from datetime import datetime, timedelta
 import time
 from botocore.exceptions import ClientError
+import instrumentation
+import profiling
+import pii_redaction
+from order_cache import OrderCache
 
 # Setup logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
+# Mask card numbers, emails, phone numbers and addresses in everything logged (events, responses)
+pii_redaction.install_logging_filter(logger)
 
 # Client
-dynamodb = boto3.client('dynamodb')
+dynamodb = instrumentation.instrument_client(boto3.client('dynamodb'))
 TABLE_NAME = "orders"
 
+# Container-scoped cache: lives as long as the warm Lambda container
+order_cache = OrderCache.from_env()
+# Cache statistics are logged once every this many order lookups, not on every request
+ORDER_CACHE_STATS_EVERY = max(1, int(os.environ.get("ORDER_CACHE_STATS_EVERY", 100)))
+_order_lookups = itertools.count(1)
+
+# Read order details from the table
+@instrumentation.timed("order.load_order")
+def load_order(order_id):
+    response = dynamodb.get_item(
+        TableName=TABLE_NAME,
+        Key={'order_id': {'S': order_id}}
+    )
+    if 'Item' in response:
+        return response['Item']
+    print(f"Order '{order_id}' not found.")
+    return None
+
 # Get order details
-def get_order_details(order_id):
+@instrumentation.timed("order.get_order_details")
+def get_order_details(order_id, use_cache=True):
     try:
-        response = dynamodb.get_item(
-            TableName=TABLE_NAME,
-            Key={'order_id': {'S': order_id}}
-        )
-        if 'Item' in response:
-            return response['Item']
-        else:
-            print(f"Order '{order_id}' not found.")
-            return None
+        if use_cache:
+            return order_cache.get_or_load(order_id, load_order)
+        return load_order(order_id)
     except ClientError as e:
         print(f"Error getting order details: {e.response['Error']['Message']}")
         return None
 
 # Cancel an order
+@instrumentation.timed("order.cancel_order")
 def cancel_order(order_id):
     try:
-        order_data = get_order_details(order_id)
+        # Always write on top of the current item, not a cached copy
+        order_data = get_order_details(order_id, use_cache=False)
         if order_data:
             order_data['status'] = {'S': 'Cancelled'}
             dynamodb.put_item(
                 TableName=TABLE_NAME,
                 Item=order_data
             )
+            order_cache.put(order_id, order_data)
             print(f"Order '{order_id}' has been cancelled.")
         else:
             print(f"Order '{order_id}' not found.")
     except ClientError as e:
+        order_cache.invalidate(order_id)
         print(f"Error cancelling order: {e.response['Error']['Message']}")
         
 # Create a new order
+@instrumentation.timed("order.place_order")
 def place_order(product_name, quantity, shipping_address, payment_method, name):
     order_id = generate_order_id()
     product_id = generate_product_id()
@@ -70,6 +96,7 @@ def place_order(product_name, quantity, shipping_address, payment_method, name):
             TableName=TABLE_NAME,
             Item=order_data
         )
+        order_cache.put(order_id, order_data)
         logger.info(f"Order '{order_data['order_id']}' created successfully.")
         return f"Order placed successfully! Order ID: {order_id}, Product ID: {product_id}, Product Name: {product_name}, Quantity: {quantity}, Estimated Delivery Date: {delivery_date}"
 
@@ -92,6 +119,8 @@ def generate_product_id():
     return f"PROD{product_id_number}"
 
 # Primary Handler 
+@profiling.profile_handler
+@instrumentation.instrument_handler
 def lambda_handler(event, context):
     logger.info("Received event: %s", json.dumps(event))
     
@@ -125,6 +154,11 @@ def lambda_handler(event, context):
             if order_id:
                 order_data = get_order_details(order_id)
                 responseBody = {'TEXT': {'body': json.dumps(order_data)}}
+                lookups = next(_order_lookups)
+                if lookups % ORDER_CACHE_STATS_EVERY == 0:
+                    logger.info(f"Order cache after {lookups} lookups: {order_cache.snapshot()}")
+                elif logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"Order cache: {order_cache.snapshot()}")
             else:
                 responseBody = {'TEXT': {'body': "Order ID is required"}}
         elif function == 'cancel-order':
@@ -0,0 +1,556 @@
+"""
+PII redaction for logs, fine-tuning data and documents before ingestion
+
+order_lambda logs every event with json.dumps(event), including customer names, shipping addresses
+and payment methods; Example81 fine-tunes on raw DialogSum dialogues that can contain card numbers;
+Chapter 05 ingests data/sample-transcript.pdf unfiltered. This module finds and masks card numbers,
+email addresses, phone numbers and street addresses with no dependency beyond the standard library,
+so it can be packaged next to the Lambda code as-is:
+
+- Redactor: one combined regular expression for all kinds, so each text is scanned once whatever
+  the number of kinds, and only the positions where a match can start are examined. Card candidates
+  are only masked when they pass the Luhn check, which keeps order, tracking and invoice numbers of
+  the same length readable. Address candidates need a house number of two or more digits or an
+  address keyword ("to", "at", "address") right before them, and are never masked after a quantity
+  or order word, so "quantity 3 Main St" or "Order 12 Days Of Christmas St" stay readable
+- RedactingFilter / install_logging_filter: a logging.Filter that masks formatted log messages
+- redact_jsonl: streaming JSONL transform (one record in memory at a time), e.g. for fine-tuning data
+- redact_chunks: filter for text chunks or {"text", "metadata"} documents before they are embedded
+- redact_parallel: order-preserving redaction of a large iterable of texts across worker processes
+- evaluate / EVALUATION_SET: labeled precision / recall test set
+
+Masked values are replaced by "[CARD]", "[EMAIL]", "[PHONE]" or "[ADDRESS]".
+
+Usage in order_lambda:
+
+    import pii_redaction
+
+    logger = logging.getLogger()
+    pii_redaction.install_logging_filter(logger)
+
+in Example81, after writing the training file (card-shaped numbers are masked whether or not they
+pass the Luhn check, so the model never learns to repeat one):
+
+    redactor = Redactor(luhn=False)
+    redact_jsonl("dialogsum-train.jsonl", "dialogsum-train.redacted.jsonl", fields=["prompt", "completion"],
+                 redactor=redactor, workers=os.cpu_count())
+
+and in Chapter 05, before chunking and embedding:
+
+    stats = ingest_pdf("data/sample-transcript.pdf", embed_fn, store, text_filter=Redactor().redact)
+"""
+
+import functools
+import json
+import logging
+import os
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+KINDS = ("CARD", "EMAIL", "PHONE", "ADDRESS")
+DEFAULT_REPLACEMENT = "[{kind}]"
+DEFAULT_BATCH_SIZE = 256
+
+_STREET_SUFFIXES = (
+    "Street|St|Avenue|Ave|Road|Rd|Boulevard|Blvd|Lane|Ln|Drive|Dr|Court|Ct|Way|Place|Pl|Parkway|Pkwy|"
+    "Circle|Cir|Terrace|Ter|Highway|Hwy|Square|Sq|Trail|Trl"
+)
+
+# The combined expression consumes the first character of every match from _FIRST: a pattern that
+# starts with a character set lets the regex engine skip ahead in C to the few positions where a match
+# can start, whereas alternatives that start with lookbehinds are tried at every position. Each
+# variant is (lookbehind, rest): the lookbehind checks that first character and the one before it
+# (a word boundary), rest matches the remainder. Emails are found from their "@" and extended back
+# over the local part. Where variants overlap, the first one listed wins: a 16-digit run is tried as
+# a card before a phone number.
+_FIRST = r"[\d+(@]"
+_FIRST_CHARS = re.compile(_FIRST)
+_DOMAIN = r"[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)*\.[A-Za-z]{2,}"
+_VARIANTS = {
+    "CARD": [
+        (r"(?<![\w+]\d)(?<=\d)", r"(?:[ -]?\d){12,18}(?![ -]?\d)"),                    # 4111 1111 1111 1111
+    ],
+    "PHONE": [
+        (r"(?<![\w+]\+)(?<=\+)", r"\d{1,3}[ .-]?(?:\(\d{1,4}\)[ .-]?)?\d{1,4}(?:[ .-]?\d{2,4}){1,3}(?!\w)"),
+        (r"(?<![\w+]1)(?<=1)", r"[ .-](?:\(\d{3}\) ?|\d{3}[ .-])\d{3}[ .-]\d{4}(?!\w)"),    # 1-800-555-0199
+        (r"(?<![\w+]\d)(?<=\d)", r"\d\d[ .-]\d{3}[ .-]\d{4}(?!\w)"),                     # 555-123-4567
+        (r"(?<![\w+]\()(?<=\()", r"\d{3}\) ?\d{3}[ .-]\d{4}(?!\w)"),                     # (555) 123-4567
+    ],
+    "ADDRESS": [
+        (r"(?<![\w-]\d)(?<=\d)",
+         r"\d{0,5}[A-Za-z]? (?:[A-Z][\w'.-]* ){1,4}?(?:" + _STREET_SUFFIXES + r")\b\.?"
+         r"(?: (?:[NS][EW]?|[EW])\b)?"                                                  # Ave N
+         r"(?:,? (?:Apt|Suite|Unit|#)\.? ?[\w-]+)?"                                     # , Apt 4B
+         r"(?:, [A-Z][a-z]+(?: [A-Z][a-z]+){0,2})?"                                     # , Anytown
+         r"(?:,? (?:[A-Z]{2}(?: \d{5}(?:-\d{4})?)?|USA)\b)?"),                          # , WA 98109 / USA
+    ],
+    "EMAIL": [
+        (r"(?<=[\w.%+-]@)", _DOMAIN),                                                  # john.doe@example.com
+    ],
+}
+# Text right before an address candidate: a keyword that introduces an address lets a one-digit
+# house number through; a quantity or order word means the number is a count, not a house number
+_ADDRESS_KEYWORD = re.compile(r"\b(?:to|at|address|addr|located|lives?|reside[sd]?|visit|from)\W{0,3}$",
+                              re.IGNORECASE)
+_QUANTITY_WORD = re.compile(r"\b(?:order(?:ed|s)?|bought|buy(?:ing)?|purchased?|quantity|qty|sold|x)\W{0,3}$",
+                            re.IGNORECASE)
+_ADDRESS_CONTEXT = 24
+# Digits directly followed by "@domain" are the local part of an email, not a card or phone number
+_NOT_EMAIL = r"(?![\w.%+-]*@" + _DOMAIN + ")"
+_EMAIL_LOCAL = "_.%+-"
+
+
+def _is_word(c):
+    return c.isalnum() or c == "_"
+
+
+def _address_context_ok(text, start):
+    before = text[max(0, start - _ADDRESS_CONTEXT):start]
+    if _QUANTITY_WORD.search(before):
+        return False
+    return text[start + 1:start + 2].isdigit() or _ADDRESS_KEYWORD.search(before) is not None
+
+
+_LUHN_DOUBLED = (0, 2, 4, 6, 8, 1, 3, 5, 7, 9)
+
+
+def luhn_valid(digits: str) -> bool:
+    total = 0
+    for i, c in enumerate(reversed(digits)):
+        d = ord(c) - 48
+        total += _LUHN_DOUBLED[d] if i & 1 else d
+    return total % 10 == 0
+
+
+class Redactor:
+    def __init__(self, kinds=KINDS, luhn=True, replacement=DEFAULT_REPLACEMENT):
+        unknown = set(kinds) - set(KINDS)
+        if unknown:
+            raise ValueError(f"Unknown PII kinds: {sorted(unknown)}")
+        self.kinds = tuple(kind for kind in KINDS if kind in kinds)
+        self.luhn = luhn
+        self.replacement = replacement
+        self._replacements = {kind: replacement.format(kind=kind) for kind in self.kinds}
+        self._group_kinds = {}
+        branches = []
+        for kind in self.kinds:
+            for i, (lookbehind, rest) in enumerate(_VARIANTS[kind]):
+                name = f"{kind}_{i}"
+                self._group_kinds[name] = kind
+                branches.append(f"(?P<{name}>{lookbehind}{rest}{'' if kind == 'EMAIL' else _NOT_EMAIL})")
+        self.pattern = re.compile(f"{_FIRST}(?:{'|'.join(branches)})")
+
+    def spans(self, text: str) -> Iterator[tuple]:
+        """
+        Yield the (kind, start, end) spans to mask, left to right.
+        """
+        position = 0  # end of the last match, masked or not
+        for match in self.pattern.finditer(text):
+            kind = self._group_kinds[match.lastgroup]
+            start, end = match.span()
+            if kind == "EMAIL":
+                while start > position and (_is_word(text[start - 1]) or text[start - 1] in _EMAIL_LOCAL):
+                    start -= 1
+                if start == match.start():
+                    continue
+            elif kind == "CARD" and self.luhn:
+                if not luhn_valid(text[start:end].replace(" ", "").replace("-", "")):
+                    position = end
+                    continue
+            elif kind == "ADDRESS" and not _address_context_ok(text, start):
+                position = end
+                continue
+            position = end
+            yield kind, start, end
+
+    def redact(self, text: str) -> str:
+        pieces, position = [], 0
+        for kind, start, end in self.spans(text):
+            pieces.append(text[position:start])
+            pieces.append(self._replacements[kind])
+            position = end
+        if not pieces:
+            return text
+        pieces.append(text[position:])
+        return "".join(pieces)
+
+    def find(self, text: str) -> List[tuple]:
+        return list(self.spans(text))
+
+    def redact_value(self, value):
+        """
+        Redact every string inside a JSON-like value (dicts, lists, strings); keys are kept.
+        """
+        if isinstance(value, str):
+            return self.redact(value)
+        if isinstance(value, dict):
+            return {key: self.redact_value(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self.redact_value(item) for item in value]
+        return value
+
+
+_default_redactor = None
+
+
+def get_redactor() -> Redactor:
+    global _default_redactor
+    if _default_redactor is None:
+        _default_redactor = Redactor()
+    return _default_redactor
+
+
+def redact(text: str) -> str:
+    return get_redactor().redact(text)
+
+
+###############################################################################
+## Logging
+
+class RedactingFilter(logging.Filter):
+    """
+    Masks PII in the formatted message of every record passing through. The record keeps the
+    redacted message with args cleared, so handlers do not format the original arguments again.
+    """
+
+    def __init__(self, redactor: Optional[Redactor] = None):
+        super().__init__()
+        self.redactor = redactor or get_redactor()
+
+    def filter(self, record):
+        try:
+            message = record.getMessage()
+        except Exception:
+            # Bad format arguments: leave the record alone so logging reports it as usual
+            return True
+        redacted = self.redactor.redact(message)
+        if redacted != message:
+            record.msg, record.args = redacted, None
+        return True
+
+
+def install_logging_filter(target: Optional[logging.Logger] = None, redactor: Optional[Redactor] = None):
+    """
+    Attach a RedactingFilter to a logger (default: the root logger) and to its handlers. Logger
+    filters only see records logged on that logger itself; handler filters also see records that
+    propagate from child loggers. Calling this again does not add a second filter.
+    """
+    target = target or logging.getLogger()
+    log_filter = RedactingFilter(redactor)
+    for filterer in [target, *target.handlers]:
+        if not any(isinstance(f, RedactingFilter) for f in filterer.filters):
+            filterer.addFilter(log_filter)
+    return log_filter
+
+
+###############################################################################
+## Bulk redaction
+
+_worker_redactor = None
+
+
+def _init_worker(kinds, luhn, replacement):
+    global _worker_redactor
+    _worker_redactor = Redactor(kinds, luhn, replacement)
+
+
+def _redact_texts(texts, redactor=None):
+    redactor = redactor or _worker_redactor
+    return [redactor.redact(text) for text in texts]
+
+
+def _redact_lines(lines, fields=None, redactor=None):
+    """
+    Redact a batch of JSONL lines; returns (output line, changed) pairs.
+    """
+    redactor = redactor or _worker_redactor
+    results = []
+    for line in lines:
+        if not _FIRST_CHARS.search(line):
+            results.append((line.rstrip("\n"), False))  # no character a match can start with
+            continue
+        record = json.loads(line)
+        if fields is None:
+            redacted = redactor.redact_value(record)
+        else:
+            redacted = dict(record)
+            for field in fields:
+                if field in redacted:
+                    redacted[field] = redactor.redact_value(redacted[field])
+        if redacted == record:
+            results.append((line.rstrip("\n"), False))
+        else:
+            results.append((json.dumps(redacted, ensure_ascii=False), True))
+    return results
+
+
+def _batches(items, batch_size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _map_batches(batch_fn, items, redactor, workers, batch_size, window):
+    """
+    Apply batch_fn to batches of items, in this process or across worker processes, and yield
+    the results in input order. At most `window` batches are in flight so memory stays bounded.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for batch in _batches(items, batch_size):
+            yield from batch_fn(batch, redactor=redactor)
+        return
+
+    window = window or workers * 4
+    in_flight = deque()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(redactor.kinds, redactor.luhn, redactor.replacement)) as executor:
+        for batch in _batches(items, batch_size):
+            in_flight.append(executor.submit(batch_fn, batch))
+            if len(in_flight) >= window:
+                yield from in_flight.popleft().result()
+        while in_flight:
+            yield from in_flight.popleft().result()
+
+
+def redact_parallel(texts: Iterable[str], redactor: Optional[Redactor] = None, workers: Optional[int] = None,
+                    batch_size: int = DEFAULT_BATCH_SIZE, window: Optional[int] = None) -> Iterator[str]:
+    """
+    Redact a stream of texts across worker processes (default: one per core), yielding results in
+    input order. Texts are sent in batches of `batch_size`.
+    """
+    return _map_batches(_redact_texts, texts, redactor or get_redactor(), workers, batch_size, window)
+
+
+def redact_jsonl(source, destination, fields: Optional[List[str]] = None, redactor: Optional[Redactor] = None,
+                 workers: Optional[int] = 1, batch_size: int = DEFAULT_BATCH_SIZE) -> Dict:
+    """
+    Streaming JSONL transform: read `source`, redact every string value (or only those under the
+    top-level `fields`) of each record and write it to `destination`. Both may be paths or open
+    text files. Pass workers=None to use every core. Returns record counts.
+    """
+    redactor = redactor or get_redactor()
+    stats = {"records": 0, "redacted": 0}
+    source_file = open(source, encoding="utf-8") if isinstance(source, (str, os.PathLike)) else source
+    destination_file = (open(destination, "w", encoding="utf-8") if isinstance(destination, (str, os.PathLike))
+                        else destination)
+    try:
+        lines = (line for line in source_file if line.strip())
+        batch_fn = functools.partial(_redact_lines, fields=fields)
+        for line, changed in _map_batches(batch_fn, lines, redactor, workers, batch_size, None):
+            destination_file.write(line + "\n")
+            stats["records"] += 1
+            stats["redacted"] += changed
+    finally:
+        if source_file is not source:
+            source_file.close()
+        if destination_file is not destination:
+            destination_file.close()
+    logger.info(f"Redacted {stats['redacted']} of {stats['records']} records")
+    return stats
+
+
+def redact_chunks(chunks: Iterable, redactor: Optional[Redactor] = None) -> Iterator:
+    """
+    Filter for text chunks before ingestion: accepts strings or {"text", "metadata"} documents
+    (e.g. from pdf_ingestion.stream_page_documents) and yields them redacted.
+    """
+    redactor = redactor or get_redactor()
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            yield redactor.redact(chunk)
+        else:
+            yield dict(chunk, text=redactor.redact(chunk["text"] or ""))
+
+
+###############################################################################
+## Evaluation
+
+# Labeled test set: PII is marked up as {{KIND:value}}; everything else must be left alone. The
+# second half are hard negatives that look like PII: order IDs, timestamps, prices, dates, versions
+# and a card-shaped number that fails the Luhn check (the placeholder in Example81's test prompt).
+EVALUATION_SET = [
+    "Person A: Sure, my card number is {{CARD:4111 1111 1111 1111}}.",
+    "Charge it to {{CARD:5500-0000-0000-0004}} please.",
+    "Amex {{CARD:378282246310005}} expires 12/27",
+    "Payment method: Visa {{CARD:4012888888881881}}",
+    "Discover card {{CARD:6011 1111 1111 1117}} was declined",
+    "Send the receipt to {{EMAIL:john.doe@example.com}}",
+    "Contact: {{EMAIL:jane_smith+orders@mail.example.co.uk}}.",
+    "#Person1#: My email is {{EMAIL:t.nguyen@example.org}}, call me at {{PHONE:(206) 555-0142}}",
+    "Call {{PHONE:555-123-4567}} or {{PHONE:1-800-555-0199}} after 5pm",
+    "Our London office: {{PHONE:+44 20 7946 0958}}",
+    "Reach me on {{PHONE:+1 425.555.0100}} tomorrow",
+    "You can text {{PHONE:555.867.5309}} anytime",
+    "Ship to {{ADDRESS:123 Main St, Anytown USA}}",
+    "Deliver to {{ADDRESS:410 Terry Ave N, Seattle, WA 98109}} by Friday",
+    "My new address is {{ADDRESS:42 Wallaby Way, Sydney}}.",
+    "Return it to {{ADDRESS:1600 Pennsylvania Avenue, Washington, DC 20500}}",
+    "Leave it at {{ADDRESS:77 Oak Lane Apt 4B}} with the doorman",
+    "The pickup point is at {{ADDRESS:9 Elm Street}}, ask for {{EMAIL:front.desk@example.net}}",
+    '{"name": "John Doe", "shipping_address": "{{ADDRESS:55 Market Street, San Francisco, CA 94105}}", '
+    '"payment_method": "Credit Card {{CARD:4242 4242 4242 4242}}"}',
+    # Known misses: digits-only phone numbers are left alone so timestamps and IDs are not masked,
+    # addresses without a street number and suffix are not recognized, and a one-digit house number
+    # needs an address keyword before it
+    "Call me back at {{PHONE:2065550142}}",
+    "Mail it to {{ADDRESS:PO Box 1234, Springfield}}",
+    "{{ADDRESS:9 Elm Street}} is the pickup point",
+    "Person A: Sure, it's 1234-5678-9012-3456.",
+    "Order ORD12345 shipped on 2024-01-15 and arrives 2024-01-20",
+    "Tracking number 9400 1000 0000 0000 0000 00 is in transit",
+    "Timestamp 1700000000 refund of $1,299.99 for 2 items",
+    "Upgraded from version 1.2.3 to 2.0.10 yesterday",
+    "Invoice INV-2024-000123 totals 4,500 units",
+    "We sold 3 Main items and 12 Street lamps",
+    "Updated quantity 3 Main St on the order",
+    "I bought 2 Apple Pie Dr yesterday",
+    "Order 12 Days Of Christmas St has shipped",
+    "Meeting at 10:30 in room 4B, extension 4471",
+    "The ISBN is 978-0-306-40615-7",
+    "Email me at the office, the @handle is @johndoe",
+    "Batch 20240115-0001 processed 123456 records in 7.5 s",
+    "Product A100 SmartWatch costs $199 and B200 costs $89",
+    "Account 1234567890123 is closed",
+]
+
+_LABEL = re.compile(r"\{\{(\w+):(.*?)\}\}")
+
+
+def parse_labeled(example: str):
+    """
+    Strip {{KIND:value}} markup; returns the plain text and its (kind, start, end) spans.
+    """
+    text, spans, position = [], [], 0
+    for match in _LABEL.finditer(example):
+        text.append(example[position:match.start()])
+        start = sum(map(len, text))
+        text.append(match.group(2))
+        spans.append((match.group(1), start, start + len(match.group(2))))
+        position = match.end()
+    text.append(example[position:])
+    return "".join(text), spans
+
+
+def evaluate(redactor: Optional[Redactor] = None, examples=EVALUATION_SET) -> Dict:
+    """
+    Span-level precision and recall per kind. A prediction counts as a true positive when it
+    overlaps a labeled span of the same kind.
+    """
+    redactor = redactor or get_redactor()
+    counts = {kind: {"tp": 0, "fp": 0, "fn": 0} for kind in redactor.kinds}
+    for example in examples:
+        text, expected = parse_labeled(example)
+        predicted = redactor.find(text)
+
+        def overlaps(span, spans):
+            return any(kind == span[0] and start < span[2] and span[1] < end for kind, start, end in spans)
+
+        for span in predicted:
+            counts[span[0]]["tp" if overlaps(span, expected) else "fp"] += 1
+        for span in expected:
+            if span[0] in counts and not overlaps(span, predicted):
+                counts[span[0]]["fn"] += 1
+
+    results = {}
+    total = {"tp": 0, "fp": 0, "fn": 0}
+    for kind, count in [*counts.items(), ("ALL", total)]:
+        if kind != "ALL":
+            for key in total:
+                total[key] += count[key]
+        predicted, expected = count["tp"] + count["fp"], count["tp"] + count["fn"]
+        results[kind] = dict(count, precision=count["tp"] / predicted if predicted else 1.0,
+                             recall=count["tp"] / expected if expected else 1.0)
+    return results
+
+
+# (Optional) Benchmark: precision / recall on EVALUATION_SET and redaction throughput in MB/s
+if __name__ == "__main__":
+    import argparse
+    import io
+    import random
+    import time
+
+    parser = argparse.ArgumentParser(description="PII redaction evaluation and throughput benchmark")
+    parser.add_argument("--megabytes", type=float, default=32)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--pii-rate", type=float, default=0.2, help="fraction of lines containing PII")
+    args = parser.parse_args()
+
+    print("Precision / recall on EVALUATION_SET:")
+    for label, redactor in [("luhn=True", Redactor()), ("luhn=False", Redactor(luhn=False))]:
+        results = evaluate(redactor)
+        print(f"  {label}")
+        for kind, result in results.items():
+            print(f"    {kind:<8} precision {result['precision']:.2f}  recall {result['recall']:.2f}  "
+                  f"(tp {result['tp']}, fp {result['fp']}, fn {result['fn']})")
+
+    # Synthetic corpus: DialogSum-style dialogue turns, agent events and order log lines, a fraction
+    # of them with PII from EVALUATION_SET
+    rng = random.Random(7)
+    words = ("the order was delayed and I would like to know when it arrives please check the status of "
+             "my refund thank you for your help we apologize for the inconvenience item shipped today").split()
+    fillers = [f"#Person{rng.randint(1, 2)}#: " + " ".join(rng.choices(words, k=rng.randint(8, 30))) + "."
+               for _ in range(400)]
+    fillers += [json.dumps({"actionGroup": "order-action-group", "function": "retrieve-order-tracking-info",
+                            "sessionId": str(rng.randrange(10**15)),
+                            "parameters": [{"name": "order_id", "value": f"ORD{rng.randrange(10**5):05d}"}]})
+                for _ in range(100)]
+    fillers += [f"Order ORD{rng.randrange(10**5):05d} updated at 2024-01-{rng.randint(10, 28)} "
+                f"{rng.randint(10, 23)}:{rng.randint(10, 59)}, {rng.randint(1, 5)} items, ${rng.randint(5, 500)}.99"
+                for _ in range(100)]
+    pii_lines = [parse_labeled(example)[0] for example in EVALUATION_SET]
+    lines, size = [], 0
+    while size < args.megabytes * 2**20:
+        line = rng.choice(pii_lines if rng.random() < args.pii_rate else fillers)
+        lines.append(line)
+        size += len(line) + 1
+    megabytes = size / 2**20
+    documents = ["\n".join(lines[i:i + 500]) for i in range(0, len(lines), 500)]  # page-sized texts
+
+    def throughput(label, run):
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        print(f"  {label:<36} {megabytes / elapsed:7.1f} MB/s ({elapsed:.2f} s)")
+
+    print(f"\nThroughput on {megabytes:.1f} MB ({len(lines)} lines, {os.cpu_count()} CPUs):")
+    redactor = Redactor()
+    per_kind = [Redactor(kinds=[kind]) for kind in KINDS]
+
+    def redact_per_kind(text):
+        for kind_redactor in per_kind:
+            text = kind_redactor.redact(text)
+        return text
+
+    throughput("one pass per kind, per line", lambda: [redact_per_kind(line) for line in lines])
+    throughput("Redactor, per line", lambda: [redactor.redact(line) for line in lines])
+    throughput("Redactor, per document", lambda: [redactor.redact(document) for document in documents])
+    throughput(f"redact_parallel, workers={args.workers or os.cpu_count()}",
+               lambda: sum(1 for _ in redact_parallel(documents, redactor, workers=args.workers, batch_size=1)))
+    jsonl = "".join(json.dumps({"prompt": line, "completion": "topic"}) + "\n" for line in lines)
+    throughput("redact_jsonl, fields=['prompt']",
+               lambda: redact_jsonl(io.StringIO(jsonl), io.StringIO(), fields=["prompt"], redactor=redactor))
+
+    # Logging filter overhead per record (the order_lambda event log line)
+    event = {"actionGroup": "order-action-group", "function": "place-order", "parameters": [
+        {"name": "shipping_address", "value": "123 Main St, Anytown USA"},
+        {"name": "payment_method", "value": "Credit Card 4111 1111 1111 1111"}]}
+    record = logging.LogRecord("order", logging.INFO, __file__, 0, "Received event: %s", (json.dumps(event),), None)
+    log_filter = RedactingFilter(redactor)
+    n = 20000
+    start = time.perf_counter()
+    for _ in range(n):
+        record.msg, record.args = "Received event: %s", (json.dumps(event),)
+        log_filter.filter(record)
+    print(f"\nRedactingFilter: {(time.perf_counter() - start) / n * 1e6:.1f} us per event record -> "
+          f"{record.getMessage()}")
@@ -0,0 +1,402 @@
+"""
+On-demand profiling for the order and return/refund Lambda handlers
+
+profile_handler wraps lambda_handler and profiles selected invocations only. Selection is controlled
+by the function's environment, never by the caller:
+
+- 1 in N invocations when PROFILING_SAMPLE_EVERY=N is set
+- with PROFILING_EVENT_FLAG=true, also every invocation whose event carries a top-level
+  "profile": true (a console or CLI test invoke; Bedrock builds agent events itself, so end users
+  cannot set it, unlike sessionAttributes)
+
+A profiled invocation writes, to PROFILING_DIR (default /tmp/profiles):
+
+- <name>.collapsed: sampled call stacks in collapsed format (flamegraph.pl, speedscope)
+- <name>.pstats: deterministic cProfile statistics (PROFILING_MODE=cprofile instead of sampling)
+- <name>.alloc.collapsed: bytes still allocated at the end of the call, per allocation stack
+- <name>.json: duration, peak traced memory and sample count
+- events.jsonl, only with PROFILING_RECORD_EVENTS=true: the profiled event with PII masked by
+  pii_redaction, so it can be replayed offline
+
+The oldest profiles are deleted once PROFILING_DIR grows past PROFILING_MAX_BYTES (default 64 MiB,
+an eighth of Lambda's default /tmp), and events.jsonl is rotated to events.jsonl.1 past
+PROFILING_EVENTS_MAX_BYTES.
+
+When no invocation is selected the wrapper does one counter check and one dict lookup.
+
+Usage:
+
+    @profiling.profile_handler
+    @instrumentation.instrument_handler
+    def lambda_handler(event, context): ...
+
+Replay recorded events offline with profiling forced on. Replay calls the real handler, so events
+for actions that write to DynamoDB (MUTATING_FUNCTIONS) are skipped unless --allow-mutations is
+given, which should only be used against a test table:
+
+    python profiling.py replay events.jsonl --handler returnrefund_lambda.lambda_handler --out ./profiles
+"""
+
+import cProfile
+import functools
+import importlib
+import itertools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+import pii_redaction
+
+logger = logging.getLogger(__name__)
+
+EVENT_FLAG = "profile"
+EVENTS_FILE = "events.jsonl"
+DEFAULT_PROFILING_DIR = "/tmp/profiles"
+DEFAULT_SAMPLE_INTERVAL_SECONDS = 0.0005
+DEFAULT_MAX_BYTES = 64 * 2**20
+DEFAULT_EVENTS_MAX_BYTES = 4 * 2**20
+ALLOCATION_FRAMES = 32
+# Action group functions whose handlers write to DynamoDB; replay skips them by default
+MUTATING_FUNCTIONS = {"place-order", "cancel-order"}
+
+
+def _env_flag(name, default):
+    return os.environ.get(name, default).lower() in ("1", "true", "yes", "on")
+
+
+class ProfilingConfig:
+    def __init__(self):
+        self.sample_every = int(os.environ.get("PROFILING_SAMPLE_EVERY", "0"))
+        self.event_flag = _env_flag("PROFILING_EVENT_FLAG", "false")
+        self.output_dir = os.environ.get("PROFILING_DIR", DEFAULT_PROFILING_DIR)
+        self.mode = os.environ.get("PROFILING_MODE", "sample").lower()
+        self.memory = _env_flag("PROFILING_MEMORY", "true")
+        self.record_events = _env_flag("PROFILING_RECORD_EVENTS", "false")
+        self.max_bytes = int(os.environ.get("PROFILING_MAX_BYTES", DEFAULT_MAX_BYTES))
+        self.events_max_bytes = int(os.environ.get("PROFILING_EVENTS_MAX_BYTES", DEFAULT_EVENTS_MAX_BYTES))
+        self.interval = float(os.environ.get("PROFILING_INTERVAL", DEFAULT_SAMPLE_INTERVAL_SECONDS))
+        self.calls = 0
+
+
+config = ProfilingConfig()
+# Names profiles of invocations without a Lambda context (local runs), which have no request id
+_local_invocations = itertools.count(1)
+
+
+def configure(**kwargs):
+    for key, value in kwargs.items():
+        if not hasattr(config, key):
+            raise AttributeError(f"Unknown profiling setting '{key}'")
+        setattr(config, key, value)
+    return config
+
+
+class StackSampler:
+    """
+    Samples the call stack of one thread at a fixed interval and counts collapsed stacks.
+    """
+
+    def __init__(self, thread_id, interval=DEFAULT_SAMPLE_INTERVAL_SECONDS):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.active = True
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="stack-sampler")
+
+    @staticmethod
+    def _frame_label(frame):
+        code = frame.f_code
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(self._frame_label(frame))
+                frame = frame.f_back
+            # Samples taken once the profiled block has ended would only show the profiler itself
+            if stack and self.active:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def __enter__(self):
+        # The handler thread only yields the GIL every switch interval (5 ms by default)
+        self._switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(min(self._switch_interval, self.interval))
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        sys.setswitchinterval(self._switch_interval)
+        return False
+
+
+def write_collapsed(path, stacks):
+    with open(path, "w") as f:
+        for stack, count in stacks.most_common():
+            f.write(f"{stack} {count}\n")
+
+
+def allocation_stacks(snapshot):
+    """
+    Collapse a tracemalloc snapshot into {stack: bytes}, oldest frame first.
+    """
+    snapshot = snapshot.filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+    ])
+    stacks = Counter()
+    for stat in snapshot.statistics("traceback"):
+        stack = ";".join(f"{os.path.basename(frame.filename)}:{frame.lineno}" for frame in stat.traceback)
+        stacks[stack] += stat.size
+    return stacks
+
+
+def enforce_size_limit(output_dir, max_bytes, keep=()):
+    """
+    Delete the oldest files in output_dir until it holds at most max_bytes. Files named in `keep`
+    are never deleted. Returns the number of files removed.
+    """
+    files = []
+    for entry in os.scandir(output_dir):
+        if entry.is_file() and entry.name not in keep:
+            stat = entry.stat()
+            files.append((stat.st_mtime, entry.path, stat.st_size))
+    total = sum(size for _, _, size in files)
+    removed = 0
+    for _, path, size in sorted(files):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+    return removed
+
+
+def record_event(event, output_dir, max_bytes=DEFAULT_EVENTS_MAX_BYTES):
+    """
+    Append the event, PII masked, to output_dir/events.jsonl, rotating the file to events.jsonl.1
+    once it exceeds max_bytes.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, EVENTS_FILE)
+    if os.path.exists(path) and os.path.getsize(path) >= max_bytes:
+        os.replace(path, f"{path}.1")
+    with open(path, "a") as f:
+        f.write(json.dumps(pii_redaction.get_redactor().redact_value(event), default=str) + "\n")
+
+
+class InvocationProfiler:
+    """
+    Profiles one block of code (a handler invocation) and writes the results to output_dir, deleting
+    the oldest files there once it exceeds max_bytes (None: no limit).
+    """
+
+    def __init__(self, name, output_dir, mode="sample", memory=True, interval=DEFAULT_SAMPLE_INTERVAL_SECONDS,
+                 max_bytes=None):
+        self.name = name
+        self.output_dir = output_dir
+        self.mode = mode
+        self.memory = memory
+        self.interval = interval
+        self.max_bytes = max_bytes
+        self.stacks = Counter()
+        self.allocations = Counter()
+        self.summary = {}
+
+    def __enter__(self):
+        # Start the profiler before tracemalloc so its own thread and buffers are not traced
+        if self.mode == "cprofile":
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            self._profiler = StackSampler(threading.get_ident(), self.interval).__enter__()
+        self._started_tracemalloc = False
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start(ALLOCATION_FRAMES)
+            self._started_tracemalloc = True
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        duration = time.perf_counter() - self._start
+        if self.mode != "cprofile":
+            self._profiler.active = False
+        peak = 0
+        if self.memory and tracemalloc.is_tracing():
+            self.allocations = allocation_stacks(tracemalloc.take_snapshot())
+            peak = tracemalloc.get_traced_memory()[1]
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+        if self.mode == "cprofile":
+            self._profiler.disable()
+        else:
+            self._profiler.__exit__(*exc)
+            self.stacks = self._profiler.stacks
+        self.summary = {"name": self.name, "duration_ms": duration * 1000, "peak_traced_bytes": peak,
+                        "samples": sum(self.stacks.values()), "mode": self.mode}
+        try:
+            self._write()
+        except OSError as e:
+            logger.warning(f"Could not write profile {self.name}: {e}")
+        return False
+
+    def _write(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        base = os.path.join(self.output_dir, self.name)
+        if self.mode == "cprofile":
+            self._profiler.dump_stats(f"{base}.pstats")
+        else:
+            write_collapsed(f"{base}.collapsed", self.stacks)
+        if self.allocations:
+            write_collapsed(f"{base}.alloc.collapsed", self.allocations)
+        with open(f"{base}.json", "w") as f:
+            json.dump(self.summary, f)
+        if self.max_bytes is not None:
+            removed = enforce_size_limit(self.output_dir, self.max_bytes, keep=(EVENTS_FILE,))
+            if removed:
+                logger.info(f"Deleted {removed} old profile files from {self.output_dir}")
+
+
+def _requested(event):
+    return config.event_flag and type(event) is dict and event.get(EVENT_FLAG) is True
+
+
+def profile_handler(fn):
+    """
+    Decorator for a Lambda handler; see the module docstring for how invocations are selected.
+    """
+    handler_name = f"{fn.__module__}.{fn.__name__}"
+
+    @functools.wraps(fn)
+    def wrapper(event, context):
+        selected = False
+        if config.sample_every:
+            config.calls += 1
+            selected = config.calls % config.sample_every == 0
+        if not selected and not _requested(event):
+            return fn(event, context)
+
+        request_id = getattr(context, "aws_request_id", None) or f"{os.getpid()}-{next(_local_invocations)}"
+        name = f"{handler_name}-{time.strftime('%Y%m%dT%H%M%S')}-{request_id}"
+        if config.record_events:
+            try:
+                record_event(event, config.output_dir, config.events_max_bytes)
+            except OSError as e:
+                logger.warning(f"Could not record event: {e}")
+        with InvocationProfiler(name, config.output_dir, config.mode, config.memory, config.interval,
+                                config.max_bytes) as profiler:
+            response = fn(event, context)
+        logger.info(f"Profiled invocation: {json.dumps(profiler.summary)}")
+        return response
+
+    wrapper.__profiled__ = True
+    return wrapper
+
+
+def load_events(path):
+    """
+    Read events from a JSON list or a JSON-lines file.
+    """
+    with open(path) as f:
+        content = f.read().strip()
+    if content.startswith("["):
+        return json.loads(content)
+    return [json.loads(line) for line in content.splitlines() if line.strip()]
+
+
+def load_handler(spec):
+    module_name, _, function_name = spec.rpartition(".")
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def replay(events, handler, output_dir, repeat=1, mode="sample", memory=True, interval=DEFAULT_SAMPLE_INTERVAL_SECONDS,
+           allow_mutations=False):
+    """
+    Run every event through the handler `repeat` times with profiling on, writing one profile per
+    invocation plus combined.collapsed / combined.alloc.collapsed across all of them.
+
+    The handler is the live one, so events calling MUTATING_FUNCTIONS are skipped unless
+    allow_mutations is set (point the handler at a test table first).
+    """
+    configure(sample_every=0, event_flag=False, output_dir=output_dir, mode=mode, memory=memory, interval=interval,
+              record_events=False)
+    if not allow_mutations:
+        mutating = [event for event in events if event.get("function") in MUTATING_FUNCTIONS]
+        if mutating:
+            logger.warning(f"Skipping {len(mutating)} events that would write to DynamoDB "
+                           f"({', '.join(sorted({e['function'] for e in mutating}))}); pass allow_mutations=True "
+                           "to replay them against a test table")
+            events = [event for event in events if event.get("function") not in MUTATING_FUNCTIONS]
+    if not events:
+        raise ValueError("No events to replay")
+    # The decorated handler would profile again; unwrap to profile each invocation exactly once here
+    handler = getattr(handler, "__wrapped__", handler) if getattr(handler, "__profiled__", False) else handler
+    combined_stacks, combined_allocations, durations = Counter(), Counter(), []
+    for iteration in range(repeat):
+        for index, event in enumerate(events):
+            with InvocationProfiler(f"replay-{iteration:03d}-{index:05d}", output_dir, mode, memory, interval) as profiler:
+                handler(event, None)
+            combined_stacks.update(profiler.stacks)
+            combined_allocations.update(profiler.allocations)
+            durations.append(profiler.summary["duration_ms"])
+    os.makedirs(output_dir, exist_ok=True)
+    if combined_stacks:
+        write_collapsed(os.path.join(output_dir, "combined.collapsed"), combined_stacks)
+    if combined_allocations:
+        write_collapsed(os.path.join(output_dir, "combined.alloc.collapsed"), combined_allocations)
+    durations.sort()
+    return {"invocations": len(durations), "p50_ms": durations[len(durations) // 2],
+            "p99_ms": durations[min(len(durations) - 1, int(len(durations) * 0.99))]}
+
+
+# (Optional) Offline replay CLI and disabled-path overhead benchmark
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Lambda handler profiling tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    replay_parser = commands.add_parser("replay", help="replay recorded events with profiling on")
+    replay_parser.add_argument("events", help="JSON list or JSON-lines file of handler events")
+    replay_parser.add_argument("--handler", default="order_lambda.lambda_handler")
+    replay_parser.add_argument("--out", default="./profiles")
+    replay_parser.add_argument("--repeat", type=int, default=1)
+    replay_parser.add_argument("--mode", choices=["sample", "cprofile"], default="sample")
+    replay_parser.add_argument("--no-memory", action="store_true")
+    replay_parser.add_argument("--interval", type=float, default=DEFAULT_SAMPLE_INTERVAL_SECONDS)
+    replay_parser.add_argument("--allow-mutations", action="store_true",
+                               help=f"also replay {', '.join(sorted(MUTATING_FUNCTIONS))} (use a test table)")
+    commands.add_parser("bench", help="measure the cost of the disabled path")
+    args = parser.parse_args()
+
+    if args.command == "replay":
+        sys.path.insert(0, os.getcwd())
+        logging.basicConfig(level=logging.INFO)
+        result = replay(load_events(args.events), load_handler(args.handler), args.out, args.repeat,
+                        args.mode, not args.no_memory, args.interval, args.allow_mutations)
+        print(json.dumps(result))
+        print(f"Profiles written to {args.out}; render with: flamegraph.pl {args.out}/combined.collapsed > flame.svg")
+    else:
+        def handler(event, context):
+            return {"messageVersion": event["messageVersion"]}
+
+        profiled = profile_handler(handler)
+        event = {"messageVersion": "1.0", "actionGroup": "order-action-group", "sessionAttributes": {}}
+        configure(sample_every=0)
+        n = 500_000
+        for label, fn in [("plain handler", handler), ("profile_handler, disabled", profiled)]:
+            start = time.perf_counter_ns()
+            for _ in range(n):
+                fn(event, None)
+            print(f"{label:<28} {(time.perf_counter_ns() - start) / n:6.0f} ns per call")
@@ -1,10 +1,15 @@
 import json
 import logging
 from datetime import datetime
+import instrumentation
+import profiling
+import pii_redaction
 
 # Setup logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
+# Mask card numbers, emails, phone numbers and addresses in everything logged (events, responses)
+pii_redaction.install_logging_filter(logger)
 
 orders_db = {
     "ORD12345": {
@@ -57,6 +62,7 @@ orders_db = {
 }
 
 
+@instrumentation.timed("returnrefund.initiate_return")
 def initiate_return(order_id, reason):
     """
     Process a return request for a customer order and update the order history. In practice, you will update the database or call system apis
@@ -76,6 +82,7 @@ def initiate_return(order_id, reason):
     else:
         return {"message": f"No order found with ID {order_id}"}
 
+@instrumentation.timed("returnrefund.process_refund")
 def process_refund(order_id):
     """
     Process a refund request for a customer order and update the order history.
@@ -102,6 +109,8 @@ def get_current_timestamp():
     return datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
 
 # Primary Handler
+@profiling.profile_handler
+@instrumentation.instrument_handler
 def lambda_handler(event, context):
     logger.info("Received event: %s", json.dumps(event))
 
@@ -0,0 +1,288 @@
+"""
+Concurrent sub-agent fan-out and fast-path routing for the Example75 multi-agent system
+
+In Example75 every message goes through orchestrator_agent, which then calls the order and
+inventory agents as tools one after another: a request such as "check availability and create an
+order" pays for several sequential LLM round trips. This module adds:
+
+- IntentRouter: a local, rule-based router that sends obvious single-domain requests straight to
+  the specialist agent, skipping the orchestrator
+- AgentOrchestrator: runs independent specialist calls concurrently under asyncio with per-call
+  timeouts, runs dependent ones (inventory before order creation) in stages, and only falls back
+  to the orchestrator agent when the router cannot classify the request. A specialist that fails
+  or times out is reported in the answer instead of failing the whole request, and the stages
+  that depend on it (placing an order without a stock check) are skipped
+- OpenTelemetry spans for routing, every specialist call and the final synthesis, so latency can be
+  attributed to each stage
+
+Any callable agent works (Strands Agent instances are callable); agents exposing invoke_async are
+awaited directly. Usage in Example75:
+
+    orchestration = AgentOrchestrator(
+        specialists={"order": order_agent, "inventory": inventory_agent},
+        fallback=orchestrator_agent,
+    )
+    response = orchestration.process("CUST001", "Do you have MacBook Pro in stock?")
+"""
+
+import asyncio
+import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from opentelemetry import trace
+
+logger = logging.getLogger(__name__)
+tracer = trace.get_tracer(__name__)
+
+DEFAULT_TIMEOUT_SECONDS = 60
+# Threads for synchronous agents; a call that timed out keeps its thread until the model returns
+DEFAULT_MAX_WORKERS = 16
+
+# Keyword rules per specialist domain. Each match adds to the domain's score. "order" only counts
+# as a noun with a determiner ("my order", "order status"), not in phrases such as "in order to".
+DEFAULT_RULES = {
+    "order": [
+        r"\bORD\d+\b", r"\b(my|an?|the|this|that|your) orders?\b", r"\border (status|number|history)\b",
+        r"\btrack(ing)?\b", r"\bshipp(ed|ing)\b", r"\bdeliver(y|ed)\b", r"\bcancel\b", r"\bstatus\b",
+        r"\bpurchase\b", r"\breturn(s|ing)?\b", r"\brefund\b",
+    ],
+    "inventory": [
+        r"\bin stock\b", r"\bstock\b", r"\bavailab(le|ility)\b", r"\bprice\b", r"\bcost\b", r"\bspec(s|ifications)?\b",
+        r"\breserve\b",
+    ],
+}
+# Product names alone send a request to inventory only when no domain keyword matched, so that
+# "Can I return my headphones?" goes to the order agent
+PRODUCT_TERMS = re.compile(r"\blaptops?\b|\bmacbook\b|\bxps\b|\bmouse\b|\bmice\b|\bheadphones?\b|\bkeyboards?\b",
+                           re.IGNORECASE)
+# Requests that create an order always need the inventory check to finish first
+ORDER_CREATION = re.compile(
+    r"\b(create|place|make) (an?|the|my|this|that) order\b|\bi(?:'d| would)? (want|like) to (order|buy|purchase)\b"
+    r"|\border (me|us)\b|\bbuy\b",
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class RoutePlan:
+    """
+    Stages run one after another; the specialist calls inside a stage run concurrently.
+    An empty plan means the request goes to the fallback orchestrator agent.
+    """
+    stages: List[List[str]] = field(default_factory=list)
+    scores: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def domains(self):
+        return [domain for stage in self.stages for domain in stage]
+
+
+class IntentRouter:
+    """
+    Rule-based intent router. Patterns are compiled once; routing a message costs microseconds.
+    """
+
+    def __init__(self, rules=None):
+        rules = rules or DEFAULT_RULES
+        self.rules = {domain: [re.compile(p, re.IGNORECASE) for p in patterns] for domain, patterns in rules.items()}
+
+    def route(self, message) -> RoutePlan:
+        scores = {domain: sum(1 for p in patterns if p.search(message)) for domain, patterns in self.rules.items()}
+        if ORDER_CREATION.search(message):
+            return RoutePlan(stages=[["inventory"], ["order"]], scores=scores)
+        matched = [domain for domain, score in scores.items() if score > 0]
+        if not matched and PRODUCT_TERMS.search(message):
+            matched = ["inventory"]
+        if not matched:
+            return RoutePlan(scores=scores)
+        return RoutePlan(stages=[matched], scores=scores)
+
+
+@dataclass
+class AgentResult:
+    """
+    A specialist's answer; ok is False when the call timed out or failed and text is a stand-in.
+    """
+    text: str
+    ok: bool = True
+
+
+async def _invoke(agent, prompt, executor):
+    if hasattr(agent, "invoke_async"):
+        return await agent.invoke_async(prompt)
+    # Not asyncio.to_thread: asyncio.run joins the default executor on exit, so a synchronous agent
+    # that timed out would still hold up process() until it returned
+    return await asyncio.get_running_loop().run_in_executor(executor, agent, prompt)
+
+
+class AgentOrchestrator:
+    """
+    Fast-path router plus concurrent fan-out in front of the Example75 specialist agents.
+    """
+
+    def __init__(
+        self,
+        specialists: Dict[str, Any],
+        fallback: Any,
+        synthesizer: Optional[Any] = None,
+        router: Optional[IntentRouter] = None,
+        timeout: float = DEFAULT_TIMEOUT_SECONDS,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+    ):
+        self.specialists = specialists
+        self.fallback = fallback
+        self.synthesizer = synthesizer
+        self.router = router or IntentRouter()
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="agent")
+
+    def close(self):
+        # Do not wait for calls that timed out; their results are discarded
+        self._executor.shutdown(wait=False)
+
+    async def _call(self, name, agent, prompt) -> AgentResult:
+        with tracer.start_as_current_span(f"agent.{name}") as span:
+            span.set_attribute("agent", name)
+            start = time.perf_counter()
+            try:
+                result = AgentResult(str(await asyncio.wait_for(_invoke(agent, prompt, self._executor), self.timeout)))
+                span.set_attribute("status", "ok")
+            except asyncio.TimeoutError:
+                logger.warning(f"Agent {name} timed out after {self.timeout}s")
+                span.set_attribute("status", "timeout")
+                result = AgentResult(f"The {name} service did not respond in time.", ok=False)
+            except Exception as e:
+                # One failing specialist degrades the answer instead of failing the whole request
+                logger.error(f"Agent {name} failed: {e}")
+                span.record_exception(e)
+                span.set_attribute("status", "error")
+                result = AgentResult(f"The {name} service is unavailable right now.", ok=False)
+            span.set_attribute("latency_ms", (time.perf_counter() - start) * 1000)
+            return result
+
+    async def process_async(self, customer_id: str, message: str) -> str:
+        with tracer.start_as_current_span("process_customer_request") as span:
+            span.set_attribute("customer_id", customer_id)
+            with tracer.start_as_current_span("route") as route_span:
+                plan = self.router.route(message)
+                route_span.set_attribute("domains", ",".join(plan.domains) or "fallback")
+            logger.info(f"Processing request for customer {customer_id} via {plan.domains or 'fallback'}")
+
+            if not plan.stages:
+                return (await self._call("orchestrator", self.fallback, message)).text
+
+            results = {}
+            for index, stage in enumerate(plan.stages):
+                failed = [d for d, r in results.items() if not r.ok]
+                if failed:
+                    # Later stages depend on the earlier ones: never act on a stand-in answer
+                    logger.warning(f"Skipping {stage} for customer {customer_id}: {failed} did not answer")
+                    span.set_attribute("skipped_stages", len(plan.stages) - index)
+                    for d in stage:
+                        results[d] = AgentResult(f"The {d} request was not attempted because the "
+                                                 f"{' and '.join(failed)} check could not be completed.", ok=False)
+                    continue
+                context = "".join(f"\n\nResult from the {d} agent:\n{r.text}" for d, r in results.items())
+                prompt = f"Customer {customer_id}: {message}{context}"
+                responses = await asyncio.gather(*(self._call(d, self.specialists[d], prompt) for d in stage))
+                results.update(zip(stage, responses))
+
+            if len(results) == 1:
+                return next(iter(results.values())).text
+            return await self._synthesize(message, results)
+
+    async def _synthesize(self, message, results):
+        combined = "\n\n".join(f"{domain.title()} agent: {result.text}" for domain, result in results.items())
+        if self.synthesizer is None:
+            return combined
+        prompt = ("Combine these specialist answers into one reply to the customer.\n\n"
+                  f"Customer request: {message}\n\n{combined}")
+        synthesized = await self._call("synthesizer", self.synthesizer, prompt)
+        # Without the synthesizer the specialist answers are still worth returning
+        return synthesized.text if synthesized.ok else combined
+
+    def process(self, customer_id: str, message: str) -> str:
+        """
+        Synchronous entry point matching process_customer_request in Example75.
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.process_async(customer_id, message))
+        # Already inside an event loop (e.g. Jupyter): run on a separate thread's loop
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(asyncio.run, self.process_async(customer_id, message)).result()
+
+
+# (Optional) Latency comparison with stub models: sequential orchestrator vs. routed fan-out
+if __name__ == "__main__":
+    class StubAgent:
+        """
+        Stands in for a Strands Agent: sleeps for `latency` seconds per call (one LLM round trip).
+        """
+
+        def __init__(self, name, latency):
+            self.name = name
+            self.latency = latency
+
+        def __call__(self, prompt):
+            time.sleep(self.latency)
+            return f"[{self.name}] handled: {prompt[:40]}"
+
+    class StubOrchestrator(StubAgent):
+        """
+        Models the Example75 orchestrator: one round trip to plan, each tool the LLM picks called in
+        sequence, and one more round trip to write the answer. The tools chosen per request are given
+        up front (what the Example75 orchestrator calls), independent of IntentRouter.
+        """
+
+        def __init__(self, latency, specialists, tool_calls):
+            super().__init__("orchestrator", latency)
+            self.specialists = specialists
+            self.tool_calls = tool_calls
+
+        def __call__(self, prompt):
+            time.sleep(self.latency)
+            for domain in self.tool_calls.get(prompt, []):
+                self.specialists[domain](prompt)
+            time.sleep(self.latency)
+            return f"[orchestrator] handled: {prompt[:40]}"
+
+    # Request -> specialist tools the Example75 orchestrator calls for it
+    tool_calls = {
+        "Can you check the status of my order ORD001?": ["order"],
+        "Do you have MacBook Pro in stock? What's the price and specifications?": ["inventory"],
+        "What is the status of ORD002 and is the mechanical keyboard available?": ["order", "inventory"],
+        "I want to order a MacBook Pro and a wireless mouse. Can you check if they're available and create an order for me?":
+            ["inventory", "order"],
+        "Hello, what can you help me with?": [],
+    }
+    specialists = {"order": StubAgent("order", 0.8), "inventory": StubAgent("inventory", 0.8)}
+    router = IntentRouter()
+    baseline = StubOrchestrator(0.6, specialists, tool_calls)
+    # The fallback only sees messages the router could not classify; the unmodified orchestrator
+    # stub stands in for it
+    orchestration = AgentOrchestrator(specialists, fallback=baseline, synthesizer=StubAgent("synthesizer", 0.6))
+
+    print(f"{'request':<60} {'before':>8} {'after':>8}  route")
+    for request in tool_calls:
+        start = time.perf_counter()
+        baseline(request)
+        before = time.perf_counter() - start
+        start = time.perf_counter()
+        orchestration.process("CUST001", request)
+        after = time.perf_counter() - start
+        print(f"{request[:58]:<60} {before:7.2f}s {after:7.2f}s  {router.route(request).stages or 'fallback'}")
+
+    # A specialist that hangs past the timeout or raises must not hold up or fail the request
+    hanging = AgentOrchestrator({"order": StubAgent("order", 3.0), "inventory": specialists["inventory"]},
+                                fallback=baseline, timeout=1.0)
+    start = time.perf_counter()
+    hanging.process("CUST001", "What is the status of ORD002 and is the mechanical keyboard available?")
+    print(f"order agent hanging for 3 s, timeout 1.0 s: answered in {time.perf_counter() - start:.2f}s")
+    hanging.close()
+    orchestration.close()
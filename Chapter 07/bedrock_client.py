@@ -0,0 +1,365 @@
+"""
+Shared Amazon Bedrock model-invocation client
+
+Every notebook creates its own bedrock-runtime client: Example111 disables retries entirely and the
+embedding helpers in Example74 call invoke_model in loops with no throttling strategy, so a burst
+either fails or hammers the service. BedrockInvoker wraps one client for all of them:
+
+- the HTTP connection pool is sized to the maximum concurrency (botocore defaults to 10)
+- identical in-flight requests (same model, body and content type) are coalesced: one call is made
+  and every caller receives the result (singleflight)
+- an adaptive (AIMD) concurrency limit per model: it is halved when the model throttles and grows
+  by about one slot per window of successful calls; throttled calls and transient connection
+  errors are retried with jittered exponential backoff
+- a worker pool per model, so calls waiting for a throttled model's limit or sleeping through its
+  backoff never hold up calls to other models
+- sync (invoke, invoke_many) and asyncio (ainvoke) APIs
+- per-model latency, throttle, retry and coalescing metrics
+
+Usage (from notebooks outside this folder, add it to the path first: sys.path.append("../Chapter 07")):
+
+    from bedrock_client import get_invoker
+
+    bedrock = get_invoker()
+    response = bedrock.invoke("amazon.titan-embed-image-v1", {"inputText": "red shoes"})
+    embeddings = bedrock.invoke_many("amazon.titan-embed-image-v1", bodies)
+    print(bedrock.metrics())
+
+For tests, point it at a local fake server with endpoint_url="http://127.0.0.1:8000".
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError, ConnectTimeoutError, EndpointConnectionError, ReadTimeoutError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONCURRENCY = 32
+DEFAULT_INITIAL_CONCURRENCY = 4
+DEFAULT_MAX_RETRIES = 8
+THROTTLING_ERRORS = {"ThrottlingException", "TooManyRequestsException", "ServiceUnavailableException",
+                     "ModelNotReadyException"}
+# Retried like throttling, but without lowering the concurrency limit
+TRANSIENT_ERRORS = (EndpointConnectionError, ConnectTimeoutError, ReadTimeoutError)
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD limit on concurrent calls. Decreases are rate limited to one per cooldown, so a burst of
+    throttling responses from one overloaded window halves the limit once, not once per response.
+    """
+
+    def __init__(self, initial=DEFAULT_INITIAL_CONCURRENCY, minimum=1, maximum=DEFAULT_MAX_CONCURRENCY,
+                 backoff=0.5, cooldown=0.5):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.backoff = backoff
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, throttled=False):
+        with self._condition:
+            self.in_flight -= 1
+            if throttled:
+                now = time.monotonic()
+                if now - self._last_decrease >= self.cooldown:
+                    self.limit = max(self.minimum, self.limit * self.backoff)
+                    self._last_decrease = now
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+
+class ModelMetrics:
+    def __init__(self, window=2048):
+        self.requests = 0
+        self.calls = 0
+        self.coalesced = 0
+        self.throttles = 0
+        self.retries = 0
+        self.errors = 0
+        self.latencies = deque(maxlen=window)  # seconds, most recent successful calls
+        self._lock = threading.Lock()
+
+    def add(self, **counts):
+        with self._lock:
+            for key, value in counts.items():
+                setattr(self, key, getattr(self, key) + value)
+
+    def summary(self, limiter=None):
+        latencies = sorted(self.latencies)
+
+        def percentile(q):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1000 if latencies else 0.0
+
+        return {
+            "requests": self.requests, "calls": self.calls, "coalesced": self.coalesced,
+            "throttles": self.throttles, "retries": self.retries, "errors": self.errors,
+            "p50_ms": round(percentile(0.5), 1), "p99_ms": round(percentile(0.99), 1),
+            "concurrency_limit": round(limiter.limit, 1) if limiter else None,
+        }
+
+
+class BedrockInvoker:
+    def __init__(self, client=None, max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                 initial_concurrency=DEFAULT_INITIAL_CONCURRENCY, max_retries=DEFAULT_MAX_RETRIES,
+                 region_name=None, endpoint_url=None, read_timeout=120, **client_kwargs):
+        if client is None:
+            # Retries are handled here (with the adaptive limit), not inside botocore
+            config = Config(max_pool_connections=max_concurrency, connect_timeout=10, read_timeout=read_timeout,
+                            retries={"max_attempts": 0})
+            client = boto3.client("bedrock-runtime", region_name=region_name, endpoint_url=endpoint_url,
+                                  config=config, **client_kwargs)
+        self.client = client
+        self.max_concurrency = max_concurrency
+        self.initial_concurrency = initial_concurrency
+        self.max_retries = max_retries
+        # One pool per model: its workers block in that model's limiter and sleep through its
+        # backoff, so a throttled model cannot take the threads other models need. Threads are
+        # started on demand, up to max_concurrency per model
+        self._executors = {}
+        self._in_flight = {}
+        self._limiters = {}
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _for_model(self, model_id):
+        with self._lock:
+            if model_id not in self._limiters:
+                self._limiters[model_id] = AdaptiveConcurrencyLimiter(
+                    initial=min(self.initial_concurrency, self.max_concurrency), maximum=self.max_concurrency)
+                self._metrics[model_id] = ModelMetrics()
+                self._executors[model_id] = ThreadPoolExecutor(
+                    max_workers=self.max_concurrency, thread_name_prefix=f"bedrock-{model_id}")
+            return self._limiters[model_id], self._metrics[model_id]
+
+    def _call(self, model_id, body, content_type, accept):
+        limiter, metrics = self._for_model(model_id)
+        for attempt in range(self.max_retries + 1):
+            limiter.acquire()
+            start = time.perf_counter()
+            try:
+                response = self.client.invoke_model(modelId=model_id, body=body, contentType=content_type, accept=accept)
+                payload = response["body"].read()
+            except ClientError as e:
+                throttled = e.response["Error"]["Code"] in THROTTLING_ERRORS
+                limiter.release(throttled=throttled)
+                if not throttled or attempt == self.max_retries:
+                    metrics.add(calls=1, errors=1, throttles=int(throttled))
+                    raise
+                metrics.add(calls=1, throttles=1, retries=1)
+                # Full jitter: sleep without holding a concurrency slot
+                time.sleep(random.uniform(0, min(20.0, 0.1 * 2 ** attempt)))
+                continue
+            except TRANSIENT_ERRORS as e:
+                limiter.release()
+                if attempt == self.max_retries:
+                    metrics.add(calls=1, errors=1)
+                    raise
+                logger.debug(f"Retrying {model_id} after {type(e).__name__}")
+                metrics.add(calls=1, retries=1)
+                time.sleep(random.uniform(0, min(20.0, 0.1 * 2 ** attempt)))
+                continue
+            except Exception:
+                limiter.release()
+                metrics.add(calls=1, errors=1)
+                raise
+            limiter.release()
+            metrics.add(calls=1)
+            metrics.latencies.append(time.perf_counter() - start)
+            return payload
+
+    def _submit(self, model_id, body, content_type="application/json", accept="application/json"):
+        if not isinstance(body, (bytes, str)):
+            body = json.dumps(body)
+        if isinstance(body, str):
+            body = body.encode()
+        key = (model_id, content_type, accept, hashlib.sha256(body).digest())
+        _, metrics = self._for_model(model_id)
+        metrics.add(requests=1)
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                metrics.add(coalesced=1)
+                return future
+            future = self._executors[model_id].submit(self._call, model_id, body, content_type, accept)
+            self._in_flight[key] = future
+        future.add_done_callback(lambda _: self._forget(key))
+        return future
+
+    def _forget(self, key):
+        with self._lock:
+            self._in_flight.pop(key, None)
+
+    def invoke(self, model_id, body, content_type="application/json", accept="application/json"):
+        """
+        Invoke a model and return the parsed JSON response. `body` is a dict, str or bytes.
+        """
+        return json.loads(self._submit(model_id, body, content_type, accept).result())
+
+    async def ainvoke(self, model_id, body, content_type="application/json", accept="application/json"):
+        return json.loads(await asyncio.wrap_future(self._submit(model_id, body, content_type, accept)))
+
+    def invoke_many(self, model_id, bodies, content_type="application/json", accept="application/json",
+                    return_exceptions=False):
+        """
+        Invoke the model for every body concurrently (within the adaptive limit); results keep the input order.
+        """
+        futures = [self._submit(model_id, body, content_type, accept) for body in bodies]
+        results = []
+        for future in futures:
+            try:
+                results.append(json.loads(future.result()))
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                results.append(e)
+        return results
+
+    def metrics(self):
+        with self._lock:
+            models = list(self._metrics)
+        return {model_id: self._metrics[model_id].summary(self._limiters[model_id]) for model_id in models}
+
+    def close(self):
+        with self._lock:
+            executors = list(self._executors.values())
+        for executor in executors:
+            executor.shutdown(wait=True)
+
+
+_shared_invoker = None
+_shared_lock = threading.Lock()
+
+
+def get_invoker(**kwargs):
+    """
+    Process-wide shared BedrockInvoker, created on first use (kwargs only apply then).
+    """
+    global _shared_invoker
+    with _shared_lock:
+        if _shared_invoker is None:
+            _shared_invoker = BedrockInvoker(**kwargs)
+        return _shared_invoker
+
+
+# (Optional) Benchmark against a local fake model server that throttles above a fixed capacity
+if __name__ == "__main__":
+    import argparse
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    parser = argparse.ArgumentParser(description="Bedrock invoker benchmark against a fake model server")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--capacity", type=int, default=8, help="concurrent requests the fake model accepts")
+    parser.add_argument("--latency-ms", type=float, default=40)
+    parser.add_argument("--duplicates", type=float, default=0.25, help="fraction of repeated request bodies")
+    args = parser.parse_args()
+    # Requests to this model are always throttled, to show that it does not slow down other models
+    OVERLOADED_MODEL = "overloaded-model"
+
+    class FakeModelHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like the real endpoint
+        active = 0
+        lock = threading.Lock()
+
+        def log_message(self, *a):
+            pass
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            with FakeModelHandler.lock:
+                throttled = FakeModelHandler.active >= args.capacity or OVERLOADED_MODEL in self.path
+                if not throttled:
+                    FakeModelHandler.active += 1
+            if throttled:
+                payload, status = json.dumps({"message": "Too many requests"}).encode(), 429
+                headers = {"x-amzn-ErrorType": "ThrottlingException"}
+            else:
+                time.sleep(args.latency_ms / 1000)
+                with FakeModelHandler.lock:
+                    FakeModelHandler.active -= 1
+                text = json.loads(body).get("inputText", "")
+                payload, status, headers = json.dumps({"embedding": [len(text), 0.5]}).encode(), 200, {}
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+    ThreadingHTTPServer.request_queue_size = 256
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeModelHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    endpoint = f"http://127.0.0.1:{server.server_port}"
+    credentials = {"aws_access_key_id": "test", "aws_secret_access_key": "test", "region_name": "us-east-1"}
+    model_id = "amazon.titan-embed-image-v1"
+
+    rng = random.Random(0)
+    texts = [f"product description {i}" for i in range(args.requests)]
+    texts = [rng.choice(texts[:i]) if i and rng.random() < args.duplicates else t for i, t in enumerate(texts)]
+    bodies = [{"inputText": text} for text in texts]
+
+    # Baseline: ad hoc client, no retries, 32 threads (default pool of 10 connections)
+    naive_client = boto3.client("bedrock-runtime", endpoint_url=endpoint,
+                                config=Config(retries={"max_attempts": 0}), **credentials)
+
+    def naive(body):
+        try:
+            return json.loads(naive_client.invoke_model(modelId=model_id, body=json.dumps(body))["body"].read())
+        except Exception:
+            return None
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=32) as executor:
+        results = list(executor.map(naive, bodies))
+    elapsed = time.perf_counter() - start
+    succeeded = args.requests - results.count(None)
+    print(f"ad hoc client:  {succeeded / elapsed:6.1f} successful req/s, {results.count(None)} failed requests")
+
+    invoker = BedrockInvoker(endpoint_url=endpoint, **credentials)
+    start = time.perf_counter()
+    results = invoker.invoke_many(model_id, bodies, return_exceptions=True)
+    elapsed = time.perf_counter() - start
+    failed = sum(isinstance(r, Exception) for r in results)
+    print(f"BedrockInvoker: {(args.requests - failed) / elapsed:6.1f} successful req/s, {failed} failed requests")
+    print(f"  {invoker.metrics()[model_id]}")
+
+    async def async_demo():
+        return await asyncio.gather(*(invoker.ainvoke(model_id, body) for body in bodies[:50]))
+    print(f"ainvoke: {len(asyncio.run(async_demo()))} responses")
+    invoker.close()
+
+    # Isolation: the same workload while another model throttles every request and its callers back off
+    invoker = BedrockInvoker(endpoint_url=endpoint, max_retries=6, **credentials)
+    overloaded = [invoker._submit(OVERLOADED_MODEL, {"inputText": f"x{i}"}) for i in range(200)]
+    start = time.perf_counter()
+    results = invoker.invoke_many(model_id, bodies, return_exceptions=True)
+    elapsed = time.perf_counter() - start
+    failed = sum(isinstance(r, Exception) for r in results)
+    print(f"BedrockInvoker with a throttled model alongside: {(args.requests - failed) / elapsed:6.1f} successful "
+          f"req/s, {failed} failed requests")
+    for future in overloaded:
+        future.exception()
+    print(f"  {OVERLOADED_MODEL}: {invoker.metrics()[OVERLOADED_MODEL]}")
+    invoker.close()
+    server.shutdown()
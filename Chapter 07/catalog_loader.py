@@ -0,0 +1,347 @@
+"""
+Columnar, chunked loader for the Amazon Berkeley Objects (ABO) catalog metadata (Example74)
+
+Example74 reads a single listings shard with pd.read_json(lines=True), extracts the en_US title
+with a per-row Python function and loads images.csv.gz whole before merging. This module:
+
+- streams all 16 listings shards in blocks of lines parsed by Arrow's JSON reader
+- extracts language-tagged fields (item_name, ...) with Arrow compute kernels, not per-row Python
+- joins the listings with the image metadata (only the columns that are needed) through an
+  image_id index built once
+- writes item_id / title / image path to an uncompressed Arrow IPC (Feather v2) cache
+  hash-partitioned on item_id
+- memory-maps that cache on later runs without copying or decoding, with O(1) item_id lookups
+
+Usage:
+
+    from catalog_loader import load_catalog
+
+    catalog = load_catalog("s3://amazon-berkeley-objects", cache_dir="./data/abo_catalog")
+    dataset = catalog.to_pandas()          # same columns Example74 builds by hand
+    catalog.lookup("B07JQX8S2X")           # single row as a dict
+"""
+
+import gzip
+import io
+import json
+import logging
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.json as pajson
+
+logger = logging.getLogger(__name__)
+
+ABO_ROOT = "s3://amazon-berkeley-objects"
+LISTING_SHARDS = [f"listings/metadata/listings_{i:x}.json.gz" for i in range(16)]
+IMAGES_METADATA = "images/metadata/images.csv.gz"
+IMAGES_PREFIX = "images/small/"
+DEFAULT_CACHE_DIR = "./data/abo_catalog"
+DEFAULT_PARTITIONS = 16
+DEFAULT_BLOCK_BYTES = 8 * 2**20
+CACHE_VERSION = 2
+
+LANGUAGE_TAGGED = pa.list_(pa.struct([("language_tag", pa.string()), ("value", pa.string())]))
+LISTING_SCHEMA = pa.schema([
+    ("item_id", pa.string()),
+    ("main_image_id", pa.string()),
+    ("item_name", LANGUAGE_TAGGED),
+])
+CATALOG_SCHEMA = pa.schema([
+    ("item_id", pa.string()),
+    ("item_name_in_en_us", pa.string()),
+    ("main_image_id", pa.string()),
+    ("path", pa.string()),
+    ("img_full_path", pa.string()),
+])
+
+
+def _open(path):
+    # Local paths for fixtures and tests, fsspec/s3fs (as used by pandas in Example74) for S3
+    if path.startswith("s3://"):
+        import fsspec
+        return fsspec.open(path, "rb", anon=True).open()
+    return open(path, "rb")
+
+
+def iter_json_blocks(path, block_bytes=DEFAULT_BLOCK_BYTES):
+    """
+    Yield Arrow tables of roughly `block_bytes` of whole JSON lines from a gzipped JSON-lines file.
+    Only the LISTING_SCHEMA fields are parsed; everything else is skipped by the Arrow reader.
+    """
+    parse_options = pajson.ParseOptions(explicit_schema=LISTING_SCHEMA, unexpected_field_behavior="ignore")
+    with _open(path) as raw, gzip.open(raw, "rb") as f:
+        while True:
+            lines = f.readlines(block_bytes)
+            if not lines:
+                break
+            yield pajson.read_json(io.BytesIO(b"".join(lines)), parse_options=parse_options)
+
+
+def extract_language_value(tagged, language="en_US"):
+    """
+    Vectorized replacement for Example74's func_: the first `value` whose `language_tag` equals
+    `language` in each list<struct<language_tag, value>> entry, or null.
+    """
+    tagged = tagged.combine_chunks() if isinstance(tagged, pa.ChunkedArray) else tagged
+    flat = pc.list_flatten(tagged)
+    parents = pc.list_parent_indices(tagged).to_numpy()
+    matches = pc.fill_null(pc.equal(flat.field("language_tag"), language), False).to_numpy(zero_copy_only=False)
+    matched_rows = np.flatnonzero(matches)
+    first_rows, first_positions = np.unique(parents[matched_rows], return_index=True)
+    take = np.full(len(tagged), -1, dtype=np.int64)
+    take[first_rows] = matched_rows[first_positions]
+    return pc.take(flat.field("value"), pa.array(take, mask=take < 0))
+
+
+def read_image_metadata(root=ABO_ROOT):
+    """
+    Read only image_id and path from images.csv.gz.
+    """
+    with _open(f"{root}/{IMAGES_METADATA}") as raw, gzip.open(raw, "rb") as f:
+        return pacsv.read_csv(
+            f, read_options=pacsv.ReadOptions(block_size=1 << 22),
+            convert_options=pacsv.ConvertOptions(include_columns=["image_id", "path"])
+        )
+
+
+class ImagePathIndex:
+    """
+    image_id -> image path lookup over the image metadata, hashed once and shared by every block.
+    """
+
+    def __init__(self, images):
+        self.index = pd.Index(images["image_id"].to_numpy(zero_copy_only=False))
+        self.paths = images["path"].combine_chunks()
+
+    def join(self, listings):
+        """
+        Inner-join `listings` on main_image_id, appending the image `path` column.
+        """
+        positions = self.index.get_indexer(listings["main_image_id"].to_numpy(zero_copy_only=False))
+        found = np.flatnonzero(positions >= 0)
+        return listings.take(found).append_column("path", self.paths.take(positions[found]))
+
+
+def partition_of(item_ids, n_partitions=DEFAULT_PARTITIONS):
+    """
+    Stable hash partition for an array of item ids (pandas' vectorized SipHash, fixed key).
+    """
+    hashes = pd.util.hash_array(np.asarray(item_ids, dtype=object))
+    return (hashes % np.uint64(n_partitions)).astype(np.int64)
+
+
+def build_catalog(root=ABO_ROOT, cache_dir=DEFAULT_CACHE_DIR, shards=LISTING_SHARDS, language="en_US",
+                  n_partitions=DEFAULT_PARTITIONS, block_bytes=DEFAULT_BLOCK_BYTES):
+    """
+    Stream the listings shards, join them with the image metadata and write the partitioned Arrow
+    IPC cache. Returns the number of catalog rows written.
+    """
+    tmp_dir = f"{cache_dir}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    images = ImagePathIndex(read_image_metadata(root))
+    # Uncompressed IPC files can be memory-mapped and read without copying; compressed Parquet
+    # pages would have to be decompressed into fresh buffers on every load
+    writers = [pa.ipc.new_file(os.path.join(tmp_dir, f"part-{p:03d}.arrow"), CATALOG_SCHEMA)
+               for p in range(n_partitions)]
+    rows = 0
+    try:
+        for shard in shards:
+            for block in iter_json_blocks(f"{root}/{shard}", block_bytes):
+                listings = pa.table({
+                    "item_id": block["item_id"],
+                    "item_name_in_en_us": extract_language_value(block["item_name"], language),
+                    "main_image_id": block["main_image_id"],
+                }).filter(pc.is_valid(pc.field("item_name_in_en_us")))
+                joined = images.join(listings)
+                joined = joined.append_column("img_full_path", pc.binary_join_element_wise(
+                    f"{root}/{IMAGES_PREFIX}", joined["path"], ""))
+                joined = joined.select(CATALOG_SCHEMA.names).cast(CATALOG_SCHEMA)
+                partitions = partition_of(joined["item_id"].to_numpy(zero_copy_only=False), n_partitions)
+                for p in np.unique(partitions):
+                    writers[p].write_table(joined.take(np.flatnonzero(partitions == p)))
+                rows += joined.num_rows
+            logger.info(f"Loaded {shard}: {rows} catalog rows so far")
+    finally:
+        for writer in writers:
+            writer.close()
+
+    manifest = {"version": CACHE_VERSION, "root": root, "shards": list(shards), "language": language,
+                "n_partitions": n_partitions, "rows": rows}
+    with open(os.path.join(tmp_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f)
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    os.replace(tmp_dir, cache_dir)
+    return rows
+
+
+class CatalogCache:
+    """
+    Read side of the Arrow IPC cache. Partitions are memory-mapped and indexed on first use.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR):
+        self.cache_dir = cache_dir
+        with open(os.path.join(cache_dir, "manifest.json")) as f:
+            self.manifest = json.load(f)
+        self.n_partitions = self.manifest["n_partitions"]
+        self._tables = {}
+        self._indexes = {}
+
+    def __len__(self):
+        return self.manifest["rows"]
+
+    def partition(self, p):
+        if p not in self._tables:
+            path = os.path.join(self.cache_dir, f"part-{p:03d}.arrow")
+            self._tables[p] = pa.ipc.open_file(pa.memory_map(path)).read_all()
+        return self._tables[p]
+
+    def lookup(self, item_id):
+        """
+        Return the catalog row for `item_id` as a dict, or None.
+        """
+        p = int(partition_of([item_id], self.n_partitions)[0])
+        if p not in self._indexes:
+            ids = self.partition(p)["item_id"].to_pylist()
+            self._indexes[p] = {value: row for row, value in enumerate(ids)}
+        row = self._indexes[p].get(item_id)
+        if row is None:
+            return None
+        return self.partition(p).slice(row, 1).to_pylist()[0]
+
+    def to_table(self):
+        return pa.concat_tables([self.partition(p) for p in range(self.n_partitions)])
+
+    def to_pandas(self):
+        return self.to_table().to_pandas()
+
+
+def load_catalog(root=ABO_ROOT, cache_dir=DEFAULT_CACHE_DIR, shards=LISTING_SHARDS, language="en_US",
+                 n_partitions=DEFAULT_PARTITIONS, rebuild=False):
+    """
+    Open the catalog cache, building it first if it is missing or was built from different inputs.
+    """
+    expected = {"version": CACHE_VERSION, "root": root, "shards": list(shards), "language": language,
+                "n_partitions": n_partitions}
+    manifest_path = os.path.join(cache_dir, "manifest.json")
+    if not rebuild and os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if all(manifest.get(key) == value for key, value in expected.items()):
+            return CatalogCache(cache_dir)
+    build_catalog(root, cache_dir, shards, language, n_partitions)
+    return CatalogCache(cache_dir)
+
+
+def load_catalog_pandas_baseline(root=ABO_ROOT, shards=LISTING_SHARDS):
+    """
+    The original Example74 pandas path, extended to all shards, for benchmarking.
+    """
+    def func_(x):
+        us_texts = [item["value"] for item in x if item["language_tag"] == "en_US"]
+        return us_texts[0] if us_texts else None
+
+    frames = []
+    for shard in shards:
+        meta = pd.read_json(f"{root}/{shard}", lines=True)
+        meta = meta.assign(item_name_in_en_us=meta.item_name.apply(lambda x: func_(x) if isinstance(x, list) else None))
+        frames.append(meta[~meta.item_name_in_en_us.isna()][["item_id", "item_name_in_en_us", "main_image_id"]])
+    meta = pd.concat(frames, ignore_index=True)
+    image_meta = pd.read_csv(f"{root}/{IMAGES_METADATA}")
+    dataset = meta.merge(image_meta, left_on="main_image_id", right_on="image_id")
+    return dataset.assign(img_full_path=f"{root}/{IMAGES_PREFIX}" + dataset.path.astype(str))
+
+
+def write_fixture(root, n_items=1000, n_shards=2, seed=0):
+    """
+    Write small synthetic ABO-shaped listings shards and image metadata under `root`.
+    Returns the list of shard paths relative to `root`.
+    """
+    rng = np.random.default_rng(seed)
+    languages = ["en_US", "de_DE", "fr_FR", "ja_JP", "en_GB"]
+    shards = LISTING_SHARDS[:n_shards]
+    os.makedirs(os.path.join(root, "listings/metadata"), exist_ok=True)
+    os.makedirs(os.path.join(root, "images/metadata"), exist_ok=True)
+    image_rows = []
+    item = 0
+    for shard in shards:
+        with gzip.open(os.path.join(root, shard), "wt") as f:
+            for _ in range(n_items // n_shards):
+                image_id = f"{item:08x}img"
+                tags = rng.choice(languages, size=rng.integers(1, 4), replace=False)
+                record = {
+                    "item_id": f"B{item:09d}",
+                    "main_image_id": image_id,
+                    "item_name": [{"language_tag": t, "value": f"Product {item} ({t})"} for t in tags],
+                    # Real listings carry many more fields; pad to a realistic ~1.5 KB per record
+                    "brand": [{"language_tag": "en_US", "value": "AmazonBasics"}],
+                    "bullet_point": [{"language_tag": t, "value": "x" * 200} for t in tags for _ in range(2)],
+                    "other_image_id": [f"{item:08x}alt{i}" for i in range(5)],
+                    "node": [{"node_id": 1234567, "node_name": "/Categories/Home/Kitchen"}],
+                }
+                f.write(json.dumps(record) + "\n")
+                image_rows.append((image_id, 1000, 1000, f"{image_id[:2]}/{image_id}.jpg"))
+                item += 1
+    pd.DataFrame(image_rows, columns=["image_id", "height", "width", "path"]).to_csv(
+        os.path.join(root, IMAGES_METADATA), index=False, compression="gzip")
+    return shards
+
+
+def _benchmark_pandas(source, cache_dir, shards):
+    return len(load_catalog_pandas_baseline(source, shards))
+
+
+def _benchmark_build(source, cache_dir, shards):
+    return build_catalog(source, cache_dir, shards)
+
+
+def _benchmark_reload(source, cache_dir, shards):
+    return len(load_catalog(source, cache_dir, shards).to_table())
+
+
+def _benchmark_run(name, fn, fn_args, queue):
+    import resource
+    import time
+
+    start = time.perf_counter()
+    rows = fn(*fn_args)
+    queue.put((name, rows, time.perf_counter() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024))
+
+
+# (Optional) Benchmark: ingest time and peak RSS of the pandas path vs. the columnar loader
+if __name__ == "__main__":
+    import argparse
+    import multiprocessing
+    import tempfile
+
+    parser = argparse.ArgumentParser(description="Benchmark ABO catalog ingestion")
+    parser.add_argument("--items", type=int, default=400_000, help="synthetic listings across all shards")
+    parser.add_argument("--shards", type=int, default=16)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        source = os.path.join(tmp_dir, "abo")
+        shards = write_fixture(source, args.items, args.shards)
+        cache_dir = os.path.join(tmp_dir, "catalog")
+        runs = [
+            ("pandas (Example74)", _benchmark_pandas),
+            ("columnar build", _benchmark_build),
+            ("memory-mapped reload", _benchmark_reload),
+        ]
+        # Each run in a fresh process so peak RSS is measured independently; spawn (the default on
+        # macOS and Windows) works because the targets are module-level functions
+        context = multiprocessing.get_context("spawn")
+        queue = context.Queue()
+        for name, fn in runs:
+            process = context.Process(target=_benchmark_run, args=(name, fn, (source, cache_dir, shards), queue))
+            process.start()
+            result = queue.get()
+            process.join()
+            print(f"{result[0]:<22} rows={result[1]:>9,}  time={result[2]:7.2f} s  peak RSS={result[3]:7.0f} MiB")
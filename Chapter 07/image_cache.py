@@ -0,0 +1,418 @@
+"""
+Local image fetch cache for catalog lookups (Example74)
+
+get_image_from_item_id_s3 and get_image_from_faiss_results download every image from S3 on every
+lookup, and get_image_from_item_id scans the whole DataFrame with dataset.query per call. This
+module provides:
+
+- CatalogLookup: a hash index from item_id to its row, built once
+- ImageCache: a content-addressed on-disk cache with a size cap and LRU eviction, an in-memory
+  thumbnail tier and concurrent, bounded prefetch for search results
+- Pluggable fetch backends (S3Backend, LocalDirectoryBackend) so a local folder can stand in for S3
+
+Usage:
+
+    from image_cache import CatalogLookup, ImageCache, S3Backend
+
+    catalog = CatalogLookup(dataset)
+    images = ImageCache(S3Backend(s3_client), cache_dir="./data/images")
+    image, item_name = images.get_image(catalog.image_uri("B07JQX8S2X")), catalog.item_name("B07JQX8S2X")
+    all_images = images.get_images([r.metadata["img_path"] for r in results])
+    images.close()   # persist the index
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from io import BytesIO
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = "./data/images"
+DEFAULT_MAX_BYTES = 512 * 2**20
+DEFAULT_THUMBNAIL_SIZE = (128, 128)
+# The index is rewritten at most this often while the cache changes, and on flush() / close()
+DEFAULT_INDEX_FLUSH_SECONDS = 5.0
+
+
+def split_s3_uri(uri):
+    bucket, key = uri.replace("s3://", "", 1).split("/", 1)
+    return bucket, key
+
+
+class S3Backend:
+    """
+    Fetch objects from Amazon S3.
+    """
+
+    def __init__(self, s3_client=None):
+        if s3_client is None:
+            import boto3
+            s3_client = boto3.client("s3")
+        self.s3_client = s3_client
+
+    def fetch(self, uri):
+        bucket, key = split_s3_uri(uri)
+        return self.s3_client.get_object(Bucket=bucket, Key=key)["Body"].read()
+
+
+class LocalDirectoryBackend:
+    """
+    Serve s3://bucket/key URIs from root/key (or root/bucket/key with include_bucket=True).
+    Useful for tests and offline runs.
+    """
+
+    def __init__(self, root, include_bucket=False):
+        self.root = root
+        self.include_bucket = include_bucket
+        self.fetch_count = 0
+        self._count_lock = threading.Lock()
+
+    def fetch(self, uri):
+        bucket, key = split_s3_uri(uri) if uri.startswith("s3://") else ("", uri)
+        path = os.path.join(self.root, bucket, key) if self.include_bucket else os.path.join(self.root, key)
+        with self._count_lock:
+            self.fetch_count += 1
+        with open(path, "rb") as f:
+            return f.read()
+
+
+class CatalogLookup:
+    """
+    O(1) item_id -> row lookups for the Example74 dataset DataFrame.
+    """
+
+    def __init__(self, dataset, id_column="item_id"):
+        self.dataset = dataset
+        self.positions = {item_id: position for position, item_id in enumerate(dataset[id_column].tolist())}
+
+    def row(self, item_id):
+        position = self.positions.get(item_id)
+        if position is None:
+            raise KeyError(f"Item '{item_id}' not found in dataset")
+        return self.dataset.iloc[position]
+
+    def image_uri(self, item_id, column="img_full_path"):
+        return self.row(item_id)[column]
+
+    def item_name(self, item_id, column="item_name_in_en_us"):
+        return self.row(item_id)[column]
+
+
+class ImageCache:
+    """
+    Content-addressed image cache.
+
+    Blobs are stored under cache_dir/objects/<sha256[:2]>/<sha256>, so identical images referenced by
+    different URIs are stored once. An index file maps URIs to digests and is used to restore the
+    cache across restarts; it is rewritten at most every index_flush_seconds while the cache changes
+    and on flush() / close(). When the total size exceeds max_bytes the least recently used blobs are
+    evicted, except blobs pinned by open_path() or being read by get_bytes(). Decoded thumbnails are
+    kept in a small in-memory LRU tier.
+    """
+
+    def __init__(self, backend, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES,
+                 thumbnail_size=DEFAULT_THUMBNAIL_SIZE, max_thumbnails=1024, max_workers=8,
+                 index_flush_seconds=DEFAULT_INDEX_FLUSH_SECONDS):
+        self.backend = backend
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.thumbnail_size = thumbnail_size
+        self.max_thumbnails = max_thumbnails
+        self.max_workers = max_workers
+        self.index_flush_seconds = index_flush_seconds
+        self.uri_to_digest = {}
+        self.digest_to_uris = {}  # reverse of uri_to_digest, so eviction does not scan every URI
+        self.blob_sizes = OrderedDict()  # digest -> size, least recently used first
+        self.thumbnails = OrderedDict()
+        self.total_bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "thumbnail_hits": 0}
+        self._lock = threading.RLock()
+        self._in_flight = {}
+        self._pins = Counter()  # digest -> number of open_path() / get_bytes() readers
+        self._save_lock = threading.Lock()
+        self._dirty = False
+        self._last_save = time.monotonic()
+        os.makedirs(os.path.join(cache_dir, "objects"), exist_ok=True)
+        self._load_index()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.flush()
+
+    # -- index persistence -------------------------------------------------
+
+    @property
+    def _index_path(self):
+        return os.path.join(self.cache_dir, "index.json")
+
+    def _blob_path(self, digest):
+        return os.path.join(self.cache_dir, "objects", digest[:2], digest)
+
+    def _load_index(self):
+        if not os.path.exists(self._index_path):
+            return
+        with open(self._index_path) as f:
+            index = json.load(f)
+        for digest in index.get("lru", []):
+            path = self._blob_path(digest)
+            if os.path.exists(path):
+                self.blob_sizes[digest] = os.path.getsize(path)
+                self.total_bytes += self.blob_sizes[digest]
+        self.uri_to_digest = {uri: d for uri, d in index.get("uris", {}).items() if d in self.blob_sizes}
+        for uri, digest in self.uri_to_digest.items():
+            self.digest_to_uris.setdefault(digest, set()).add(uri)
+
+    def save_index(self):
+        # Serialize writers so concurrent saves cannot interleave on the temporary file
+        with self._save_lock:
+            with self._lock:
+                index = {"uris": dict(self.uri_to_digest), "lru": list(self.blob_sizes)}
+                self._dirty = False
+                self._last_save = time.monotonic()
+            tmp_path = f"{self._index_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(index, f)
+            os.replace(tmp_path, self._index_path)
+
+    def flush(self):
+        """
+        Write the index if it changed since the last save.
+        """
+        if self._dirty:
+            self.save_index()
+
+    def _changed(self):
+        # Called after every mutation; debounces index writes to one per index_flush_seconds
+        with self._lock:
+            self._dirty = True
+            due = time.monotonic() - self._last_save >= self.index_flush_seconds
+        if due:
+            self.save_index()
+
+    # -- disk tier -----------------------------------------------------------
+
+    def get_path(self, uri):
+        """
+        Return a local file path for `uri`, fetching it through the backend on a cache miss.
+
+        The blob is not pinned, so a concurrent download may evict it; use open_path() or
+        get_bytes() to read it.
+        """
+        return self._blob_path(self._acquire(uri, pin=False))
+
+    @contextmanager
+    def open_path(self, uri):
+        """
+        Context manager yielding a local file path for `uri` that is not evicted until the block exits.
+        """
+        digest = self._acquire(uri, pin=True)
+        try:
+            yield self._blob_path(digest)
+        finally:
+            self._unpin(digest)
+
+    def get_bytes(self, uri):
+        """
+        Return the content of `uri`, fetching it through the backend on a cache miss.
+        """
+        with self.open_path(uri) as path:
+            with open(path, "rb") as f:
+                return f.read()
+
+    def _unpin(self, digest):
+        with self._lock:
+            self._pins[digest] -= 1
+            if not self._pins[digest]:
+                del self._pins[digest]
+            self._evict()
+
+    def _acquire(self, uri, pin):
+        # Returns the digest of `uri`, pinned under the same lock that found or stored it
+        with self._lock:
+            digest = self.uri_to_digest.get(uri)
+            if digest is not None:
+                self.blob_sizes.move_to_end(digest)
+                self.stats["hits"] += 1
+                if pin:
+                    self._pins[digest] += 1
+            else:
+                # Concurrent requests for the same URI wait for a single download
+                event = self._in_flight.get(uri)
+                owner = event is None
+                if owner:
+                    event = self._in_flight[uri] = threading.Event()
+                    self.stats["misses"] += 1
+        if digest is not None:
+            self._changed()
+            return digest
+        if not owner:
+            event.wait()
+            return self._acquire(uri, pin)
+        try:
+            digest = self._store(uri, self.backend.fetch(uri), pin)
+        finally:
+            with self._lock:
+                self._in_flight.pop(uri).set()
+        self._changed()
+        return digest
+
+    def _store(self, uri, data, pin=False):
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest)
+        with self._lock:
+            known = digest in self.blob_sizes
+        if not known:
+            self._write_blob(path, data)
+        with self._lock:
+            # Eviction only deletes under the lock, so this check holds until the digest is registered.
+            # It fails when the blob was evicted after the check above; write it again then.
+            if not os.path.exists(path):
+                self._write_blob(path, data)
+            if digest not in self.blob_sizes:
+                self.blob_sizes[digest] = len(data)
+                self.total_bytes += len(data)
+            self.blob_sizes.move_to_end(digest)
+            previous = self.uri_to_digest.get(uri)
+            if previous is not None and previous != digest:
+                self.digest_to_uris[previous].discard(uri)
+            self.uri_to_digest[uri] = digest
+            self.digest_to_uris.setdefault(digest, set()).add(uri)
+            if pin:
+                self._pins[digest] += 1
+            self._evict()
+        return digest
+
+    @staticmethod
+    def _write_blob(path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _evict(self):
+        # Never evict the most recently used blob, even if it alone exceeds the cap, nor pinned blobs
+        excess = self.total_bytes - self.max_bytes
+        if excess <= 0:
+            return
+        newest = next(reversed(self.blob_sizes))
+        victims = []
+        for digest, size in self.blob_sizes.items():
+            if excess <= 0 or digest == newest:
+                break
+            if not self._pins[digest]:
+                victims.append(digest)
+                excess -= size
+        for digest in victims:
+            self.total_bytes -= self.blob_sizes.pop(digest)
+            self.stats["evictions"] += 1
+            for uri in self.digest_to_uris.pop(digest, ()):
+                del self.uri_to_digest[uri]
+            try:
+                os.remove(self._blob_path(digest))
+            except FileNotFoundError:
+                pass
+
+    # -- images and thumbnails ----------------------------------------------
+
+    def get_image(self, uri):
+        from PIL import Image
+        return Image.open(BytesIO(self.get_bytes(uri)))
+
+    def get_thumbnail(self, uri):
+        """
+        Return a decoded thumbnail from the in-memory tier, creating it from the disk tier if needed.
+        """
+        with self._lock:
+            thumbnail = self.thumbnails.get(uri)
+            if thumbnail is not None:
+                self.thumbnails.move_to_end(uri)
+                self.stats["thumbnail_hits"] += 1
+                return thumbnail
+        from PIL import Image
+        thumbnail = Image.open(BytesIO(self.get_bytes(uri)))
+        thumbnail.thumbnail(self.thumbnail_size)
+        with self._lock:
+            self.thumbnails[uri] = thumbnail
+            if len(self.thumbnails) > self.max_thumbnails:
+                self.thumbnails.popitem(last=False)
+        return thumbnail
+
+    def prefetch(self, uris):
+        """
+        Download all `uris` concurrently with at most max_workers requests in flight.
+        Returns the local paths in the same order (see get_path); failed downloads are logged and
+        returned as None.
+        """
+        def fetch(uri):
+            try:
+                return self.get_path(uri)
+            except Exception as e:
+                logger.warning(f"Could not fetch {uri}: {e}")
+                return None
+
+        unique = list(dict.fromkeys(uris))
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, max(1, len(unique)))) as executor:
+            paths = dict(zip(unique, executor.map(fetch, unique)))
+        self.flush()
+        return [paths[uri] for uri in uris]
+
+    def get_images(self, uris, thumbnails=False):
+        """
+        Prefetch and open the images for a list of URIs (e.g. FAISS search results), skipping failures.
+        """
+        self.prefetch(uris)
+        images = []
+        for uri in uris:
+            try:
+                images.append(self.get_thumbnail(uri) if thumbnails else self.get_image(uri))
+            except Exception as e:
+                logger.warning(f"Could not open {uri}: {e}")
+        return images
+
+
+# (Optional) Local test against a directory standing in for S3
+if __name__ == "__main__":
+    import tempfile
+
+    class SlowBackend(LocalDirectoryBackend):
+        # Simulates S3 latency so the effect of the cache and of the prefetch pool is visible
+        def fetch(self, uri):
+            time.sleep(0.05)
+            return super().fetch(uri)
+
+    with tempfile.TemporaryDirectory() as source_dir, tempfile.TemporaryDirectory() as cache_dir:
+        uris = []
+        for i in range(40):
+            key = f"images/small/{i:02d}/{i:08x}.jpg"
+            os.makedirs(os.path.dirname(os.path.join(source_dir, key)), exist_ok=True)
+            with open(os.path.join(source_dir, key), "wb") as f:
+                f.write(os.urandom(20_000))
+            uris.append(f"s3://amazon-berkeley-objects/{key}")
+
+        backend = SlowBackend(source_dir)
+        cache = ImageCache(backend, cache_dir=cache_dir, max_bytes=30 * 20_000)
+
+        start = time.perf_counter()
+        cache.prefetch(uris[:20])
+        print(f"Cold prefetch of 20 images: {time.perf_counter() - start:.2f} s ({backend.fetch_count} fetches)")
+        start = time.perf_counter()
+        cache.prefetch(uris[:20])
+        print(f"Warm prefetch of 20 images: {time.perf_counter() - start:.3f} s ({backend.fetch_count} fetches)")
+        cache.prefetch(uris[20:])
+        print(f"After 40 images with a 30-image cap: {len(cache.blob_sizes)} cached, stats={cache.stats}")
+        cache.close()
+        reopened = ImageCache(backend, cache_dir=cache_dir, max_bytes=30 * 20_000)
+        print(f"Reopened cache restored {len(reopened.uri_to_digest)} entries")
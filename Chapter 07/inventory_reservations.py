@@ -0,0 +1,432 @@
+"""
+Atomic inventory reservations for reserve_inventory and create_order (Example75)
+
+reserve_inventory and create_order in Example75 mutate the shared inventory_db and orders_db dicts
+without synchronization, so concurrent agent sessions can oversell stock and multi-item orders are
+not atomic. This module provides an all-or-nothing, multi-SKU reservation engine with two
+interchangeable backends:
+
+- InMemoryInventory: per-shard locks, always acquired in the same order (no deadlocks)
+- DynamoDBInventory: one DynamoDB transaction per operation with conditional writes, so the
+  check-and-decrement is atomic across Lambda containers
+
+Reservations hold stock for a TTL. They are either committed (the order was placed) or
+released, and expired reservations are released automatically. An expired reservation can no
+longer be committed, even before the reaper has released it.
+
+Usage in Example75:
+
+    inventory = InMemoryInventory.from_inventory_db(inventory_db)
+    reservation = inventory.reserve({"macbook-pro-13": 1, "wireless-mouse": 1}, ttl=900)
+    ...
+    inventory.commit(reservation.reservation_id)   # or inventory.release(...)
+"""
+
+import heapq
+import logging
+import random
+import threading
+import time
+import uuid
+import zlib
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = 15 * 60
+DEFAULT_SHARDS = 64
+# DynamoDB cancels a transaction with TransactionConflict when another one touches the same item;
+# such transactions are retried with jittered exponential backoff
+DEFAULT_TRANSACTION_ATTEMPTS = 4
+DEFAULT_RETRY_DELAY_SECONDS = 0.05
+
+
+class InsufficientStock(Exception):
+    def __init__(self, sku, requested, available):
+        super().__init__(f"Cannot reserve {requested} units of {sku}. Available stock: {available}")
+        self.sku = sku
+        self.requested = requested
+        self.available = available
+
+
+class UnknownProduct(KeyError):
+    def __init__(self, sku):
+        super().__init__(f"Unknown product '{sku}'")
+        self.sku = sku
+
+
+class ReservationNotFound(Exception):
+    pass
+
+
+@dataclass
+class Reservation:
+    reservation_id: str
+    items: Dict[str, int]
+    expires_at: float
+
+
+class InMemoryInventory:
+    """
+    Thread-safe reservation engine over in-process stock counts.
+
+    available = on_hand - reserved. A reservation moves units from available to reserved; commit
+    removes them from on_hand, release (or expiry) returns them to available.
+    """
+
+    def __init__(self, stock: Dict[str, int], n_shards=DEFAULT_SHARDS, clock=time.monotonic):
+        self.on_hand = dict(stock)
+        self.reserved = {sku: 0 for sku in stock}
+        self.reservations: Dict[str, Reservation] = {}
+        self.clock = clock
+        self._shard_locks = [threading.Lock() for _ in range(n_shards)]
+        self._reservations_lock = threading.Lock()
+        self._expiry_heap = []  # (expires_at, reservation_id)
+
+    @classmethod
+    def from_inventory_db(cls, inventory_db, **kwargs):
+        return cls({sku: product["stock"] for sku, product in inventory_db.items()}, **kwargs)
+
+    def _shard(self, sku):
+        return zlib.crc32(sku.encode()) % len(self._shard_locks)
+
+    def _locked(self, skus):
+        # Sorted, de-duplicated shard order: two multi-SKU reservations can never deadlock
+        return _MultiLock([self._shard_locks[s] for s in sorted({self._shard(sku) for sku in skus})])
+
+    def available(self, sku):
+        with self._locked([sku]):
+            return self.on_hand.get(sku, 0) - self.reserved.get(sku, 0)
+
+    def reserve(self, items: Dict[str, int], ttl=DEFAULT_TTL_SECONDS, reservation_id=None) -> Reservation:
+        """
+        Reserve every line item or none of them. Raises InsufficientStock or UnknownProduct.
+        """
+        self.release_expired()
+        items = {sku: int(quantity) for sku, quantity in items.items() if int(quantity) > 0}
+        with self._locked(items):
+            for sku, quantity in items.items():
+                if sku not in self.on_hand:
+                    raise UnknownProduct(sku)
+                available = self.on_hand[sku] - self.reserved[sku]
+                if available < quantity:
+                    raise InsufficientStock(sku, quantity, available)
+            for sku, quantity in items.items():
+                self.reserved[sku] += quantity
+        reservation = Reservation(reservation_id or uuid.uuid4().hex, items, self.clock() + ttl)
+        with self._reservations_lock:
+            self.reservations[reservation.reservation_id] = reservation
+            heapq.heappush(self._expiry_heap, (reservation.expires_at, reservation.reservation_id))
+        return reservation
+
+    def _pop(self, reservation_id):
+        with self._reservations_lock:
+            reservation = self.reservations.pop(reservation_id, None)
+        if reservation is None:
+            raise ReservationNotFound(reservation_id)
+        return reservation
+
+    def commit(self, reservation_id):
+        """
+        Turn a reservation into a sale: the units leave on-hand stock for good. An expired
+        reservation is released instead and raises ReservationNotFound.
+        """
+        reservation = self._pop(reservation_id)
+        expired = reservation.expires_at <= self.clock()
+        with self._locked(reservation.items):
+            for sku, quantity in reservation.items.items():
+                self.reserved[sku] -= quantity
+                if not expired:
+                    self.on_hand[sku] -= quantity
+        if expired:
+            raise ReservationNotFound(reservation_id)
+        return reservation
+
+    def release(self, reservation_id):
+        reservation = self._pop(reservation_id)
+        with self._locked(reservation.items):
+            for sku, quantity in reservation.items.items():
+                self.reserved[sku] -= quantity
+        return reservation
+
+    def release_expired(self, now=None):
+        """
+        Release every reservation whose TTL has passed. Called lazily by reserve(), or periodically
+        through start_reaper(). Returns the number of released reservations.
+        """
+        now = self.clock() if now is None else now
+        expired = []
+        with self._reservations_lock:
+            while self._expiry_heap and self._expiry_heap[0][0] <= now:
+                _, reservation_id = heapq.heappop(self._expiry_heap)
+                if reservation_id in self.reservations:  # skip committed / released ones
+                    expired.append(reservation_id)
+        released = 0
+        for reservation_id in expired:
+            try:
+                self.release(reservation_id)
+                released += 1
+            except ReservationNotFound:
+                pass
+        if released:
+            logger.info(f"Released {released} expired reservations")
+        return released
+
+    def start_reaper(self, interval=30.0):
+        """
+        Release expired reservations in a daemon thread every `interval` seconds.
+        """
+        stop = threading.Event()
+
+        def run():
+            while not stop.wait(interval):
+                self.release_expired()
+
+        threading.Thread(target=run, daemon=True, name="reservation-reaper").start()
+        return stop
+
+
+class _MultiLock:
+    def __init__(self, locks):
+        self.locks = locks
+
+    def __enter__(self):
+        for lock in self.locks:
+            lock.acquire()
+
+    def __exit__(self, *exc):
+        for lock in reversed(self.locks):
+            lock.release()
+
+
+class DynamoDBInventory:
+    """
+    The same reservation API backed by DynamoDB conditional writes.
+
+    Inventory items: {sku, on_hand, available}. Reservation items live in the same table under
+    sku = "RESERVATION#<id>" with the line items and an expires_at epoch (enable DynamoDB TTL on
+    `ttl` to garbage-collect leftovers). Every operation is a single TransactWriteItems call, so a
+    multi-SKU reservation succeeds or fails as a whole (up to 99 SKUs per reservation). Transactions
+    cancelled only because of a concurrent transaction (TransactionConflict) are retried.
+    """
+
+    RESERVATION_PREFIX = "RESERVATION#"
+
+    def __init__(self, table_name="inventory", dynamodb_client=None, clock=time.time,
+                 max_attempts=DEFAULT_TRANSACTION_ATTEMPTS, retry_delay=DEFAULT_RETRY_DELAY_SECONDS):
+        if dynamodb_client is None:
+            import boto3
+            dynamodb_client = boto3.client("dynamodb")
+        self.client = dynamodb_client
+        self.table_name = table_name
+        self.clock = clock
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+
+    def _key(self, sku):
+        return {"sku": {"S": sku}}
+
+    def _transact(self, actions):
+        for attempt in range(self.max_attempts):
+            try:
+                return self.client.transact_write_items(TransactItems=actions)
+            except self.client.exceptions.TransactionCanceledException as e:
+                codes = {reason.get("Code") for reason in e.response.get("CancellationReasons", [])}
+                if "TransactionConflict" not in codes or "ConditionalCheckFailed" in codes \
+                        or attempt == self.max_attempts - 1:
+                    raise
+                logger.info(f"Transaction conflict, retrying (attempt {attempt + 1})")
+                time.sleep(self.retry_delay * 2 ** attempt * (1 + random.random()))
+
+    def put_stock(self, sku, on_hand):
+        self.client.put_item(TableName=self.table_name, Item={
+            "sku": {"S": sku}, "on_hand": {"N": str(on_hand)}, "available": {"N": str(on_hand)}})
+
+    def available(self, sku):
+        item = self.client.get_item(TableName=self.table_name, Key=self._key(sku), ConsistentRead=True).get("Item")
+        return int(item["available"]["N"]) if item else 0
+
+    def reserve(self, items: Dict[str, int], ttl=DEFAULT_TTL_SECONDS, reservation_id=None) -> Reservation:
+        items = {sku: int(quantity) for sku, quantity in items.items() if int(quantity) > 0}
+        reservation = Reservation(reservation_id or uuid.uuid4().hex, items, self.clock() + ttl)
+        actions = [{
+            "Update": {
+                "TableName": self.table_name,
+                "Key": self._key(sku),
+                "UpdateExpression": "SET available = available - :q",
+                "ConditionExpression": "attribute_exists(sku) AND available >= :q",
+                "ExpressionAttributeValues": {":q": {"N": str(quantity)}},
+                # The current item comes back with the cancellation: its stock, or nothing if the
+                # SKU does not exist
+                "ReturnValuesOnConditionCheckFailure": "ALL_OLD",
+            }
+        } for sku, quantity in items.items()]
+        actions.append({
+            "Put": {
+                "TableName": self.table_name,
+                "Item": {
+                    "sku": {"S": self.RESERVATION_PREFIX + reservation.reservation_id},
+                    "items": {"M": {sku: {"N": str(q)} for sku, q in items.items()}},
+                    "expires_at": {"N": str(int(reservation.expires_at))},
+                    "ttl": {"N": str(int(reservation.expires_at) + 86400)},
+                },
+                "ConditionExpression": "attribute_not_exists(sku)",
+            }
+        })
+        try:
+            self._transact(actions)
+        except self.client.exceptions.TransactionCanceledException as e:
+            reasons = e.response.get("CancellationReasons", [])
+            for (sku, quantity), reason in zip(items.items(), reasons):
+                if reason.get("Code") == "ConditionalCheckFailed":
+                    if "Item" not in reason:
+                        raise UnknownProduct(sku) from e
+                    raise InsufficientStock(sku, quantity, int(reason["Item"]["available"]["N"])) from e
+            raise
+        return reservation
+
+    def _get_reservation(self, reservation_id):
+        item = self.client.get_item(TableName=self.table_name, ConsistentRead=True,
+                                    Key=self._key(self.RESERVATION_PREFIX + reservation_id)).get("Item")
+        if not item:
+            raise ReservationNotFound(reservation_id)
+        items = {sku: int(value["N"]) for sku, value in item["items"]["M"].items()}
+        return Reservation(reservation_id, items, float(item["expires_at"]["N"]))
+
+    def _finish(self, reservation_id, update_expression, commit=False):
+        # Deleting the reservation record is conditional, so a reservation is committed or released
+        # exactly once even if the reaper and a client race. A commit also requires that the
+        # reservation has not expired, whether or not the reaper got to it yet.
+        reservation = self._get_reservation(reservation_id)
+        now = int(self.clock())
+        if commit and reservation.expires_at <= now:
+            raise ReservationNotFound(reservation_id)
+        condition, values = "attribute_exists(sku)", {}
+        if commit:
+            condition, values = "attribute_exists(sku) AND expires_at > :now", {":now": {"N": str(now)}}
+        actions = [{
+            "Update": {
+                "TableName": self.table_name,
+                "Key": self._key(sku),
+                "UpdateExpression": update_expression,
+                "ExpressionAttributeValues": {":q": {"N": str(quantity)}},
+            }
+        } for sku, quantity in reservation.items.items()]
+        actions.append({
+            "Delete": {
+                "TableName": self.table_name,
+                "Key": self._key(self.RESERVATION_PREFIX + reservation_id),
+                "ConditionExpression": condition,
+                **({"ExpressionAttributeValues": values} if values else {}),
+            }
+        })
+        try:
+            self._transact(actions)
+        except self.client.exceptions.TransactionCanceledException as e:
+            # Only a failed condition on the reservation record (the last action) means another caller
+            # finished it first; anything else, e.g. conflicts that outlasted the retries, propagates
+            reasons = e.response.get("CancellationReasons", [])
+            if reasons and reasons[-1].get("Code") == "ConditionalCheckFailed":
+                raise ReservationNotFound(reservation_id) from e
+            raise
+        return reservation
+
+    def commit(self, reservation_id):
+        return self._finish(reservation_id, "SET on_hand = on_hand - :q", commit=True)
+
+    def release(self, reservation_id):
+        return self._finish(reservation_id, "SET available = available + :q")
+
+    def release_expired(self, now=None):
+        """
+        Release expired reservations. Intended for a scheduled Lambda; scans reservation records only.
+        """
+        now = self.clock() if now is None else now
+        released = 0
+        paginator = self.client.get_paginator("scan")
+        pages = paginator.paginate(
+            TableName=self.table_name,
+            FilterExpression="begins_with(sku, :prefix) AND expires_at <= :now",
+            ExpressionAttributeValues={":prefix": {"S": self.RESERVATION_PREFIX}, ":now": {"N": str(int(now))}},
+            ProjectionExpression="sku",
+        )
+        for page in pages:
+            for item in page.get("Items", []):
+                try:
+                    self.release(item["sku"]["S"][len(self.RESERVATION_PREFIX):])
+                    released += 1
+                except ReservationNotFound:
+                    pass
+        return released
+
+
+def create_order(inventory, orders_db, customer_id, items: Dict[str, int], prices: Optional[Dict[str, float]] = None):
+    """
+    Atomic replacement for Example75's create_order tool body: reserve every item, commit the
+    reservation, then record the order, so an order is only written for stock that was actually
+    taken. Returns (order_id, total) or raises InsufficientStock, UnknownProduct or
+    ReservationNotFound (the reservation expired before the commit).
+    """
+    reservation = inventory.reserve(items)
+    order_id = f"ORD-{reservation.reservation_id[:8].upper()}"
+    total = sum((prices or {}).get(sku, 0) * quantity for sku, quantity in items.items())
+    order = {"customer_id": customer_id, "items": list(items), "status": "processing", "total": total}
+    inventory.commit(reservation.reservation_id)
+    orders_db[order_id] = order
+    return order_id, total
+
+
+# (Optional) Contention benchmark: thousands of concurrent multi-SKU reservations on hot products
+if __name__ == "__main__":
+    import argparse
+    import random
+    from concurrent.futures import ThreadPoolExecutor
+
+    parser = argparse.ArgumentParser(description="Reservation engine contention benchmark")
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--threads", type=int, default=64)
+    parser.add_argument("--skus", type=int, default=20, help="number of (hot) products")
+    parser.add_argument("--stock", type=int, default=3000, help="initial units per product")
+    args = parser.parse_args()
+
+    skus = [f"sku-{i}" for i in range(args.skus)]
+    inventory = InMemoryInventory({sku: args.stock for sku in skus})
+    outcomes = {"committed": 0, "released": 0, "rejected": 0}
+    outcome_lock = threading.Lock()
+
+    def session(seed):
+        rng = random.Random(seed)
+        items = {sku: rng.randint(1, 3) for sku in rng.sample(skus, rng.randint(1, 3))}
+        try:
+            reservation = inventory.reserve(items)
+        except InsufficientStock:
+            outcome = "rejected"
+        else:
+            if rng.random() < 0.8:
+                inventory.commit(reservation.reservation_id)
+                outcome = "committed"
+            else:
+                inventory.release(reservation.reservation_id)
+                outcome = "released"
+        with outcome_lock:
+            outcomes[outcome] += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        list(executor.map(session, range(args.requests)))
+    elapsed = time.perf_counter() - start
+
+    oversold = [sku for sku in skus if inventory.on_hand[sku] < 0 or inventory.available(sku) < 0]
+    leaked = [sku for sku in skus if inventory.reserved[sku] != 0]
+    print(f"{args.requests:,} reservations on {args.skus} SKUs with {args.threads} threads: "
+          f"{args.requests / elapsed:,.0f} ops/s")
+    print(f"Outcomes: {outcomes}")
+    print(f"Oversold SKUs: {oversold or 'none'}; leaked reservations: {leaked or 'none'}")
+
+    # TTL expiry: reservations that are never committed come back automatically
+    clock = [0.0]
+    expiring = InMemoryInventory({"sku": 10}, clock=lambda: clock[0])
+    expiring.reserve({"sku": 10}, ttl=60)
+    clock[0] = 61
+    print(f"After TTL expiry: {expiring.release_expired()} released, available={expiring.available('sku')}")
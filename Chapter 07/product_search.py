@@ -0,0 +1,363 @@
+"""
+Indexed fuzzy product lookup for check_product_availability (Example75)
+
+check_product_availability in Example75 tries an exact inventory_db key and then walks a
+hand-written chain of `if "macbook pro" in search_term` rules. ProductSearchIndex replaces that
+chain with an index built once over inventory_db:
+
+- normalized tokens (lowercase, light plural stemming) from the brand, model, category, specs
+  and description, with per-field weights so brand/model/category matches rank first. From the
+  SKU only code-like tokens (with a digit, e.g. "13" in macbook-pro-13) are indexed, so a
+  generic word in a SKU such as "wireless-mouse" does not outweigh a model match; the whole SKU
+  still matches exactly, with or without separators ("wireless mouse")
+- a character-trigram index over the token vocabulary, so misspelled query tokens ("macbok")
+  still resolve to catalog tokens
+- stock-aware ranking, and incremental updates when stock changes or products are added
+
+Usage in Example75:
+
+    product_index = ProductSearchIndex(inventory_db)
+
+    @tool
+    def check_product_availability(product_name: str) -> str:
+        matches = product_index.find(product_name)
+        ...
+"""
+
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+FIELD_WEIGHTS = {
+    "sku": 3.0,
+    "brand": 3.0,
+    "model": 3.0,
+    "category": 2.0,
+    "specs": 0.5,
+    "description": 0.25,
+}
+FUZZY_MIN_SIMILARITY = 0.5
+IN_STOCK_BOOST = 0.1
+# Postings at most this long are "selective" and define the candidate set of a query
+SELECTIVE_POSTING_SIZE = 2048
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+CODE_TOKEN = re.compile(r"\d")
+# Query-side synonyms carried over from the original substring rules
+SYNONYMS = {"headset": "headphone", "earphone": "headphone", "notebook": "laptop"}
+
+
+def normalize(text):
+    """
+    Lowercase alphanumeric tokens with a light plural stemmer ("laptops" -> "laptop").
+    """
+    tokens = []
+    for token in TOKEN_PATTERN.findall(str(text).lower()):
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def compact(text):
+    """
+    A SKU or query with case and separators removed ("Wireless-Mouse" -> "wirelessmouse").
+    """
+    return "".join(TOKEN_PATTERN.findall(str(text).lower()))
+
+
+def trigrams(token):
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class ProductSearchIndex:
+    """
+    Weighted token + trigram index over an inventory dict (sku -> product record).
+    """
+
+    def __init__(self, inventory: Dict[str, Dict], field_weights=None):
+        self.field_weights = field_weights or FIELD_WEIGHTS
+        self.skus: List[str] = []
+        self.records: List[Dict] = []
+        self.positions: Dict[str, int] = {}
+        self.codes: Dict[str, int] = {}                   # compact(sku) -> position
+        # Stock and liveness per position, over-allocated so appends are amortized O(1)
+        self._stock = np.zeros(1024, dtype=np.int64)
+        self._live = np.zeros(1024, dtype=bool)
+        self.postings: Dict[str, Dict[int, float]] = {}   # token -> {position: weight}
+        self._posting_arrays: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self.token_trigrams: Dict[str, set] = {}          # trigram -> tokens in the vocabulary
+        self.categories: Dict[str, List[int]] = {}
+        self._fuzzy_cache: Dict[str, List[Tuple[str, float]]] = {}
+        self._lock = threading.RLock()
+        for sku, record in inventory.items():
+            self.upsert(sku, record)
+
+    def __len__(self):
+        return int(self.live.sum())
+
+    @property
+    def stock(self):
+        return self._stock[:len(self.skus)]
+
+    @property
+    def live(self):
+        return self._live[:len(self.skus)]
+
+    # -- maintenance ---------------------------------------------------------
+
+    def _weighted_tokens(self, sku, record):
+        weights = {}
+        fields = dict(record, sku=sku)
+        for field_name, weight in self.field_weights.items():
+            for token in normalize(fields.get(field_name, "")):
+                if field_name == "sku" and not CODE_TOKEN.search(token):
+                    continue
+                weights[token] = max(weights.get(token, 0.0), weight)
+        return weights
+
+    def upsert(self, sku, record):
+        """
+        Add a product or re-index one whose descriptive fields changed.
+        """
+        # A private copy: the caller may edit its record in place before upserting it, and
+        # _unindex has to see the tokens that were actually indexed
+        record = dict(record)
+        with self._lock:
+            position = self.positions.get(sku)
+            if position is None:
+                position = len(self.skus)
+                self.positions[sku] = position
+                self.codes[compact(sku)] = position
+                self.skus.append(sku)
+                self.records.append(record)
+                if position == len(self._stock):
+                    self._stock = np.concatenate([self._stock, np.zeros_like(self._stock)])
+                    self._live = np.concatenate([self._live, np.zeros_like(self._live)])
+                self.stock[position] = record.get("stock", 0)
+                self.live[position] = True
+            else:
+                self._unindex(position)
+                self.records[position] = record
+                self.stock[position] = record.get("stock", 0)
+                self.live[position] = True
+            for token, weight in self._weighted_tokens(sku, record).items():
+                if token not in self.postings:
+                    self.postings[token] = {}
+                    for gram in trigrams(token):
+                        self.token_trigrams.setdefault(gram, set()).add(token)
+                    self._fuzzy_cache.clear()
+                self.postings[token][position] = weight
+                self._posting_arrays.pop(token, None)
+            category = " ".join(normalize(record.get("category", "")))
+            self.categories.setdefault(category, []).append(position)
+
+    def _unindex(self, position):
+        for token in self._weighted_tokens(self.skus[position], self.records[position]):
+            posting = self.postings.get(token, {})
+            posting.pop(position, None)
+            self._posting_arrays.pop(token, None)
+            if not posting:
+                # Drop the token from the vocabulary too, so queries for it fall back to fuzzy matches
+                self.postings.pop(token, None)
+                for gram in trigrams(token):
+                    grams = self.token_trigrams.get(gram)
+                    if grams is not None:
+                        grams.discard(token)
+                        if not grams:
+                            del self.token_trigrams[gram]
+                self._fuzzy_cache.clear()
+        category = " ".join(normalize(self.records[position].get("category", "")))
+        if position in self.categories.get(category, []):
+            self.categories[category].remove(position)
+
+    def remove(self, sku):
+        with self._lock:
+            position = self.positions.get(sku)
+            if position is not None:
+                self._unindex(position)
+                self.live[position] = False
+
+    def update_stock(self, sku, stock):
+        """
+        O(1) stock update; call it whenever inventory_db[sku]["stock"] changes. Only the index's
+        copy of the record is updated, never the caller's inventory_db.
+        """
+        with self._lock:
+            position = self.positions[sku]
+            self.stock[position] = stock
+            self.records[position]["stock"] = stock
+
+    # -- querying -------------------------------------------------------------
+
+    def _posting_array(self, token):
+        arrays = self._posting_arrays.get(token)
+        if arrays is None:
+            posting = self.postings.get(token, {})
+            ids = np.fromiter(posting.keys(), dtype=np.int64, count=len(posting))
+            weights = np.fromiter(posting.values(), dtype=np.float64, count=len(posting))
+            order = np.argsort(ids)  # sorted ids allow binary-search lookups in search()
+            arrays = (ids[order], weights[order])
+            self._posting_arrays[token] = arrays
+        return arrays
+
+    def _fuzzy_tokens(self, token):
+        """
+        Vocabulary tokens whose trigram Jaccard similarity with `token` is high enough. Cached,
+        since the vocabulary is far smaller than the catalog and queries repeat.
+        """
+        cached = self._fuzzy_cache.get(token)
+        if cached is not None:
+            return cached
+        grams = trigrams(token)
+        overlap = {}
+        for gram in grams:
+            for candidate in self.token_trigrams.get(gram, ()):
+                overlap[candidate] = overlap.get(candidate, 0) + 1
+        matches = []
+        for candidate, shared in overlap.items():
+            similarity = shared / (len(grams) + len(trigrams(candidate)) - shared)
+            if similarity >= FUZZY_MIN_SIMILARITY:
+                matches.append((candidate, similarity))
+        matches.sort(key=lambda m: m[1], reverse=True)
+        self._fuzzy_cache[token] = matches[:3]
+        return self._fuzzy_cache[token]
+
+    def search(self, query, k=5, in_stock_only=False) -> List[Tuple[str, float]]:
+        """
+        Return up to k (sku, score) pairs, best first.
+
+        When the query contains a selective token (a model number, a rare brand), only products
+        containing one of the selective tokens are scored, so a lookup touches a few hundred
+        postings instead of every product that shares a common word such as "pro".
+
+        Scores are scaled by the fraction of query tokens a product matches, so a product matching
+        "wireless" and "keyboard" in its description outranks one matching only "wireless".
+        """
+        with self._lock:
+            exact = self.positions.get(query.strip().lower())
+            if exact is None:
+                exact = self.codes.get(compact(query))
+            if exact is not None and self.live[exact]:
+                return [(self.skus[exact], float("inf"))]
+            tokens = {SYNONYMS.get(t, t) for t in normalize(query)}
+            terms = []  # (posting ids, posting weights, similarity, query token number)
+            for number, token in enumerate(tokens):
+                expansions = [(token, 1.0)] if token in self.postings else self._fuzzy_tokens(token)
+                for matched, similarity in expansions:
+                    ids, weights = self._posting_array(matched)
+                    if len(ids):
+                        terms.append((ids, weights, similarity, number))
+            if not terms:
+                return []
+
+            selective = [ids for ids, _, _, _ in terms if len(ids) <= SELECTIVE_POSTING_SIZE]
+            if selective:
+                candidates = np.unique(np.concatenate(selective))
+                scores = np.zeros(len(candidates))
+                matched_tokens = np.zeros((len(tokens), len(candidates)), dtype=bool)
+                for ids, weights, similarity, number in terms:
+                    found = np.minimum(np.searchsorted(ids, candidates), len(ids) - 1)
+                    hit = ids[found] == candidates
+                    scores += np.where(hit, similarity * weights[found], 0)
+                    matched_tokens[number] |= hit
+            else:
+                candidates = np.arange(len(self.skus))
+                scores = np.zeros(len(candidates))
+                matched_tokens = np.zeros((len(tokens), len(candidates)), dtype=bool)
+                for ids, weights, similarity, number in terms:
+                    scores[ids] += similarity * weights
+                    matched_tokens[number, ids] = True
+            scores *= matched_tokens.sum(axis=0) / len(tokens)
+
+            keep = self.live[candidates] & (scores > 0)
+            if in_stock_only:
+                keep &= self.stock[candidates] > 0
+            candidates, scores = candidates[keep], scores[keep]
+            scores += IN_STOCK_BOOST * (self.stock[candidates] > 0)
+            if len(candidates) > k:
+                top = np.argpartition(-scores, k - 1)[:k]
+                candidates, scores = candidates[top], scores[top]
+            order = np.argsort(-scores, kind="stable")
+            return [(self.skus[candidates[i]], float(scores[i])) for i in order]
+
+    def category_for(self, query) -> Optional[str]:
+        """
+        The category name if the query is only a category ("laptops", "audio"), else None.
+        """
+        normalized = " ".join(normalize(query))
+        return normalized if self.categories.get(normalized) else None
+
+    def find(self, product_name, k=5) -> List[Dict]:
+        """
+        Records for a product name as check_product_availability needs them: every product in the
+        category for a category query, otherwise the best match (or nothing).
+        """
+        category = self.category_for(product_name)
+        with self._lock:
+            if category is not None:
+                return [dict(self.records[p]) for p in self.categories[category] if self.live[p]]
+            results = self.search(product_name, k=1)
+            return [dict(self.records[self.positions[sku]]) for sku, _ in results]
+
+
+# (Optional) Benchmark on a synthetic 100k-SKU catalog against a linear substring scan
+if __name__ == "__main__":
+    import argparse
+    import random
+    import time
+
+    parser = argparse.ArgumentParser(description="Benchmark ProductSearchIndex")
+    parser.add_argument("-n", type=int, default=100_000, help="number of SKUs")
+    parser.add_argument("-q", type=int, default=2_000, help="number of queries")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    brands = ["Apple", "Dell", "Lenovo", "Logitech", "Sony", "Bose", "Keychron", "Samsung", "Asus", "Razer"]
+    categories = {"laptops": ["Notebook", "Ultrabook", "Chromebook"], "audio": ["Headphones", "Earbuds", "Speaker"],
+                  "accessories": ["Mouse", "Keyboard", "Dock"], "monitors": ["Monitor", "Display"]}
+    inventory = {}
+    for i in range(args.n):
+        category = rng.choice(list(categories))
+        brand = rng.choice(brands)
+        kind = rng.choice(categories[category])
+        model = f"{kind} {rng.choice(['Pro', 'Air', 'Max', 'Lite', 'Plus'])} {rng.randint(1, 999)}"
+        sku = f"{brand}-{model}".lower().replace(" ", "-") + f"-{i}"
+        inventory[sku] = {"stock": rng.randint(0, 50), "price": round(rng.uniform(10, 3000), 2), "category": category,
+                          "brand": brand, "model": model, "specs": f"{rng.randint(4, 64)}GB, {kind.lower()} series",
+                          "description": f"{brand} {kind.lower()} for work and play"}
+
+    start = time.perf_counter()
+    index = ProductSearchIndex(inventory)
+    print(f"Built index over {len(index):,} SKUs in {time.perf_counter() - start:.2f} s")
+
+    def typo(word):
+        position = rng.randrange(len(word))
+        return word[:position] + word[position + 1:] if len(word) > 4 else word
+
+    skus = list(inventory)
+    queries = []
+    for _ in range(args.q):
+        record = inventory[rng.choice(skus)]
+        queries.append(" ".join(typo(w) if rng.random() < 0.3 else w for w in f"{record['brand']} {record['model']}".split()))
+
+    for label in ("cold", "warm"):
+        # The cold pass also materializes the posting arrays the queries touch
+        start = time.perf_counter()
+        for query in queries:
+            index.search(query, k=5)
+        per_query = (time.perf_counter() - start) / len(queries)
+        print(f"Indexed fuzzy search ({label}): {per_query * 1e6:10.1f} us/query")
+
+    start = time.perf_counter()
+    for query in queries[:50]:
+        needle = query.lower()
+        [sku for sku, r in inventory.items() if needle in f"{r['brand']} {r['model']}".lower()]
+    print(f"Linear substring scan:        {(time.perf_counter() - start) / 50 * 1e6:10.1f} us/query (exact substrings only)")
+
+    start = time.perf_counter()
+    for sku in skus[:10_000]:
+        index.update_stock(sku, 0)
+    print(f"Stock updates:                {(time.perf_counter() - start) / 10_000 * 1e6:10.1f} us/update")
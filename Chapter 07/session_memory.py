@@ -0,0 +1,483 @@
+"""
+Bounded, token-aware session memory for the conversation chain (Example71)
+
+get_session_history in Example71 keeps an unbounded ChatMessageHistory per session ID and the whole
+history is sent to the model on every turn, so prompt tokens grow linearly with the conversation
+and memory grows with the number of sessions. SessionMemory replaces it with:
+
+- a token-budgeted sliding window of the most recent messages
+- a running summary of everything older, compacted incrementally: messages leaving the window are
+  batched and folded into the summary with one summarizer call per batch. The summarizer runs
+  outside any lock, so a slow LLM call only delays the session it summarizes. When it keeps
+  failing, the oldest unsummarized messages are dropped so the prompt stays within budget
+- LRU eviction of idle sessions (by count and idle time)
+- an optional SQLite backend so sessions survive restarts
+- per-turn prompt-size metrics
+
+The summarizer is any callable (previous_summary, messages) -> summary; llm_summarizer adapts a
+LangChain chat model, and a stub works for tests. Usage in Example71:
+
+    memory = SessionMemory(summarizer=llm_summarizer(nova_llm), sqlite_path="sessions.db")
+    get_session_history = langchain_history_factory(memory)
+    conversation_with_history = RunnableWithMessageHistory(chain, get_session_history, ...)
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WINDOW_TOKENS = 1500
+DEFAULT_SUMMARY_TOKENS = 400
+DEFAULT_COMPACT_TOKENS = 600
+DEFAULT_MAX_SESSIONS = 1000
+DEFAULT_IDLE_SECONDS = 30 * 60
+DEFAULT_MAX_SUMMARY_FAILURES = 3
+ROLES = ("human", "ai", "system")
+
+SUMMARY_PROMPT = """Update the running summary of a conversation between a customer and an assistant.
+Keep facts, decisions, names, numbers and open questions; drop pleasantries. Stay under {max_words} words.
+
+Current summary:
+{summary}
+
+New messages:
+{messages}
+
+Updated summary:"""
+
+
+def estimate_tokens(text):
+    """
+    Rough token count (about 4 characters per token for English text).
+    """
+    return len(text) // 4 + 1
+
+
+@dataclass
+class Message:
+    role: str  # "human", "ai" or "system"
+    content: str
+    tokens: int = 0
+
+
+@dataclass
+class TurnMetrics:
+    session_id: str
+    turn: int
+    prompt_tokens: int
+    full_history_tokens: int
+    summary_tokens: int
+    window_messages: int
+    compactions: int
+
+
+@dataclass
+class SessionState:
+    summary: str = ""
+    summary_tokens: int = 0
+    window: deque = field(default_factory=deque)
+    pending: List[Message] = field(default_factory=list)  # left the window, not yet summarized
+    window_tokens: int = 0
+    full_history_tokens: int = 0
+    turns: int = 0
+    compactions: int = 0
+    last_access: float = 0.0
+    # Runtime only, not persisted: guards this session's fields; store-wide state uses SessionMemory._lock
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+    compacting: bool = False
+    cleared: bool = False
+    summary_failures: int = 0
+
+    def to_json(self):
+        return json.dumps({
+            "summary": self.summary, "summary_tokens": self.summary_tokens,
+            "window": [m.__dict__ for m in self.window], "pending": [m.__dict__ for m in self.pending],
+            "full_history_tokens": self.full_history_tokens, "turns": self.turns, "compactions": self.compactions,
+        })
+
+    @classmethod
+    def from_json(cls, data):
+        data = json.loads(data)
+        state = cls(summary=data["summary"], summary_tokens=data["summary_tokens"],
+                    window=deque(Message(**m) for m in data["window"]),
+                    pending=[Message(**m) for m in data["pending"]],
+                    full_history_tokens=data["full_history_tokens"], turns=data["turns"],
+                    compactions=data["compactions"])
+        state.window_tokens = sum(m.tokens for m in state.window)
+        return state
+
+
+class SQLiteSessionBackend:
+    """
+    Persists session state as one row per session. Writes go through on every update.
+    """
+
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS sessions (session_id TEXT PRIMARY KEY, state TEXT, updated_at REAL)")
+        self.connection.commit()
+        self._lock = threading.Lock()
+
+    def load(self, session_id) -> Optional[SessionState]:
+        with self._lock:
+            row = self.connection.execute("SELECT state FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return SessionState.from_json(row[0]) if row else None
+
+    def save(self, session_id, state):
+        with self._lock:
+            self.connection.execute(
+                "INSERT INTO sessions (session_id, state, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at",
+                (session_id, state.to_json(), time.time()))
+            self.connection.commit()
+
+    def delete(self, session_id):
+        with self._lock:
+            self.connection.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            self.connection.commit()
+
+
+def format_messages(messages):
+    return "\n".join(f"{m.role.title()}: {m.content}" for m in messages)
+
+
+def llm_summarizer(llm, max_words=250):
+    """
+    Summarizer backed by a LangChain chat model (e.g. the ChatBedrock instance in Example71).
+    """
+    def summarize(summary, messages):
+        prompt = SUMMARY_PROMPT.format(max_words=max_words, summary=summary or "(none)",
+                                       messages=format_messages(messages))
+        response = llm.invoke(prompt)
+        return getattr(response, "content", response)
+    return summarize
+
+
+class SessionMemory:
+    def __init__(
+        self,
+        summarizer: Optional[Callable] = None,
+        window_tokens: int = DEFAULT_WINDOW_TOKENS,
+        summary_tokens: int = DEFAULT_SUMMARY_TOKENS,
+        compact_tokens: int = DEFAULT_COMPACT_TOKENS,
+        max_sessions: int = DEFAULT_MAX_SESSIONS,
+        idle_seconds: float = DEFAULT_IDLE_SECONDS,
+        sqlite_path: Optional[str] = None,
+        token_counter: Callable[[str], int] = estimate_tokens,
+        clock=time.monotonic,
+        max_summary_failures: int = DEFAULT_MAX_SUMMARY_FAILURES,
+    ):
+        """
+        window_tokens: budget for verbatim recent messages
+        summary_tokens: the summary is truncated to this size if the summarizer overshoots
+        compact_tokens: messages leaving the window are summarized once this many tokens are pending
+        max_summary_failures: after this many failed summarizer calls in a row, the oldest pending
+        messages are dropped down to compact_tokens on every further failure
+        Without a summarizer, messages leaving the window are dropped (plain sliding window).
+        """
+        self.summarizer = summarizer
+        self.window_tokens = window_tokens
+        self.summary_tokens = summary_tokens
+        self.compact_tokens = compact_tokens
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self.token_counter = token_counter
+        self.clock = clock
+        self.max_summary_failures = max_summary_failures
+        self.backend = SQLiteSessionBackend(sqlite_path) if sqlite_path else None
+        self.sessions = OrderedDict()  # session_id -> SessionState, least recently used first
+        self.metrics = deque(maxlen=10_000)
+        # Guards the session table; each SessionState has its own lock. Always taken before a
+        # session lock, never while holding one
+        self._lock = threading.RLock()
+
+    # -- session lifecycle ---------------------------------------------------
+
+    def _session(self, session_id):
+        # Caller holds self._lock
+        now = self.clock()
+        state = self.sessions.get(session_id)
+        if state is None:
+            state = (self.backend.load(session_id) if self.backend else None) or SessionState()
+            self.sessions[session_id] = state
+        self.sessions.move_to_end(session_id)
+        state.last_access = now
+        self._evict(now)
+        return state
+
+    def _evict(self, now):
+        # Evicted sessions are already persisted when a backend is configured
+        while self.sessions:
+            session_id, state = next(iter(self.sessions.items()))
+            if len(self.sessions) <= self.max_sessions and now - state.last_access < self.idle_seconds:
+                break
+            del self.sessions[session_id]
+
+    def clear(self, session_id):
+        with self._lock:
+            state = self.sessions.pop(session_id, None)
+            if state is not None:
+                with state.lock:
+                    state.cleared = True
+            if self.backend:
+                self.backend.delete(session_id)
+
+    # -- messages --------------------------------------------------------------
+
+    def add_message(self, session_id, role, content):
+        if role not in ROLES:
+            raise ValueError(f"Unsupported message role '{role}', expected one of {', '.join(ROLES)}")
+        message = Message(role, content, self.token_counter(content))
+        with self._lock:
+            state = self._session(session_id)
+        with state.lock:
+            state.window.append(message)
+            state.window_tokens += message.tokens
+            state.full_history_tokens += message.tokens
+            if role == "human":
+                state.turns += 1
+            # Keep at least the newest message even if it alone exceeds the budget
+            while state.window_tokens > self.window_tokens and len(state.window) > 1:
+                evicted = state.window.popleft()
+                state.window_tokens -= evicted.tokens
+                if self.summarizer is not None:
+                    state.pending.append(evicted)
+            batch = None
+            if not state.compacting and sum(m.tokens for m in state.pending) >= self.compact_tokens:
+                state.compacting = True
+                batch = (state.summary, list(state.pending))
+            if self.backend:
+                self.backend.save(session_id, state)
+        if batch is not None:
+            self._compact(session_id, state, *batch)
+
+    def _compact(self, session_id, state, summary, batch):
+        # The summarizer call is the slow part and runs without holding any lock; messages keep
+        # arriving meanwhile and are appended after `batch` in state.pending
+        try:
+            summary = self.summarizer(summary, batch)
+        except Exception as e:
+            logger.warning(f"Summarizing session {session_id} failed, will retry on the next message: {e}")
+            with self._lock, state.lock:
+                state.compacting = False
+                state.summary_failures += 1
+                if state.summary_failures >= self.max_summary_failures and self._drop_pending(state):
+                    logger.warning(f"Session {session_id}: summarizer failed {state.summary_failures} times "
+                                   f"in a row, dropped the oldest unsummarized messages")
+                    self._save_if_current(session_id, state)
+            return
+        summary, tokens = self._truncate(summary)
+        with self._lock, state.lock:
+            state.compacting = False
+            state.summary_failures = 0
+            if state.cleared or len(state.pending) < len(batch) or \
+                    any(a is not b for a, b in zip(state.pending, batch)):
+                return
+            state.summary, state.summary_tokens = summary, tokens
+            state.pending = state.pending[len(batch):]
+            state.compactions += 1
+            self._save_if_current(session_id, state)
+
+    def _drop_pending(self, state):
+        # Caller holds state.lock; keeps the newest pending messages within compact_tokens
+        tokens = sum(m.tokens for m in state.pending)
+        dropped = 0
+        while state.pending and tokens > self.compact_tokens:
+            tokens -= state.pending[dropped].tokens
+            dropped += 1
+        state.pending = state.pending[dropped:]
+        return dropped
+
+    def _save_if_current(self, session_id, state):
+        # Caller holds self._lock and state.lock. A session evicted and reloaded while the summarizer
+        # ran has a newer state object; saving this one would overwrite it. One that was only
+        # evicted was last saved from this object, so the save still applies.
+        if self.backend and not state.cleared and self.sessions.get(session_id, state) is state:
+            self.backend.save(session_id, state)
+
+    def _truncate(self, summary):
+        """
+        Cut the summary to the longest word prefix within summary_tokens, as measured by token_counter.
+        """
+        tokens = self.token_counter(summary)
+        if tokens <= self.summary_tokens:
+            return summary, tokens
+        words = summary.split(" ")
+        low, high = 0, len(words)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.token_counter(" ".join(words[:middle])) <= self.summary_tokens:
+                low = middle
+            else:
+                high = middle - 1
+        summary = " ".join(words[:low])
+        return summary, self.token_counter(summary)
+
+    @staticmethod
+    def _prompt_messages(state):
+        messages = []
+        if state.summary:
+            messages.append(Message("system", f"Summary of the earlier conversation: {state.summary}",
+                                    state.summary_tokens))
+        messages.extend(state.pending)
+        messages.extend(state.window)
+        return messages
+
+    def prompt_messages(self, session_id) -> List[Message]:
+        """
+        The history to send to the model: the running summary (as a system message), messages
+        waiting to be summarized, and the recent window.
+        """
+        with self._lock:
+            state = self._session(session_id)
+        with state.lock:
+            return self._prompt_messages(state)
+
+    def record_turn(self, session_id, new_input=None):
+        """
+        Record prompt-size metrics for a turn: the current history plus `new_input`, the message
+        sent with it that is not in the history yet (RunnableWithMessageHistory adds the input only
+        after the model call).
+        """
+        input_tokens = self.token_counter(new_input) if new_input is not None else 0
+        with self._lock:
+            state = self._session(session_id)
+        with state.lock:
+            metrics = TurnMetrics(
+                session_id=session_id,
+                turn=state.turns + (new_input is not None),
+                prompt_tokens=sum(m.tokens for m in self._prompt_messages(state)) + input_tokens,
+                full_history_tokens=state.full_history_tokens + input_tokens,
+                summary_tokens=state.summary_tokens,
+                window_messages=len(state.window),
+                compactions=state.compactions,
+            )
+        self.metrics.append(metrics)
+        logger.debug(f"Session {session_id} turn {metrics.turn}: {metrics.prompt_tokens} prompt tokens "
+                     f"(full history {metrics.full_history_tokens})")
+        return metrics
+
+
+def langchain_history_factory(memory: SessionMemory):
+    """
+    Return a get_session_history function for RunnableWithMessageHistory backed by `memory`.
+    """
+    from langchain_core.chat_history import BaseChatMessageHistory
+    from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+    message_types = {"human": HumanMessage, "ai": AIMessage, "system": SystemMessage}
+
+    class BoundedChatMessageHistory(BaseChatMessageHistory):
+        def __init__(self, session_id):
+            self.session_id = session_id
+
+        @property
+        def messages(self):
+            return [message_types[m.role](content=m.content) for m in memory.prompt_messages(self.session_id)]
+
+        def add_message(self, message):
+            if message.type == "human":
+                # The history before this input is what was sent to the model along with it
+                memory.record_turn(self.session_id, new_input=message.content)
+            memory.add_message(self.session_id, message.type, message.content)
+
+        def add_messages(self, messages):
+            for message in messages:
+                self.add_message(message)
+
+        def clear(self):
+            memory.clear(self.session_id)
+
+    return BoundedChatMessageHistory
+
+
+# (Optional) Benchmark with a stub LLM: unbounded history vs. SessionMemory over 50-turn conversations
+if __name__ == "__main__":
+    import argparse
+    import os
+    import random
+    import tempfile
+
+    parser = argparse.ArgumentParser(description="Session memory benchmark")
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--turns", type=int, default=50)
+    args = parser.parse_args()
+
+    # Stub model latency: fixed overhead plus time proportional to prompt tokens
+    BASE_LATENCY, PER_TOKEN_LATENCY = 0.002, 0.000004
+    WORDS = ("plan course module week project embeddings transformer bedrock agent retrieval evaluation "
+             "prompt dataset fine-tuning latency budget deployment").split()
+
+    def stub_llm(prompt_tokens, rng, words):
+        time.sleep(BASE_LATENCY + PER_TOKEN_LATENCY * prompt_tokens)
+        return " ".join(rng.choice(WORDS) for _ in range(words))
+
+    def stub_summarizer(summary, messages):
+        tokens = sum(m.tokens for m in messages) + estimate_tokens(summary)
+        stub_summarizer.prompt_tokens += tokens
+        stub_summarizer.calls += 1
+        return stub_llm(tokens, random.Random(len(summary)), 120)
+    stub_summarizer.prompt_tokens = stub_summarizer.calls = 0
+
+    def conversation(rng):
+        return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(10, 40))) for _ in range(args.turns)]
+
+    def run_unbounded():
+        rng = random.Random(1)
+        prompt_tokens, latencies = [], []
+        for _ in range(args.sessions):
+            history_tokens = 0
+            for text in conversation(rng):
+                tokens = history_tokens + estimate_tokens(text)
+                start = time.perf_counter()
+                reply = stub_llm(tokens, rng, rng.randint(60, 180))
+                latencies.append(time.perf_counter() - start)
+                prompt_tokens.append(tokens)
+                history_tokens += estimate_tokens(text) + estimate_tokens(reply)
+        return prompt_tokens, latencies
+
+    def run_bounded(memory):
+        rng = random.Random(1)
+        prompt_tokens, latencies = [], []
+        for session in range(args.sessions):
+            session_id = f"session-{session}"
+            for text in conversation(rng):
+                start = time.perf_counter()
+                tokens = memory.record_turn(session_id, new_input=text).prompt_tokens
+                memory.add_message(session_id, "human", text)
+                reply = stub_llm(tokens, rng, rng.randint(60, 180))
+                memory.add_message(session_id, "ai", reply)
+                latencies.append(time.perf_counter() - start)
+                prompt_tokens.append(tokens)
+        return prompt_tokens, latencies
+
+    def report(label, prompt_tokens, latencies, extra_tokens=0):
+        last_turns = prompt_tokens[args.turns - 1::args.turns]
+        print(f"{label:<26} total prompt tokens {sum(prompt_tokens) + extra_tokens:>9,}  "
+              f"turn-{args.turns} prompt {sum(last_turns) / len(last_turns):>6,.0f} tokens  "
+              f"mean latency {sum(latencies) / len(latencies) * 1000:5.1f} ms")
+
+    report("unbounded history", *run_unbounded())
+    with tempfile.TemporaryDirectory() as tmp:
+        memory = SessionMemory(summarizer=stub_summarizer, sqlite_path=os.path.join(tmp, "sessions.db"))
+        prompt_tokens, latencies = run_bounded(memory)
+        report("SessionMemory (+summaries)", prompt_tokens, latencies, stub_summarizer.prompt_tokens)
+        print(f"{'':<26} {stub_summarizer.calls} summarizer calls, {stub_summarizer.prompt_tokens:,} summarizer tokens")
+
+        reopened = SessionMemory(summarizer=stub_summarizer, sqlite_path=os.path.join(tmp, "sessions.db"))
+        restored = reopened.prompt_messages("session-0")
+        print(f"Restored session-0 from SQLite: {len(restored)} messages, summary present: {restored[0].role == 'system'}")
+
+    lru = SessionMemory(max_sessions=100)
+    for i in range(1000):
+        lru.add_message(f"session-{i}", "human", "hello")
+    print(f"LRU: {len(lru.sessions)} sessions kept in memory after 1000 sessions")
@@ -0,0 +1,295 @@
+"""
+Chunked, streaming all-pairs similarity for catalog deduplication and heatmaps (Example74)
+
+plot_similarity_heatmap in Example74 materializes the full N x N np.inner matrix, which is fine for
+the 10-item demo batch but impossible for the full catalog. The functions below compute the
+same inner products in tiles, keep only what is needed (top-k neighbours per row, pairs above a
+threshold, or a downsampled heatmap) and stream results to disk, so catalog-wide near-duplicate
+detection runs on a CPU-only machine with bounded memory.
+
+Memory stays at the embeddings plus a few cache-sized tiles, but work is still quadratic. Measured
+on one core at 256 dims: 100k items take 156 s for top-10 neighbours and 52 s for pairs >= 0.95
+(peak RSS 232 MiB); 1M items fit in 1.05 GiB, but a full top-10 join extrapolates to ~4.3 hours, so
+at that size run it across many cores or shard the catalog (e.g. by category) first.
+
+Usage:
+
+    from similarity_engine import top_k_neighbors, find_near_duplicates
+
+    ids, scores = top_k_neighbors(embeddings, k=10, output_dir="neighbors")   # memory-mapped results
+    groups = find_near_duplicates(embeddings, threshold=0.97)
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Each score tile is written by BLAS and immediately re-read by the top-k / threshold pass. The tile
+# and the two embedding blocks it is computed from are sized to fit this budget (per worker) so the
+# second pass reads from cache instead of DRAM; 8 MiB is a conservative per-core slice of the shared
+# L3 on current server CPUs. At 256 dims that is 1152 x 1152 tiles, at 1024 dims 704 x 704.
+DEFAULT_CACHE_BUDGET_BYTES = 8 * 2**20
+# BLAS needs a few hundred rows per operand to run at full speed
+MIN_TILE_SIZE = 256
+
+
+def _as_float32(embeddings, normalize):
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    if normalize:
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        embeddings = embeddings / norms
+    return embeddings
+
+
+def _tile_size(dim, cache_budget):
+    # Largest t with t*t float32 scores plus two t x dim float32 blocks within the budget,
+    # rounded down to a multiple of 64
+    tile_size = int(np.sqrt(dim * dim + cache_budget / 4) - dim) // 64 * 64
+    return max(MIN_TILE_SIZE, tile_size)
+
+
+def _row_tiles(n_rows, tile_size):
+    return [(start, min(start + tile_size, n_rows)) for start in range(0, n_rows, tile_size)]
+
+
+def _run_tiles(fn, tiles, max_workers):
+    # NumPy releases the GIL inside matrix products and partitioning, so threads scale across cores
+    # without copying the embeddings into worker processes
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers == 1:
+        for tile in tiles:
+            yield fn(tile)
+        return
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # Keep a bounded number of tiles in flight so finished results are streamed, not buffered
+        window = max_workers * 2
+        for start in range(0, len(tiles), window):
+            for result in executor.map(fn, tiles[start:start + window]):
+                yield result
+
+
+def top_k_neighbors(
+    embeddings_a,
+    embeddings_b=None,
+    k=10,
+    exclude_self=True,
+    normalize=False,
+    tile_size=None,
+    cache_budget=DEFAULT_CACHE_BUDGET_BYTES,
+    output_dir=None,
+    max_workers=None,
+    row_offset=None,
+):
+    """
+    For every row of embeddings_a, find the k rows of embeddings_b (default: embeddings_a itself)
+    with the highest inner product.
+
+    Returns (indices, scores) arrays of shape (len(a), k), best first. With `output_dir` the
+    results are written to memory-mapped .npy files and returned as read-only memmaps. Without
+    `tile_size` the tiles are sized from `cache_budget` and the embedding dimension. Pass
+    `row_offset` when embeddings_a is embeddings_b[row_offset:row_offset + len(a)], e.g. a batch of
+    catalog rows joined against the whole catalog: exclude_self then applies as in a self join.
+    """
+    a = _as_float32(embeddings_a, normalize)
+    self_join = embeddings_b is None or row_offset is not None
+    offset = row_offset or 0
+    b = a if embeddings_b is None else _as_float32(embeddings_b, normalize)
+    tile_size = tile_size or _tile_size(a.shape[1], cache_budget)
+    k = min(k, len(b) - (1 if self_join and exclude_self else 0))
+
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+        indices = np.lib.format.open_memmap(os.path.join(output_dir, "indices.npy"), "w+", np.int64, (len(a), k))
+        scores = np.lib.format.open_memmap(os.path.join(output_dir, "scores.npy"), "w+", np.float32, (len(a), k))
+    else:
+        indices = np.empty((len(a), k), dtype=np.int64)
+        scores = np.empty((len(a), k), dtype=np.float32)
+
+    def process(row_tile):
+        row_start, row_end = row_tile
+        best_ids = np.empty((row_end - row_start, 0), dtype=np.int64)
+        best_scores = np.empty((row_end - row_start, 0), dtype=np.float32)
+        for col_start, col_end in _row_tiles(len(b), tile_size):
+            tile = a[row_start:row_end] @ b[col_start:col_end].T
+            if self_join and exclude_self and col_start < row_end + offset and row_start + offset < col_end:
+                rows = np.arange(max(row_start + offset, col_start), min(row_end + offset, col_end))
+                tile[rows - offset - row_start, rows - col_start] = -np.inf
+            top = _top_k_unordered(tile, k)
+            best_ids = np.hstack([best_ids, top + col_start])
+            best_scores = np.hstack([best_scores, np.take_along_axis(tile, top, axis=1)])
+            keep = _top_k_unordered(best_scores, k)
+            best_ids = np.take_along_axis(best_ids, keep, axis=1)
+            best_scores = np.take_along_axis(best_scores, keep, axis=1)
+        order = np.argsort(-best_scores, axis=1, kind="stable")
+        return row_tile, np.take_along_axis(best_ids, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+    for (row_start, row_end), tile_ids, tile_scores in _run_tiles(process, _row_tiles(len(a), tile_size), max_workers):
+        indices[row_start:row_end] = tile_ids
+        scores[row_start:row_end] = tile_scores
+
+    if output_dir:
+        indices.flush()
+        scores.flush()
+        return (np.load(os.path.join(output_dir, "indices.npy"), mmap_mode="r"),
+                np.load(os.path.join(output_dir, "scores.npy"), mmap_mode="r"))
+    return indices, scores
+
+
+def _top_k_unordered(scores, k):
+    if scores.shape[1] <= k:
+        return np.broadcast_to(np.arange(scores.shape[1]), scores.shape).copy()
+    return np.argpartition(-scores, k - 1, axis=1)[:, :k]
+
+
+def iter_pairs_above_threshold(embeddings, threshold, normalize=False, tile_size=None,
+                               cache_budget=DEFAULT_CACHE_BUDGET_BYTES, max_workers=None):
+    """
+    Stream (i, j, score) arrays for every pair i < j whose inner product is at least `threshold`,
+    one batch per row tile. Only the upper triangle of the similarity matrix is computed.
+    """
+    x = _as_float32(embeddings, normalize)
+    tile_size = tile_size or _tile_size(x.shape[1], cache_budget)
+
+    def process(row_tile):
+        row_start, row_end = row_tile
+        found_i, found_j, found_s = [], [], []
+        for col_start, col_end in _row_tiles(len(x), tile_size):
+            if col_end <= row_start:
+                continue
+            tile = x[row_start:row_end] @ x[col_start:col_end].T
+            i, j = np.nonzero(tile >= threshold)
+            i, j = i + row_start, j + col_start
+            upper = i < j
+            found_i.append(i[upper])
+            found_j.append(j[upper])
+            found_s.append(tile[i[upper] - row_start, j[upper] - col_start])
+        return np.concatenate(found_i), np.concatenate(found_j), np.concatenate(found_s)
+
+    for pairs in _run_tiles(process, _row_tiles(len(x), tile_size), max_workers):
+        if len(pairs[0]):
+            yield pairs
+
+
+def write_pairs_above_threshold(embeddings, threshold, output_file, **kwargs):
+    """
+    Stream thresholded pairs to a CSV file (i,j,score) and return the number of pairs written.
+    """
+    count = 0
+    with open(output_file, "w") as f:
+        f.write("i,j,score\n")
+        for i, j, s in iter_pairs_above_threshold(embeddings, threshold, **kwargs):
+            np.savetxt(f, np.column_stack([i, j, s]), fmt=["%d", "%d", "%.6f"], delimiter=",")
+            count += len(i)
+    return count
+
+
+def find_near_duplicates(embeddings, threshold=0.97, **kwargs):
+    """
+    Group catalog items whose embeddings are at least `threshold` similar (transitively).
+
+    Returns a list of index groups with two or more members, largest first.
+    """
+    parent = np.arange(len(embeddings))
+
+    def find(node):
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    for i_batch, j_batch, _ in iter_pairs_above_threshold(embeddings, threshold, **kwargs):
+        for i, j in zip(i_batch.tolist(), j_batch.tolist()):
+            root_i, root_j = find(i), find(j)
+            if root_i != root_j:
+                parent[max(root_i, root_j)] = min(root_i, root_j)
+
+    groups = {}
+    for node in range(len(parent)):
+        groups.setdefault(find(node), []).append(node)
+    return sorted((g for g in groups.values() if len(g) > 1), key=len, reverse=True)
+
+
+def downsampled_similarity(embeddings_a, embeddings_b=None, grid=100, tile_size=None,
+                           cache_budget=DEFAULT_CACHE_BUDGET_BYTES):
+    """
+    Mean inner product over a grid x grid partition of the similarity matrix, computed tile by
+    tile. Pass the result to seaborn.heatmap instead of the full np.inner matrix.
+    """
+    a = np.asarray(embeddings_a, dtype=np.float32)
+    b = a if embeddings_b is None else np.asarray(embeddings_b, dtype=np.float32)
+    tile_size = tile_size or _tile_size(a.shape[1], cache_budget)
+    row_bins = np.minimum(np.arange(len(a)) * grid // len(a), grid - 1)
+    col_bins = np.minimum(np.arange(len(b)) * grid // len(b), grid - 1)
+    sums = np.zeros((grid, grid), dtype=np.float64)
+    for row_start, row_end in _row_tiles(len(a), tile_size):
+        row_segments, row_ids = _bin_segments(row_bins[row_start:row_end])
+        for col_start, col_end in _row_tiles(len(b), tile_size):
+            col_segments, col_ids = _bin_segments(col_bins[col_start:col_end])
+            tile = a[row_start:row_end] @ b[col_start:col_end].T
+            # Bins are contiguous index ranges, so each tile reduces with segment sums instead of
+            # n x grid indicator matrices
+            block = np.add.reduceat(np.add.reduceat(tile, row_segments, axis=0), col_segments, axis=1)
+            sums[row_ids[:, None], col_ids] += block
+    counts = np.outer(np.bincount(row_bins, minlength=grid), np.bincount(col_bins, minlength=grid))
+    return sums / np.maximum(counts, 1)
+
+
+def _bin_segments(bins):
+    # Start offsets and bin ids of the runs in a sorted bin assignment
+    starts = np.flatnonzero(np.r_[True, bins[1:] != bins[:-1]])
+    return starts, bins[starts]
+
+
+# (Optional) Benchmark: time and peak memory of top-k and threshold joins vs. the dense np.inner matrix.
+# On one core all-pairs work grows quadratically (1M items is ~100x the 100k run), so with
+# --sample-rows only that many query rows are joined against the full catalog and the top-k time is
+# extrapolated; memory is measured on the full-size catalog either way.
+if __name__ == "__main__":
+    import argparse
+    import resource
+    import tempfile
+    import time
+
+    parser = argparse.ArgumentParser(description="Benchmark the tiled all-pairs similarity engine")
+    parser.add_argument("-n", type=int, nargs="+", default=[100_000, 1_000_000], help="catalog sizes")
+    parser.add_argument("-d", type=int, default=256, help="embedding dimension (Titan multimodal: 256, 384 or 1024)")
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--threshold", type=float, default=0.95)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--sample-rows", type=int, default=None,
+                        help="join only this many query rows for catalogs larger than it and extrapolate")
+    args = parser.parse_args()
+
+    def peak_rss_mib():
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    rng = np.random.default_rng(0)
+    print(f"tile size at d={args.d}: {_tile_size(args.d, DEFAULT_CACHE_BUDGET_BYTES)}")
+    for n in args.n:
+        # Synthetic catalog with ~1% planted near-duplicates
+        x = rng.standard_normal((n, args.d), dtype=np.float32)
+        duplicates = rng.choice(n, n // 100, replace=False)
+        x[duplicates] = x[rng.choice(n, len(duplicates))] + 0.05 * rng.standard_normal((len(duplicates), args.d), dtype=np.float32)
+        x /= np.sqrt(np.einsum("ij,ij->i", x, x))[:, None]  # no n x d temporary, unlike np.linalg.norm
+        print(f"n={n:,} d={args.d}: embeddings {x.nbytes / 2**20:,.0f} MiB, "
+              f"dense np.inner matrix would need {n * n * 4 / 2**30:,.1f} GiB")
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            if args.sample_rows and args.sample_rows < n:
+                start = time.perf_counter()
+                top_k_neighbors(x[:args.sample_rows], x, k=args.k, output_dir=tmp_dir, max_workers=args.workers,
+                                row_offset=0)
+                elapsed = time.perf_counter() - start
+                print(f"  top-{args.k} neighbours, {args.sample_rows:,} of {n:,} rows: {elapsed:8.1f} s "
+                      f"(~{elapsed * n / args.sample_rows:,.0f} s for all rows), peak RSS {peak_rss_mib():,.0f} MiB")
+                continue
+
+            start = time.perf_counter()
+            top_k_neighbors(x, k=args.k, output_dir=tmp_dir, max_workers=args.workers)
+            print(f"  top-{args.k} neighbours: {time.perf_counter() - start:8.1f} s, peak RSS {peak_rss_mib():,.0f} MiB")
+
+            start = time.perf_counter()
+            pairs = write_pairs_above_threshold(x, args.threshold, os.path.join(tmp_dir, "pairs.csv"), max_workers=args.workers)
+            print(f"  pairs >= {args.threshold}: {time.perf_counter() - start:8.1f} s, {pairs:,} pairs, peak RSS {peak_rss_mib():,.0f} MiB")
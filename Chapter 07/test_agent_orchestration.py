@@ -0,0 +1,79 @@
+import time
+
+import pytest
+
+from agent_orchestration import AgentOrchestrator, IntentRouter
+
+
+class StubAgent:
+    """
+    Stands in for a Strands Agent: records its prompts and sleeps for `latency` seconds per call.
+    """
+
+    def __init__(self, name, latency=0.0, error=None):
+        self.name = name
+        self.latency = latency
+        self.error = error
+        self.prompts = []
+
+    def __call__(self, prompt):
+        self.prompts.append(prompt)
+        time.sleep(self.latency)
+        if self.error is not None:
+            raise self.error
+        return f"[{self.name}] handled"
+
+
+@pytest.fixture
+def agents():
+    specialists = {"order": StubAgent("order"), "inventory": StubAgent("inventory")}
+    orchestration = AgentOrchestrator(specialists, fallback=StubAgent("orchestrator"), timeout=0.5)
+    yield orchestration, specialists
+    orchestration.close()
+
+
+@pytest.mark.parametrize("message, stages", [
+    ("I want to buy a MacBook Pro", [["inventory"], ["order"]]),
+    ("Please buy me two wireless mice", [["inventory"], ["order"]]),
+    ("I want to order a MacBook Pro. Can you check if it's available and create an order for me?",
+     [["inventory"], ["order"]]),
+    ("In order to compare, what laptops do you have?", [["inventory"]]),
+    ("Can I return my headphones?", [["order"]]),
+    ("Can you check the status of my order ORD001?", [["order"]]),
+    ("What is the status of ORD002 and is the mechanical keyboard available?", [["order", "inventory"]]),
+    ("Hello, what can you help me with?", []),
+])
+def test_routes(message, stages):
+    assert IntentRouter().route(message).stages == stages
+
+
+def test_order_stage_sees_the_stock_check(agents):
+    orchestration, specialists = agents
+    answer = orchestration.process("CUST001", "I want to buy a MacBook Pro")
+    assert "Result from the inventory agent:\n[inventory] handled" in specialists["order"].prompts[0]
+    assert "[inventory] handled" in answer and "[order] handled" in answer
+
+
+@pytest.mark.parametrize("inventory", [StubAgent("inventory", latency=2.0), StubAgent("inventory", error=RuntimeError())])
+def test_no_order_without_a_successful_stock_check(agents, inventory):
+    orchestration, specialists = agents
+    specialists["inventory"] = inventory
+    start = time.perf_counter()
+    answer = orchestration.process("CUST001", "I want to buy a MacBook Pro")
+    assert time.perf_counter() - start < 1.5
+    assert specialists["order"].prompts == []
+    assert "order request was not attempted" in answer
+
+
+def test_failing_specialist_degrades_a_concurrent_stage(agents):
+    orchestration, specialists = agents
+    specialists["order"] = StubAgent("order", error=RuntimeError("boom"))
+    answer = orchestration.process("CUST001", "What is the status of ORD002 and is the mechanical keyboard available?")
+    assert "The order service is unavailable right now." in answer
+    assert "[inventory] handled" in answer
+
+
+def test_unclassified_requests_go_to_the_fallback(agents):
+    orchestration, specialists = agents
+    assert orchestration.process("CUST001", "Hello, what can you help me with?") == "[orchestrator] handled"
+    assert specialists["order"].prompts == specialists["inventory"].prompts == []
@@ -0,0 +1,36 @@
+import os
+
+import pandas as pd
+import pytest
+
+from catalog_loader import CATALOG_SCHEMA, IMAGES_PREFIX, load_catalog, load_catalog_pandas_baseline, write_fixture
+
+
+@pytest.fixture(scope="module")
+def abo(tmp_path_factory):
+    root = str(tmp_path_factory.mktemp("abo"))
+    shards = write_fixture(root, n_items=1000, n_shards=2)
+    return root, shards
+
+
+def test_matches_the_pandas_baseline(abo, tmp_path):
+    root, shards = abo
+    columns = CATALOG_SCHEMA.names
+    expected = load_catalog_pandas_baseline(root, shards)[columns].sort_values("item_id", ignore_index=True)
+    catalog = load_catalog(root, str(tmp_path / "catalog"), shards)
+    actual = catalog.to_pandas()[columns].sort_values("item_id", ignore_index=True)
+    assert 0 < len(actual) == len(catalog) < 1000
+    pd.testing.assert_frame_equal(actual, expected)
+
+
+def test_lookup_and_cached_reload(abo, tmp_path):
+    root, shards = abo
+    cache_dir = str(tmp_path / "catalog")
+    row = load_catalog(root, cache_dir, shards).to_pandas().iloc[0].to_dict()
+    manifest_mtime = os.path.getmtime(os.path.join(cache_dir, "manifest.json"))
+
+    reloaded = load_catalog(root, cache_dir, shards)
+    assert os.path.getmtime(os.path.join(cache_dir, "manifest.json")) == manifest_mtime
+    assert reloaded.lookup(row["item_id"]) == row
+    assert row["img_full_path"] == f"{root}/{IMAGES_PREFIX}{row['path']}"
+    assert reloaded.lookup("B999999999") is None
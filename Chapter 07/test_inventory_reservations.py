@@ -0,0 +1,147 @@
+import boto3
+import pytest
+from botocore.stub import ANY, Stubber
+
+from inventory_reservations import (
+    DynamoDBInventory, InMemoryInventory, InsufficientStock, ReservationNotFound, UnknownProduct, create_order,
+)
+
+
+@pytest.fixture
+def dynamodb():
+    client = boto3.client("dynamodb", region_name="us-east-1", aws_access_key_id="test", aws_secret_access_key="test")
+    with Stubber(client) as stubber:
+        yield DynamoDBInventory("inventory", client, clock=lambda: 1000.0, retry_delay=0), stubber
+        stubber.assert_no_pending_responses()
+
+
+def cancel(stubber, *codes, items=None):
+    reasons = [{"Code": code} for code in codes]
+    for reason, item in zip(reasons, items or []):
+        if item is not None:
+            reason["Item"] = item
+    stubber.add_client_error("transact_write_items", service_error_code="TransactionCanceledException",
+                             modeled_fields={"CancellationReasons": reasons})
+
+
+def reservation_item(reservation_id, items, expires_at=1900):
+    return {"Item": {
+        "sku": {"S": f"RESERVATION#{reservation_id}"},
+        "items": {"M": {sku: {"N": str(quantity)} for sku, quantity in items.items()}},
+        "expires_at": {"N": str(expires_at)},
+    }}
+
+
+def test_reserve_and_commit(dynamodb):
+    inventory, stubber = dynamodb
+    stubber.add_response("transact_write_items", {}, {"TransactItems": ANY})
+    reservation = inventory.reserve({"macbook-pro-13": 1, "wireless-mouse": 2}, ttl=900, reservation_id="r1")
+    assert reservation.expires_at == 1900
+
+    stubber.add_response("get_item", reservation_item("r1", reservation.items))
+    stubber.add_response("transact_write_items", {})
+    assert inventory.commit("r1").items == {"macbook-pro-13": 1, "wireless-mouse": 2}
+
+
+def test_reserve_reports_stock_from_the_cancellation(dynamodb):
+    inventory, stubber = dynamodb
+    cancel(stubber, "None", "ConditionalCheckFailed", "None",
+           items=[None, {"sku": {"S": "wireless-mouse"}, "available": {"N": "1"}}])
+    with pytest.raises(InsufficientStock) as error:
+        inventory.reserve({"macbook-pro-13": 1, "wireless-mouse": 2})
+    assert (error.value.sku, error.value.available) == ("wireless-mouse", 1)
+
+
+def test_unknown_sku_raises_the_same_error_in_both_backends(dynamodb):
+    inventory, stubber = dynamodb
+    cancel(stubber, "ConditionalCheckFailed", "None")
+    with pytest.raises(UnknownProduct):
+        inventory.reserve({"no-such-sku": 1})
+    with pytest.raises(UnknownProduct):
+        InMemoryInventory({"macbook-pro-13": 3}).reserve({"no-such-sku": 1})
+
+
+def test_commit_retries_transaction_conflicts(dynamodb):
+    inventory, stubber = dynamodb
+    stubber.add_response("get_item", reservation_item("r1", {"macbook-pro-13": 1}))
+    cancel(stubber, "TransactionConflict", "None")
+    stubber.add_response("transact_write_items", {})
+    assert inventory.commit("r1").reservation_id == "r1"
+
+
+def test_commit_conflicts_are_not_reported_as_missing_reservations(dynamodb):
+    inventory, stubber = dynamodb
+    stubber.add_response("get_item", reservation_item("r1", {"macbook-pro-13": 1}))
+    for _ in range(inventory.max_attempts):
+        cancel(stubber, "TransactionConflict", "None")
+    with pytest.raises(inventory.client.exceptions.TransactionCanceledException):
+        inventory.commit("r1")
+
+
+def test_commit_of_a_finished_reservation(dynamodb):
+    inventory, stubber = dynamodb
+    stubber.add_response("get_item", reservation_item("r1", {"macbook-pro-13": 1}))
+    cancel(stubber, "None", "ConditionalCheckFailed")
+    with pytest.raises(ReservationNotFound):
+        inventory.commit("r1")
+
+
+def test_release_expired(dynamodb):
+    inventory, stubber = dynamodb
+    stubber.add_response("scan", {"Items": [{"sku": {"S": "RESERVATION#r1"}}, {"sku": {"S": "RESERVATION#r2"}}]})
+    stubber.add_response("get_item", reservation_item("r1", {"macbook-pro-13": 1}, expires_at=900))
+    stubber.add_response("transact_write_items", {})
+    # r2 was committed between the scan and the release
+    stubber.add_response("get_item", {})
+    assert inventory.release_expired() == 1
+
+
+def test_create_order_writes_no_order_when_the_commit_fails():
+    clock = [0.0]
+    inventory = InMemoryInventory({"macbook-pro-13": 3}, clock=lambda: clock[0])
+    commit = inventory.commit
+
+    def expire_then_commit(reservation_id):
+        clock[0] = 10_000
+        inventory.release_expired()
+        return commit(reservation_id)
+
+    inventory.commit = expire_then_commit
+    orders_db = {}
+    with pytest.raises(ReservationNotFound):
+        create_order(inventory, orders_db, "CUST001", {"macbook-pro-13": 1})
+    assert orders_db == {}
+    assert inventory.available("macbook-pro-13") == 3
+
+
+def test_expired_reservation_cannot_be_committed_before_it_is_reaped(dynamodb):
+    inventory, stubber = dynamodb
+    stubber.add_response("get_item", reservation_item("r1", {"macbook-pro-13": 1}, expires_at=1000))
+    with pytest.raises(ReservationNotFound):
+        inventory.commit("r1")
+
+    clock = [0.0]
+    in_memory = InMemoryInventory({"macbook-pro-13": 3}, clock=lambda: clock[0])
+    reservation = in_memory.reserve({"macbook-pro-13": 2}, ttl=60)
+    clock[0] = 60
+    with pytest.raises(ReservationNotFound):
+        in_memory.commit(reservation.reservation_id)
+    assert in_memory.on_hand["macbook-pro-13"] == 3
+    assert in_memory.available("macbook-pro-13") == 3
+
+
+def test_commit_condition_requires_an_unexpired_reservation(dynamodb):
+    inventory, stubber = dynamodb
+    stubber.add_response("get_item", reservation_item("r1", {"macbook-pro-13": 1}))
+    stubber.add_response("transact_write_items", {}, {"TransactItems": [
+        {"Update": {
+            "TableName": "inventory", "Key": {"sku": {"S": "macbook-pro-13"}},
+            "UpdateExpression": "SET on_hand = on_hand - :q", "ExpressionAttributeValues": {":q": {"N": "1"}},
+        }},
+        {"Delete": {
+            "TableName": "inventory", "Key": {"sku": {"S": "RESERVATION#r1"}},
+            "ConditionExpression": "attribute_exists(sku) AND expires_at > :now",
+            "ExpressionAttributeValues": {":now": {"N": "1000"}},
+        }},
+    ]})
+    inventory.commit("r1")
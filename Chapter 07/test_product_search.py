@@ -0,0 +1,61 @@
+from product_search import ProductSearchIndex
+
+# A subset of inventory_db from Example75
+INVENTORY = {
+    "macbook-pro-13": {
+        "stock": 8, "category": "laptops", "brand": "Apple", "model": "MacBook Pro 13-inch",
+        "specs": "M2 chip, 8GB RAM, 256GB SSD, 13.3-inch Retina display",
+        "description": "Powerful and portable laptop perfect for professionals and students",
+    },
+    "dell-xps-13": {
+        "stock": 15, "category": "laptops", "brand": "Dell", "model": "XPS 13",
+        "specs": "Intel i7, 16GB RAM, 512GB SSD, 13.4-inch 4K display",
+        "description": "Premium Windows laptop with exceptional build quality and performance",
+    },
+    "wireless-mouse": {
+        "stock": 50, "category": "accessories", "brand": "Logitech", "model": "MX Master 3",
+        "specs": "Wireless, ergonomic design, 70-day battery life",
+        "description": "Premium wireless mouse with precision tracking and comfortable grip",
+    },
+    "mechanical-keyboard": {
+        "stock": 30, "category": "accessories", "brand": "Keychron", "model": "K2 V2",
+        "specs": "Bluetooth/wired, RGB backlight, Gateron switches",
+        "description": "Compact mechanical keyboard with wireless connectivity and customizable lighting",
+    },
+}
+
+
+def test_generic_sku_words_do_not_outrank_product_matches():
+    index = ProductSearchIndex(INVENTORY)
+    results = dict(index.search("wireless keyboard"))
+    assert index.find("wireless keyboard")[0]["model"] == "K2 V2"
+    assert results["wireless-mouse"] < results["mechanical-keyboard"]
+
+
+def test_whole_sku_still_matches_exactly():
+    index = ProductSearchIndex(INVENTORY)
+    assert index.search("wireless-mouse")[0][0] == "wireless-mouse"
+    assert index.search("Wireless Mouse")[0][0] == "wireless-mouse"
+    assert index.search("xps 13")[0][0] == "dell-xps-13"
+
+
+def test_fuzzy_fallback_after_last_product_with_token_is_removed():
+    index = ProductSearchIndex(INVENTORY)
+    index.upsert("dell-inspirion-14", {"stock": 3, "category": "laptops", "brand": "Dell", "model": "Inspirion 14"})
+    index.upsert("dell-inspiron-15", {"stock": 3, "category": "laptops", "brand": "Dell", "model": "Inspiron 15"})
+    index.remove("dell-inspiron-15")
+    assert "inspiron" not in index.postings
+    assert index.search("inspiron")[0][0] == "dell-inspirion-14"
+
+
+def test_upsert_after_in_place_edit_drops_the_old_tokens():
+    inventory = {sku: dict(record) for sku, record in INVENTORY.items()}
+    index = ProductSearchIndex(inventory)
+    inventory["dell-xps-13"]["model"] = "Latitude 7440"
+    index.upsert("dell-xps-13", inventory["dell-xps-13"])
+    assert "xps" not in index.postings
+    assert index.search("latitude")[0][0] == "dell-xps-13"
+
+    index.update_stock("wireless-mouse", 0)
+    assert inventory["wireless-mouse"]["stock"] == 50
+    assert index.find("MX Master 3")[0]["stock"] == 0
@@ -0,0 +1,92 @@
+import pytest
+
+from session_memory import SessionMemory
+
+
+def word_count(text):
+    return len(text.split())
+
+
+def message(i, words=4):
+    return " ".join(f"m{i}" for _ in range(words))
+
+
+class StubSummarizer:
+    """
+    Stands in for llm_summarizer: appends the first word of every message to the summary.
+    """
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.calls = 0
+
+    def __call__(self, summary, messages):
+        self.calls += 1
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("model unavailable")
+        return " ".join([summary] + [m.content.split()[0] for m in messages]).strip()
+
+
+def prompt_tokens(memory, session_id="s1"):
+    return sum(m.tokens for m in memory.prompt_messages(session_id))
+
+
+def test_window_keeps_the_newest_messages_within_budget():
+    memory = SessionMemory(window_tokens=10, token_counter=word_count)
+    for i in range(20):
+        memory.add_message("s1", "human", message(i))
+    assert [m.content for m in memory.prompt_messages("s1")] == [message(18), message(19)]
+    with pytest.raises(ValueError):
+        memory.add_message("s1", "user", "hello")
+
+
+def test_messages_leaving_the_window_are_summarized_in_batches():
+    summarizer = StubSummarizer()
+    memory = SessionMemory(summarizer, window_tokens=8, compact_tokens=8, summary_tokens=3, token_counter=word_count)
+    for i in range(10):
+        memory.add_message("s1", "human", message(i))
+    messages = memory.prompt_messages("s1")
+    assert messages[0].role == "system" and messages[0].tokens <= 3 + 6
+    assert summarizer.calls == memory.sessions["s1"].compactions == 4
+    assert [m.content for m in messages[-2:]] == [message(8), message(9)]
+    assert memory.sessions["s1"].pending == []
+
+
+def test_failing_summarizer_keeps_the_prompt_within_budget():
+    summarizer = StubSummarizer(failures=1000)
+    memory = SessionMemory(summarizer, window_tokens=8, compact_tokens=8, token_counter=word_count,
+                           max_summary_failures=3)
+    for i in range(100):
+        memory.add_message("s1", "human", message(i))
+        assert prompt_tokens(memory) <= 8 + 8 + 4
+    assert memory.sessions["s1"].summary_failures >= 3
+
+    summarizer.failures = 0
+    for i in range(100, 104):
+        memory.add_message("s1", "human", message(i))
+    state = memory.sessions["s1"]
+    assert state.summary and state.summary_failures == 0
+
+
+def test_compaction_does_not_overwrite_a_reloaded_session(tmp_path):
+    memory = None
+
+    def summarizer(summary, messages):
+        if not summarizer.reloaded:
+            summarizer.reloaded = True
+            # Evict s1 and reload it while this summary is being written
+            memory.add_message("other", "human", "hello")
+            memory.add_message("s1", "human", "written while summarizing")
+        return "summary"
+    summarizer.reloaded = False
+
+    memory = SessionMemory(summarizer, window_tokens=8, compact_tokens=8, max_sessions=1, token_counter=word_count,
+                           sqlite_path=str(tmp_path / "sessions.db"))
+    # The fourth message starts the compaction; nothing is written to s1 after it
+    for i in range(4):
+        memory.add_message("s1", "human", message(i))
+    assert summarizer.reloaded
+
+    restored = SessionMemory(summarizer, sqlite_path=str(tmp_path / "sessions.db"), token_counter=word_count)
+    assert "written while summarizing" in [m.content for m in restored.prompt_messages("s1")]
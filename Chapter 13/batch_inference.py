@@ -0,0 +1,368 @@
+"""
+Micro-batching inference for the JumpStart predictors (Example131, Example133)
+
+predict_and_print and the example-payload loop call predictor.predict one prompt at a time, and
+query the pre-trained and fine-tuned endpoints one after the other. This module provides:
+
+- MicroBatcher: queues prompts and sends them to an endpoint as dynamic micro-batches, flushed when
+  max_batch_size prompts are waiting or max_wait_ms after the first one arrived. The LMI / DJL
+  text-generation containers accept a list of "inputs" and return one result per input; the TGI
+  containers behind the JumpStart Llama 3 models only take a single input. With the default
+  batch_mode="auto" a micro-batch is sent as one list request until the endpoint rejects one or
+  answers with the wrong shape; that batch is then retried one prompt per request, and if that
+  works the batcher sends single-input requests from then on. batch_mode="list" and "single"
+  force one behaviour. At most max_concurrency requests are in flight per endpoint
+- compare_models: runs every prompt against several predictors concurrently and fills the
+  comparison DataFrame as results arrive (optionally refreshing a notebook display)
+- LocalTextGenerationEndpoint / HTTPPredictor: an offline HTTP stand-in for a SageMaker endpoint
+
+Usage in Example131:
+
+    models = {
+        "Response from non-finetuned model": MicroBatcher(pretrained_predictor, custom_attributes="accept_eula=true"),
+        "Response from fine-tuned model": MicroBatcher(finetuned_predictor),
+    }
+    df = compare_models(test_dataset.select(range(5)), render_prompt, models, parameters={"max_new_tokens": 100})
+
+and for the example-payload loop in Example133:
+
+    batcher = MicroBatcher(predictor)
+    futures = [batcher.submit(p.body[p.prompt_key], p.body.get("parameters")) for p in example_payloads]
+"""
+
+import json
+import logging
+import queue
+import threading
+import time
+import urllib.request
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BATCH_SIZE = 8
+DEFAULT_MAX_WAIT_MS = 20
+DEFAULT_MAX_CONCURRENCY = 2
+BATCH_MODES = ("auto", "list", "single")
+
+_STOP = object()
+
+
+def extract_generated_text(response):
+    """
+    Normalize a text-generation response: {"generated_text": ...}, [{"generated_text": ...}],
+    or a list with one of those per input.
+    """
+    if isinstance(response, dict):
+        return response.get("generated_text")
+    if isinstance(response, list):
+        if len(response) == 1 and isinstance(response[0], dict) and "generated_text" in response[0]:
+            return response[0]["generated_text"]
+        return [extract_generated_text(item) for item in response]
+    return response
+
+
+class MicroBatcher:
+    def __init__(self, predictor, max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_wait_ms=DEFAULT_MAX_WAIT_MS,
+                 max_concurrency=DEFAULT_MAX_CONCURRENCY, custom_attributes=None, batch_mode="auto"):
+        if batch_mode not in BATCH_MODES:
+            raise ValueError(f"batch_mode must be one of {', '.join(BATCH_MODES)}, got '{batch_mode}'")
+        self.predictor = predictor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_concurrency = max_concurrency
+        self.custom_attributes = custom_attributes
+        self.batch_mode = batch_mode
+        # Whether the endpoint takes a list of inputs; None until a list request has been answered
+        self.accepts_lists = {"auto": None, "list": True, "single": False}[batch_mode]
+        self.stats = {"prompts": 0, "batches": 0, "errors": 0, "list_fallbacks": 0}
+        self._stats_lock = threading.Lock()
+        self._queue = queue.Queue()
+        # Slots bound the micro-batches being sent; the pool bounds the requests they turn into
+        self._slots = threading.Semaphore(max_concurrency)
+        self._requests = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="micro-batch")
+        self._collector = threading.Thread(target=self._collect, daemon=True, name="micro-batcher")
+        self._collector.start()
+
+    def submit(self, prompt, parameters=None) -> Future:
+        """
+        Queue one prompt; the future resolves to the generated text.
+        """
+        future = Future()
+        self._queue.put((prompt, parameters or {}, future))
+        return future
+
+    def predict(self, prompt, parameters=None):
+        return self.submit(prompt, parameters).result()
+
+    def close(self):
+        """
+        Flush queued prompts and wait for in-flight batches.
+        """
+        self._queue.put(_STOP)
+        self._collector.join()
+        for _ in range(self.max_concurrency):
+            self._slots.acquire()
+        for _ in range(self.max_concurrency):
+            self._slots.release()
+        self._requests.shutdown(wait=True)
+
+    def _collect(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch, stop = [item], False
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            # Wait for a free slot; prompts queued meanwhile top up the batch
+            self._slots.acquire()
+            while not stop and len(batch) < self.max_batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            self._dispatch(batch)
+            if stop:
+                return
+
+    def _dispatch(self, batch):
+        # Prompts can only share a request when their generation parameters match
+        groups = {}
+        for prompt, parameters, future in batch:
+            groups.setdefault(json.dumps(parameters, sort_keys=True), []).append((prompt, parameters, future))
+        groups = list(groups.values())
+        if self.accepts_lists is False:
+            groups = [[item] for group in groups for item in group]
+        remaining = [len(groups)]
+        lock = threading.Lock()
+
+        def run(group):
+            try:
+                self._run_group(group)
+            finally:
+                with lock:
+                    remaining[0] -= 1
+                    if remaining[0] == 0:
+                        self._slots.release()
+
+        for group in groups:
+            self._requests.submit(run, group)
+
+    def _predict(self, payload):
+        if self.custom_attributes:
+            return self.predictor.predict(payload, custom_attributes=self.custom_attributes)
+        return self.predictor.predict(payload)
+
+    def _run_group(self, group):
+        prompts = [prompt for prompt, _, _ in group]
+        parameters = group[0][1]
+        with self._stats_lock:
+            self.stats["prompts"] += len(group)
+            self.stats["batches"] += 1
+        try:
+            if self.accepts_lists is not False and len(group) > 1:
+                try:
+                    texts = self._predict_list(prompts, parameters)
+                except Exception as e:
+                    if self.batch_mode == "list":
+                        raise
+                    logger.warning(f"Batched request failed ({e!s:.200}); retrying its {len(group)} prompts one by one")
+                    with self._stats_lock:
+                        self.stats["list_fallbacks"] += 1
+                    texts = self._predict_each(prompts, parameters)
+                    # Single requests work where the list did not: the endpoint takes one input
+                    if self.accepts_lists is None:
+                        self.accepts_lists = False
+                        logger.info("Endpoint does not accept batched inputs; sending one prompt per request")
+                else:
+                    self.accepts_lists = True
+            else:
+                texts = self._predict_each(prompts, parameters)
+        except Exception as e:
+            with self._stats_lock:
+                self.stats["errors"] += 1
+            for _, _, future in group:
+                future.set_exception(e)
+            return
+        for (_, _, future), text in zip(group, texts):
+            future.set_result(text)
+
+    def _predict_list(self, prompts, parameters):
+        texts = extract_generated_text(self._predict({"inputs": prompts, "parameters": parameters}))
+        if not isinstance(texts, list) or len(texts) != len(prompts):
+            raise ValueError(f"Expected {len(prompts)} results from a batched request, got {texts!r:.200}")
+        return texts
+
+    def _predict_each(self, prompts, parameters):
+        return [extract_generated_text(self._predict({"inputs": p, "parameters": parameters})) for p in prompts]
+
+
+def compare_models(datapoints, render_prompt: Callable[[dict], str], models: Dict[str, MicroBatcher],
+                   parameters: Optional[dict] = None, ground_truth_key="response", display_handle=None):
+    """
+    Run every datapoint's prompt through all models concurrently and return the comparison
+    DataFrame. Cells are filled as responses arrive; pass a display handle
+    (display(df, display_id=True)) to see the table update live in a notebook.
+    """
+    import pandas as pd
+
+    datapoints = list(datapoints)
+    inputs = [render_prompt(datapoint) for datapoint in datapoints]
+    df = pd.DataFrame({"Inputs": inputs, "Ground Truth": [d.get(ground_truth_key) for d in datapoints]})
+    for column in models:
+        df[column] = None
+    futures = {}
+    for column, batcher in models.items():
+        for row, prompt in enumerate(inputs):
+            futures[batcher.submit(prompt, parameters)] = (row, column)
+    for future in as_completed(futures):
+        row, column = futures[future]
+        try:
+            df.at[row, column] = future.result()
+        except Exception as e:
+            df.at[row, column] = f"Error: {e}"
+        if display_handle is not None:
+            display_handle.update(df)
+    return df
+
+
+class LocalTextGenerationEndpoint:
+    """
+    Local HTTP stand-in for a text-generation endpoint. Latency is modeled as a fixed per-request
+    overhead plus a per-input cost that is cheaper when inputs share a batch.
+    """
+
+    def __init__(self, request_overhead_ms=60, per_input_ms=25, batch_efficiency=0.3, name="model",
+                 accepts_lists=True):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        endpoint = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                inputs = payload["inputs"]
+                batch = inputs if isinstance(inputs, list) else [inputs]
+                endpoint.requests += 1
+                if isinstance(inputs, list) and not endpoint.accepts_lists:
+                    # What a TGI container answers to a list of inputs
+                    self.send_error(422, "Failed to deserialize the JSON body: inputs: invalid type: sequence")
+                    return
+                cost = endpoint.per_input_ms * (1 + endpoint.batch_efficiency * (len(batch) - 1))
+                time.sleep((endpoint.request_overhead_ms + cost) / 1000)
+                results = [{"generated_text": f"[{endpoint.name}] summary of: {text[-40:]}"} for text in batch]
+                body = json.dumps(results if isinstance(inputs, list) else results[0]).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.request_overhead_ms = request_overhead_ms
+        self.per_input_ms = per_input_ms
+        self.batch_efficiency = batch_efficiency
+        self.name = name
+        self.accepts_lists = accepts_lists
+        self.requests = 0
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/invocations"
+
+    def shutdown(self):
+        self.server.shutdown()
+
+
+class HTTPPredictor:
+    """
+    Minimal stand-in for sagemaker.predictor.Predictor (JSON in, JSON out) for a URL.
+    """
+
+    def __init__(self, url, timeout=60):
+        self.url = url
+        self.timeout = timeout
+
+    def predict(self, data, custom_attributes=None):
+        headers = {"Content-Type": "application/json"}
+        if custom_attributes:
+            headers["X-Amzn-SageMaker-Custom-Attributes"] = custom_attributes
+        request = urllib.request.Request(self.url, data=json.dumps(data).encode(), headers=headers, method="POST")
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read())
+
+
+# (Optional) Throughput benchmark: sequential predict vs. micro-batched, concurrent comparison
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Micro-batching benchmark against local stand-in endpoints")
+    parser.add_argument("--prompts", type=int, default=48)
+    parser.add_argument("--batch-size", type=int, default=8)
+    args = parser.parse_args()
+
+    pretrained_endpoint = LocalTextGenerationEndpoint(name="pretrained")
+    finetuned_endpoint = LocalTextGenerationEndpoint(name="finetuned")
+    pretrained, finetuned = HTTPPredictor(pretrained_endpoint.url), HTTPPredictor(finetuned_endpoint.url)
+
+    datapoints = [{"instruction": "Summarize the text.", "context": f"Document {i} " + "lorem ipsum " * 20,
+                   "response": f"Summary {i}"} for i in range(args.prompts)]
+
+    def render_prompt(datapoint):
+        return (f"### Instruction:\n{datapoint['instruction']}\n\n### Input:\n{datapoint['context']}\n\n"
+                "\n\n### Response:\n")
+
+    parameters = {"max_new_tokens": 100}
+    start = time.perf_counter()
+    for datapoint in datapoints:
+        payload = {"inputs": render_prompt(datapoint), "parameters": parameters}
+        extract_generated_text(pretrained.predict(payload, custom_attributes="accept_eula=true"))
+        extract_generated_text(finetuned.predict(payload))
+    sequential = time.perf_counter() - start
+    print(f"sequential predict:  {2 * args.prompts / sequential:6.1f} predictions/s ({sequential:.2f} s)")
+
+    models = {
+        "Response from non-finetuned model": MicroBatcher(pretrained, max_batch_size=args.batch_size,
+                                                          custom_attributes="accept_eula=true"),
+        "Response from fine-tuned model": MicroBatcher(finetuned, max_batch_size=args.batch_size),
+    }
+    start = time.perf_counter()
+    df = compare_models(datapoints, render_prompt, models, parameters=parameters)
+    batched = time.perf_counter() - start
+    print(f"micro-batched:       {2 * args.prompts / batched:6.1f} predictions/s ({batched:.2f} s), "
+          f"speedup {sequential / batched:.1f}x")
+    for column, batcher in models.items():
+        print(f"  {column}: {batcher.stats}")
+    assert df.notna().all().all()
+    print(df.head(3).to_string(max_colwidth=40))
+
+    # An endpoint that only takes single inputs (TGI): the first list request is rejected and retried
+    # per prompt, later micro-batches go out as single requests, never more than max_concurrency at once
+    tgi_endpoint = LocalTextGenerationEndpoint(name="tgi", accepts_lists=False)
+    batcher = MicroBatcher(HTTPPredictor(tgi_endpoint.url), max_batch_size=args.batch_size)
+    start = time.perf_counter()
+    results = [future.result() for future in [batcher.submit(render_prompt(d), parameters) for d in datapoints]]
+    elapsed = time.perf_counter() - start
+    batcher.close()
+    print(f"single-input endpoint: {len(results) / elapsed:6.1f} predictions/s, {tgi_endpoint.requests} requests, "
+          f"{batcher.stats}")
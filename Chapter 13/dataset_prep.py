@@ -0,0 +1,413 @@
+"""
+Streaming dataset preparation for JumpStart instruction fine-tuning (Example131, Example133)
+
+The notebooks load all of dolly-15k / dolphin-coder into memory, filter it with a Python lambda,
+shuffle it with train_test_split, write train.jsonl with to_json and then upload train.jsonl and
+template.json with S3Uploader as single blocking uploads. predict_and_print re-applies the
+template["prompt"].format(...) string on its own, so training and inference prompts can drift.
+
+This module provides:
+
+- PromptTemplate: one compiled template object that writes template.json for training and renders
+  the inference prompt, so both sides always use the same strings
+- prepare_dataset: a single streaming pass that filters, splits and writes records. The split is
+  deterministic and hash based (a record's split only depends on its key fields and the seed), so
+  no shuffle and no in-memory copy of the dataset are needed
+- output shards that are uploaded concurrently while the next shard is being written, through
+  S3Uploader-compatible backends (S3ShardUploader, or LocalDirectoryUploader for tests). The test
+  split carries an extra "prompt" field and must stay out of the training channel, so it is only
+  uploaded when a separate test_uploader is given. template.json is uploaded last, and a failed
+  pass deletes the shards it already uploaded, so no training job sees a partial dataset
+
+Usage in Example131:
+
+    template = PromptTemplate(prompt=DOLLY_PROMPT, completion=" {response}")
+    dolly = load_dataset("databricks/databricks-dolly-15k", split="train", streaming=True)
+    stats = prepare_dataset(
+        dolly, template, "./dolly_dataset", S3ShardUploader(output_bucket, "dolly_dataset"),
+        filter_fn=lambda r: r["category"] == "summarization", drop_columns=["category"],
+        test_uploader=S3ShardUploader(output_bucket, "dolly_evaluation"),
+    )
+    # test.jsonl records carry a "prompt" field rendered by template.render_inference
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import string
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# For instruction fine-tuning, the notebooks insert this key between input and output at inference time
+INPUT_OUTPUT_DEMARKATION_KEY = "\n\n### Response:\n"
+
+DOLLY_PROMPT = (
+    "Below is an instruction that describes a task, paired with an input that provides further context. "
+    "Write a response that appropriately completes the request.\n\n"
+    "### Instruction:\n{instruction}\n\n### Input:\n{context}\n\n"
+)
+DOLPHIN_CODER_PROMPT = "{system_prompt}\n\n### Input:\n{question}\n"
+
+
+class PromptTemplate:
+    """
+    A JumpStart instruction-tuning template ({"prompt": ..., "completion": ...}) parsed once.
+    """
+
+    def __init__(self, prompt, completion=" {response}", demarkation_key=INPUT_OUTPUT_DEMARKATION_KEY):
+        self.prompt = prompt
+        self.completion = completion
+        self.demarkation_key = demarkation_key
+        self.prompt_fields = self._fields(prompt)
+        self.completion_fields = self._fields(completion)
+
+    @staticmethod
+    def _fields(template):
+        fields = []
+        for _, field, spec, conversion in string.Formatter().parse(template):
+            if field is None:
+                continue
+            if not field.isidentifier() or spec or conversion:
+                raise ValueError(f"Unsupported template field '{{{field}}}': use plain {{name}} fields")
+            fields.append(field)
+        return tuple(dict.fromkeys(fields))
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        with open(path) as f:
+            template = json.load(f)
+        return cls(template["prompt"], template["completion"], **kwargs)
+
+    def to_dict(self):
+        return {"prompt": self.prompt, "completion": self.completion}
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f)
+
+    def validate(self, record):
+        missing = [field for field in self.prompt_fields + self.completion_fields if field not in record]
+        if missing:
+            raise KeyError(f"Record is missing template fields {missing}")
+
+    def render_prompt(self, record):
+        return self.prompt.format_map(record)
+
+    def render_inference(self, record):
+        """
+        The exact prompt to send to a model fine-tuned with this template.
+        """
+        return self.prompt.format_map(record) + self.demarkation_key
+
+    def render_completion(self, record):
+        return self.completion.format_map(record)
+
+
+def hash_split(record, key_fields, test_fraction, seed=0):
+    """
+    Deterministically assign a record to "train" or "test" from a hash of its key fields.
+    """
+    digest = hashlib.blake2b(digest_size=8, key=struct.pack("<Q", seed))
+    for field in key_fields:
+        digest.update(str(record.get(field, "")).encode())
+        digest.update(b"\x1f")
+    value = int.from_bytes(digest.digest(), "little") / 2**64
+    return "test" if value < test_fraction else "train"
+
+
+class LocalDirectoryUploader:
+    """
+    Stand-in for S3: "uploads" by copying into root/key.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def upload(self, local_path, key):
+        destination = os.path.join(self.root, key)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        shutil.copyfile(local_path, destination)
+        return destination
+
+    def delete(self, key):
+        try:
+            os.remove(os.path.join(self.root, key))
+        except FileNotFoundError:
+            pass
+
+
+class S3ShardUploader:
+    """
+    Upload files under s3://bucket/prefix/ with boto3's managed (multipart, multi-threaded) transfer.
+    """
+
+    def __init__(self, bucket, prefix="", s3_client=None):
+        if s3_client is None:
+            import boto3
+            s3_client = boto3.client("s3")
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+
+    @property
+    def location(self):
+        return f"s3://{self.bucket}/{self.prefix}"
+
+    def upload(self, local_path, key):
+        s3_key = f"{self.prefix}/{key}" if self.prefix else key
+        self.s3_client.upload_file(local_path, self.bucket, s3_key)
+        return f"s3://{self.bucket}/{s3_key}"
+
+    def delete(self, key):
+        s3_key = f"{self.prefix}/{key}" if self.prefix else key
+        self.s3_client.delete_object(Bucket=self.bucket, Key=s3_key)
+
+
+class ShardWriter:
+    """
+    Writes JSON lines into numbered shards and hands every finished shard to the uploader pool.
+    With shard_records=None everything goes to a single <name>.jsonl, the layout JumpStart expects.
+    """
+
+    def __init__(self, output_dir, name, shard_records=None, upload: Optional[Callable] = None):
+        self.output_dir = output_dir
+        self.name = name
+        self.shard_records = shard_records
+        self.upload = upload
+        self.paths = []
+        self.records = 0
+        self._file = None
+        self._shard_count = 0
+
+    def _open(self):
+        file_name = f"{self.name}.jsonl" if self.shard_records is None else f"{self.name}-{len(self.paths):05d}.jsonl"
+        path = os.path.join(self.output_dir, file_name)
+        self.paths.append(path)
+        self._file = open(path, "w", buffering=2**20)
+        self._shard_count = 0
+
+    def _close_shard(self):
+        self._file.close()
+        self._file = None
+        if self.upload is not None:
+            self.upload(self.paths[-1])
+
+    def write(self, record):
+        if self._file is None:
+            self._open()
+        self._file.write(json.dumps(record, ensure_ascii=False))
+        self._file.write("\n")
+        self.records += 1
+        self._shard_count += 1
+        if self.shard_records is not None and self._shard_count >= self.shard_records:
+            self._close_shard()
+
+    def close(self):
+        if self._file is not None:
+            self._close_shard()
+
+    def discard(self):
+        """
+        Close the open shard without uploading it, after a failed pass.
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+def prepare_dataset(
+    records: Iterable[dict],
+    template: PromptTemplate,
+    output_dir: str,
+    uploader=None,
+    filter_fn: Optional[Callable[[dict], bool]] = None,
+    drop_columns: Sequence[str] = (),
+    test_fraction: float = 0.1,
+    split_key: Optional[Sequence[str]] = None,
+    seed: int = 0,
+    shard_records: Optional[int] = None,
+    max_test_records: Optional[int] = None,
+    max_workers: int = 4,
+    test_uploader=None,
+):
+    """
+    Stream `records` once: filter, drop columns, split by hash and write train / test JSON lines plus
+    template.json. Test records get a "prompt" field with the rendered inference prompt.
+    Finished train files are uploaded concurrently when an uploader is given, and template.json after
+    all of them; test files only go to test_uploader, which should point outside the training channel.
+    If the pass fails, every file it uploaded is deleted again. Returns summary statistics.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    split_key = tuple(split_key or template.prompt_fields)
+    drop_columns = set(drop_columns)
+    uses_uploads = uploader is not None or test_uploader is not None
+    executor = ThreadPoolExecutor(max_workers=max_workers) if uses_uploads else None
+    uploads = []  # (uploader, key, future)
+
+    def upload_with(target):
+        if target is None:
+            return None
+
+        def upload(path):
+            key = os.path.basename(path)
+            uploads.append((target, key, executor.submit(target.upload, path, key)))
+        return upload
+
+    start = time.perf_counter()
+    template_path = os.path.join(output_dir, "template.json")
+    template.save(template_path)
+    writers = {
+        "train": ShardWriter(output_dir, "train", shard_records, upload_with(uploader)),
+        "test": ShardWriter(output_dir, "test", shard_records, upload_with(test_uploader)),
+    }
+    seen = kept = 0
+    try:
+        try:
+            with writers["train"], writers["test"]:
+                for record in records:
+                    seen += 1
+                    if filter_fn is not None and not filter_fn(record):
+                        continue
+                    if drop_columns:
+                        record = {k: v for k, v in record.items() if k not in drop_columns}
+                    if kept == 0:
+                        template.validate(record)
+                    kept += 1
+                    split = hash_split(record, split_key, test_fraction, seed)
+                    if split == "test":
+                        if max_test_records is not None and writers["test"].records >= max_test_records:
+                            continue
+                        record = {**record, "prompt": template.render_inference(record)}
+                    writers[split].write(record)
+            uploaded = [future.result() for _, _, future in uploads]
+            if uploader is not None:
+                uploaded.append(uploader.upload(template_path, "template.json"))
+        except BaseException:
+            _delete_uploads(uploads)
+            raise
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True)
+    return {
+        "records_read": seen,
+        "records_kept": kept,
+        "train_records": writers["train"].records,
+        "test_records": writers["test"].records,
+        "train_files": writers["train"].paths,
+        "test_files": writers["test"].paths,
+        "uploaded": uploaded,
+        "seconds": round(time.perf_counter() - start, 2),
+    }
+
+
+def _delete_uploads(uploads):
+    """
+    Remove the files a failed pass already uploaded, once their uploads have finished.
+    """
+    for target, key, future in uploads:
+        if future.exception() is not None:
+            continue
+        try:
+            target.delete(key)
+        except Exception as e:
+            logger.warning(f"Could not delete partial upload {key}: {e}")
+
+
+def read_jsonl(path):
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+# (Optional) Benchmark on a synthetic dolly-like dataset: in-memory baseline vs. streaming pass
+if __name__ == "__main__":
+    import argparse
+    import multiprocessing
+    import random
+    import resource
+    import tempfile
+
+    parser = argparse.ArgumentParser(description="Dataset preparation benchmark")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--shard-records", type=int, default=20_000)
+    args = parser.parse_args()
+
+    CATEGORIES = ["summarization", "open_qa", "closed_qa", "classification", "brainstorming",
+                  "information_extraction", "general_qa", "creative_writing"]
+
+    def synthetic_records(n):
+        # Text pools are generated once so the benchmark measures the pipeline, not the generator
+        rng = random.Random(0)
+        words = "amazon revenue growth cloud customers operating income services model data".split()
+        contexts = [" ".join(rng.choices(words, k=60)) for _ in range(997)]
+        responses = [" ".join(rng.choices(words, k=20)) for _ in range(991)]
+        for i in range(n):
+            yield {
+                "instruction": f"Summarize item {i}.",
+                "context": contexts[i % 997],
+                "response": responses[i % 991],
+                "category": CATEGORIES[i % len(CATEGORIES)],
+            }
+
+    template = PromptTemplate(DOLLY_PROMPT)
+
+    def baseline(output_dir, upload_dir):
+        # What the notebook does: materialize, filter, shuffle-split, to_json, then upload serially
+        start = time.perf_counter()
+        dataset = list(synthetic_records(args.rows))
+        dataset = [{k: v for k, v in r.items() if k != "category"} for r in dataset if r["category"] == "summarization"]
+        random.Random(0).shuffle(dataset)
+        n_test = int(len(dataset) * 0.1)
+        with open(os.path.join(output_dir, "train.jsonl"), "w") as f:
+            for record in dataset[n_test:]:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        template.save(os.path.join(output_dir, "template.json"))
+        uploader = LocalDirectoryUploader(upload_dir)
+        for name in ("train.jsonl", "template.json"):
+            uploader.upload(os.path.join(output_dir, name), name)
+        return time.perf_counter() - start
+
+    def streaming(output_dir, upload_dir):
+        start = time.perf_counter()
+        prepare_dataset(synthetic_records(args.rows), template, output_dir, LocalDirectoryUploader(upload_dir),
+                        filter_fn=lambda r: r["category"] == "summarization", drop_columns=["category"],
+                        shard_records=args.shard_records)
+        return time.perf_counter() - start
+
+    def measure(fn, results):
+        with tempfile.TemporaryDirectory() as output_dir, tempfile.TemporaryDirectory() as upload_dir:
+            seconds = fn(output_dir, upload_dir)
+        results.put((seconds, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024))
+
+    for label, fn in [("in-memory + shuffle", baseline), ("streaming hash split", streaming)]:
+        results = multiprocessing.Queue()
+        process = multiprocessing.Process(target=measure, args=(fn, results))
+        process.start()
+        seconds, peak_mib = results.get()
+        process.join()
+        print(f"{label:<22} {args.rows:,} rows: {seconds:6.2f} s, peak RSS {peak_mib:6.0f} MiB")
+
+    # The split is stable across runs and independent of record order
+    records = list(synthetic_records(10_000))
+    first = [hash_split(r, template.prompt_fields, 0.1) for r in records]
+    shuffled = sorted(records, key=lambda r: r["response"])
+    assert sorted(first) == sorted(hash_split(r, template.prompt_fields, 0.1) for r in shuffled)
+    print(f"Hash split test fraction on 10k records: {first.count('test') / len(first):.3f}")
+    print(f"Inference prompt matches template.json: "
+          f"{template.render_inference(records[0]) == DOLLY_PROMPT.format(**records[0]) + INPUT_OUTPUT_DEMARKATION_KEY}")
@@ -0,0 +1,77 @@
+import json
+import os
+
+import pytest
+
+from dataset_prep import (
+    DOLPHIN_CODER_PROMPT, LocalDirectoryUploader, PromptTemplate, ShardWriter, prepare_dataset, read_jsonl,
+)
+
+RECORDS = [
+    {"system_prompt": "You are a coding assistant.", "question": f"Write function {i}.", "response": f"def f{i}(): pass"}
+    for i in range(200)
+]
+
+
+def test_dolphin_coder_prompt_matches_example133():
+    assert DOLPHIN_CODER_PROMPT == "{system_prompt}\n\n### Input:\n{question}\n"
+    assert PromptTemplate(DOLPHIN_CODER_PROMPT).render_inference(RECORDS[0]) == (
+        "You are a coding assistant.\n\n### Input:\nWrite function 0.\n\n\n### Response:\n"
+    )
+
+
+def test_test_split_stays_out_of_the_training_channel(tmp_path):
+    train_channel, evaluation = tmp_path / "train_channel", tmp_path / "evaluation"
+    stats = prepare_dataset(RECORDS, PromptTemplate(DOLPHIN_CODER_PROMPT), str(tmp_path / "out"),
+                            LocalDirectoryUploader(str(train_channel)), shard_records=50,
+                            test_uploader=LocalDirectoryUploader(str(evaluation)))
+    assert stats["test_records"] > 0
+    channel_files = sorted(os.listdir(train_channel))
+    assert "template.json" in channel_files
+    assert all(name == "template.json" or name.startswith("train") for name in channel_files)
+    assert all("prompt" not in record for name in channel_files if name.startswith("train")
+               for record in read_jsonl(train_channel / name))
+    assert sum(1 for name in os.listdir(evaluation) for _ in read_jsonl(evaluation / name)) == stats["test_records"]
+
+    without_test_uploader = tmp_path / "train_only"
+    prepare_dataset(RECORDS, PromptTemplate(DOLPHIN_CODER_PROMPT), str(tmp_path / "out2"),
+                    LocalDirectoryUploader(str(without_test_uploader)))
+    assert sorted(os.listdir(without_test_uploader)) == ["template.json", "train.jsonl"]
+
+
+def test_failed_pass_closes_shards_without_uploading(tmp_path):
+    uploaded = []
+    with pytest.raises(RuntimeError):
+        with ShardWriter(str(tmp_path), "train", upload=uploaded.append) as writer:
+            writer.write({"question": "q"})
+            raise RuntimeError("source failed")
+    assert writer._file is None and uploaded == []
+
+    def failing_records():
+        yield from RECORDS[:10]
+        raise RuntimeError("source failed")
+
+    with pytest.raises(RuntimeError):
+        prepare_dataset(failing_records(), PromptTemplate(DOLPHIN_CODER_PROMPT), str(tmp_path / "out"),
+                        LocalDirectoryUploader(str(tmp_path / "channel")))
+    assert not (tmp_path / "channel").exists() or os.listdir(tmp_path / "channel") == []
+
+
+def test_failed_sharded_pass_leaves_no_partial_dataset(tmp_path):
+    def failing_records():
+        yield from RECORDS
+        raise RuntimeError("source failed")
+
+    channel, evaluation = tmp_path / "channel", tmp_path / "evaluation"
+    with pytest.raises(RuntimeError):
+        prepare_dataset(failing_records(), PromptTemplate(DOLPHIN_CODER_PROMPT), str(tmp_path / "out"),
+                        LocalDirectoryUploader(str(channel)), shard_records=20,
+                        test_uploader=LocalDirectoryUploader(str(evaluation)))
+    assert os.listdir(channel) == []
+    assert not evaluation.exists() or os.listdir(evaluation) == []
+
+    prepare_dataset(RECORDS, PromptTemplate(DOLPHIN_CODER_PROMPT), str(tmp_path / "out"),
+                    LocalDirectoryUploader(str(channel)), shard_records=20)
+    assert "template.json" in os.listdir(channel)
+    assert json.load(open(channel / "template.json"))["prompt"] == DOLPHIN_CODER_PROMPT
+    assert sum(1 for name in os.listdir(channel) if name.startswith("train")) > 1